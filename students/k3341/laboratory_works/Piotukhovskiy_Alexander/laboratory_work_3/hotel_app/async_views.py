@@ -0,0 +1,197 @@
+import base64
+import binascii
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from .authentication import acache_credentials, aget_cached_credentials, basic_cache_key, token_cache_key
+from .models import Client
+from .mixins import requested_fields
+from .pagination import HotelCursorPagination
+from .renderers import dumps
+from .rollups import build_report
+from .serializers import ClientSerializer, ClientStayOverlapSerializer, QuarterlyReportSerializer, RoomSerializer
+from .views import ClientsListView, RoomsByStatusView, ClientStayOverlapView, QuarterlyReportView, ClientViewSet, \
+    RoomViewSet, ReservationViewSet, EmployeeViewSet, EmploymentContractViewSet, EmployeePositionsViewSet, \
+    CleaningScheduleViewSet
+
+VIEWSETS = {
+    'clients': ClientViewSet,
+    'rooms': RoomViewSet,
+    'reservations': ReservationViewSet,
+    'employees': EmployeeViewSet,
+    'employment-contracts': EmploymentContractViewSet,
+    'positions': EmployeePositionsViewSet,
+    'cleaning-schedules': CleaningScheduleViewSet,
+}
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(dumps(data), status=status, headers=headers, content_type='application/json')
+
+
+async def aget_user(request):
+    # Та же схема, что и у TokenAuthentication и BasicAuthentication, но без блокирующих запросов
+    keyword, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    credentials = credentials.strip()
+    if not credentials:
+        return None
+
+    if keyword == 'Token':
+        cache_key = token_cache_key(credentials)
+        cached = await aget_cached_credentials(cache_key)
+        if cached is not None:
+            return cached[0]
+
+        token = await Token.objects.select_related('user').filter(key=credentials).afirst()
+        if token is None or not token.user.is_active:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        await acache_credentials(cache_key, (token.user, token), getattr(settings, 'HOTEL_TOKEN_CACHE_TIMEOUT', 300))
+        return token.user
+
+    if keyword == 'Basic':
+        try:
+            username, _, password = base64.b64decode(credentials).decode().partition(':')
+        except (binascii.Error, UnicodeDecodeError):
+            raise exceptions.AuthenticationFailed('Invalid basic header. Credentials not correctly base64 encoded.')
+        cache_key = basic_cache_key(username, password)
+        cached = await aget_cached_credentials(cache_key)
+        if cached is not None:
+            return cached[0]
+
+        user = await aauthenticate(request, username=username, password=password)
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed('Invalid username/password.')
+        await acache_credentials(cache_key, (user, None), getattr(settings, 'HOTEL_BASIC_AUTH_CACHE_TIMEOUT', 60))
+        return user
+
+    return None
+
+
+def async_api_view(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return json_response({"detail": exceptions.MethodNotAllowed(request.method).detail}, status=405)
+
+        try:
+            user = await aget_user(request)
+        except exceptions.AuthenticationFailed as error:
+            return json_response({"detail": error.detail}, status=401, headers={'WWW-Authenticate': 'Token'})
+        if user is None:
+            return json_response(
+                {"detail": exceptions.NotAuthenticated.default_detail},
+                status=401,
+                headers={'WWW-Authenticate': 'Token'}
+            )
+
+        request.user = user
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def paginate(request, queryset, serializer_class, results_key='results'):
+    # Пагинация и сериализаторы DRF синхронны, поэтому страница выбирается и сериализуется
+    # за один переход в поток, а не отдельным переходом на каждый запрос к базе
+    paginator = HotelCursorPagination()
+    page = paginator.paginate_queryset(queryset, Request(request))
+    return {
+        "next": paginator.get_next_link(),
+        "previous": paginator.get_previous_link(),
+        results_key: serializer_class(page, many=True, context={'request': request}).data
+    }
+
+
+@async_api_view
+async def clients_list(request):
+    data = await sync_to_async(paginate)(
+        request, ClientsListView.filter_clients(request.GET), ClientSerializer, 'clients'
+    )
+    if not data['clients'] and not request.GET.get(HotelCursorPagination.cursor_query_param):
+        return json_response({"detail": "Не найдено ни одного клиента по заданным фильтрам.", **data}, status=404)
+    return json_response(data)
+
+
+@async_api_view
+async def rooms_by_status(request):
+    rooms_queryset, error = RoomsByStatusView.filter_rooms(request.GET.get('status', None), requested_fields(request))
+    if error:
+        return json_response(error, status=422)
+
+    return json_response(await sync_to_async(paginate)(request, rooms_queryset, RoomSerializer, 'rooms'))
+
+
+@async_api_view
+async def client_stay_overlap(request):
+    serializer = ClientStayOverlapSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=422)
+
+    validated_data = serializer.validated_data
+    client_id = validated_data['client_id']
+    if not await Client.objects.filter(id=client_id).aexists():
+        return json_response({"detail": f"Клиент с id {client_id} не найден."}, status=404)
+
+    overlapping_clients = Client.objects.filter(
+        id__in=ClientStayOverlapView.overlapping_reservations(
+            client_id, validated_data.get('start_date', None), validated_data.get('end_date', None)
+        ).values('client_id')
+    )
+    clients_data = ClientSerializer(
+        [client async for client in overlapping_clients], many=True, context={'request': request}
+    ).data
+
+    return json_response({
+        "count": len(clients_data),
+        "clients": clients_data
+    })
+
+
+@async_api_view
+async def quarterly_report(request):
+    serializer = QuarterlyReportSerializer(data=request.GET)
+    if not serializer.is_valid():
+        return json_response(serializer.errors, status=422)
+
+    start_date, end_date = QuarterlyReportView.get_quarter_date_range(
+        serializer.validated_data['quarter'], serializer.validated_data['year']
+    )
+    report = await sync_to_async(build_report)(start_date.date(), end_date.date())
+    report["start_date"] = start_date
+    report["end_date"] = end_date
+
+    return json_response(report)
+
+
+def viewset_queryset(viewset_class, request=None):
+    viewset = viewset_class()
+    viewset.request = request
+    viewset.format_kwarg = None
+    return viewset.get_queryset()
+
+
+@async_api_view
+async def resource_list(request, resource):
+    viewset_class = VIEWSETS[resource]
+    return json_response(await sync_to_async(paginate)(
+        request, viewset_queryset(viewset_class, request), viewset_class.serializer_class
+    ))
+
+
+@async_api_view
+async def resource_detail(request, resource, pk):
+    viewset_class = VIEWSETS[resource]
+    queryset = viewset_queryset(viewset_class, request)
+    instance = await queryset.filter(pk=pk).afirst()
+    if instance is None:
+        return json_response({"detail": f"No {queryset.model._meta.object_name} matches the given query."}, status=404)
+
+    serializer = viewset_class.serializer_class(instance, context={'request': request})
+    return json_response(await sync_to_async(lambda: serializer.data)())
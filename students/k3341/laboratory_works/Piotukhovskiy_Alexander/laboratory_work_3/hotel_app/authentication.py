@@ -0,0 +1,139 @@
+import hashlib
+import hmac
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.authentication import BasicAuthentication, TokenAuthentication
+
+from .cache import KEY_PREFIX
+
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def token_cache_key(key):
+    return f'{KEY_PREFIX}:auth:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def basic_cache_key(username, password):
+    # В ключе нет пароля в открытом виде: HMAC на SECRET_KEY нельзя перебрать без доступа к настройкам
+    digest = hmac.new(settings.SECRET_KEY.encode(), f'{username}\0{password}'.encode(), hashlib.sha256)
+    return f'{KEY_PREFIX}:auth:basic:{digest.hexdigest()}'
+
+
+def get_auth_cache():
+    # Отзыв токена и изменение пользователя должны быть видны всем воркерам. Кэш в памяти процесса
+    # сбрасывается только в процессе, обработавшем изменение, поэтому с ним данные аутентификации не кэшируются
+    cache = caches[getattr(settings, 'HOTEL_AUTH_CACHE', 'default')]
+    return None if isinstance(cache, PROCESS_LOCAL_CACHES) else cache
+
+
+def user_version_key(user_id):
+    return f'{KEY_PREFIX}:auth:user:{user_id}'
+
+
+def get_user_version(cache, user_id):
+    key = user_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    cache = get_auth_cache()
+    if cache is None:
+        return
+    key = user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_user(user_id):
+    # Сохраненные данные аутентификации пользователя проверяются по версии пользователя:
+    # после изменения или удаления пользователя все его записи в кэше перестают подходить
+    bump_user_version(user_id)
+    transaction.on_commit(lambda: bump_user_version(user_id))
+
+
+def delete_token(key):
+    cache = get_auth_cache()
+    if cache is not None:
+        cache.delete(token_cache_key(key))
+
+
+def forget_token(key):
+    delete_token(key)
+    transaction.on_commit(lambda: delete_token(key))
+
+
+def get_cached_credentials(cache_key):
+    cache = get_auth_cache()
+    if cache is None:
+        return None
+    cached = cache.get(cache_key)
+    if cached is None:
+        return None
+    credentials, version = cached
+    if cache.get(user_version_key(credentials[0].pk)) != version:
+        return None
+    return credentials
+
+
+def cache_credentials(cache_key, credentials, timeout):
+    cache = get_auth_cache()
+    if cache is None:
+        return
+    cache.set(cache_key, (credentials, get_user_version(cache, credentials[0].pk)), timeout=timeout)
+
+
+async def aget_cached_credentials(cache_key):
+    cache = get_auth_cache()
+    if cache is None:
+        return None
+    cached = await cache.aget(cache_key)
+    if cached is None:
+        return None
+    credentials, version = cached
+    if await cache.aget(user_version_key(credentials[0].pk)) != version:
+        return None
+    return credentials
+
+
+async def acache_credentials(cache_key, credentials, timeout):
+    cache = get_auth_cache()
+    if cache is None:
+        return
+    key = user_version_key(credentials[0].pk)
+    if await cache.aget(key) is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+    await cache.aset(cache_key, (credentials, await cache.aget(key)), timeout=timeout)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        credentials = get_cached_credentials(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache_credentials(cache_key, credentials, getattr(settings, 'HOTEL_TOKEN_CACHE_TIMEOUT', 300))
+        return credentials
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+
+    def authenticate_credentials(self, userid, password, request=None):
+        # Проверка хэша пароля выполняется один раз за время жизни записи, а не на каждый запрос
+        cache_key = basic_cache_key(userid, password)
+        credentials = get_cached_credentials(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(userid, password, request)
+            cache_credentials(cache_key, credentials, getattr(settings, 'HOTEL_BASIC_AUTH_CACHE_TIMEOUT', 60))
+        return credentials
@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+from .models import Reservation, Room, RoomNight
+
+
+class RoomUnavailable(Exception):
+    pass
+
+
+def reservation_nights(reservation):
+    if reservation.status not in Reservation.ACTIVE_STATUSES:
+        return set()
+
+    nights = set()
+    current_date = reservation.arrival_date
+    while current_date < reservation.departure_date:
+        nights.add((reservation.room_id, current_date))
+        current_date += timedelta(days=1)
+    return nights
+
+
+def sync_room_nights(reservations):
+    reservations = list(reservations)
+    if not reservations:
+        return
+
+    desired = {reservation.id: reservation_nights(reservation) for reservation in reservations}
+
+    stale_ids = []
+    existing = RoomNight.objects.filter(reservation_id__in=desired).values_list('id', 'reservation_id', 'room_id', 'date')
+    for night_id, reservation_id, room_id, night_date in existing:
+        nights = desired[reservation_id]
+        if (room_id, night_date) in nights:
+            nights.discard((room_id, night_date))
+        else:
+            stale_ids.append(night_id)
+
+    if stale_ids:
+        RoomNight.objects.filter(id__in=stale_ids).delete()
+
+    RoomNight.objects.bulk_create(
+        RoomNight(reservation_id=reservation_id, room_id=room_id, date=night_date)
+        for reservation_id, nights in desired.items()
+        for room_id, night_date in nights
+    )
+
+
+def occupied_nights(start_date, end_date):
+    return RoomNight.objects.filter(date__gte=start_date, date__lt=end_date)
+
+
+def available_rooms(start_date, end_date, room_type_id=None):
+    rooms = Room.objects.exclude(status='MAINTENANCE').exclude(
+        id__in=occupied_nights(start_date, end_date).values('room_id')
+    )
+    if room_type_id is not None:
+        rooms = rooms.filter(type_id=room_type_id)
+    return rooms
+
+
+def is_room_available(room, start_date, end_date, exclude_reservation=None):
+    nights = occupied_nights(start_date, end_date).filter(room=room)
+    if exclude_reservation is not None:
+        nights = nights.exclude(reservation=exclude_reservation)
+    return not nights.exists()
@@ -0,0 +1,464 @@
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.test import AsyncClient, Client as TestClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import get_resolver
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .cache import bump_versions, invalidate
+from .renderers import FastJSONRenderer
+from .models import Client, Room, RoomType, Reservation, Employee, EmploymentContract, EmployeePosition, \
+    CleaningSchedule
+
+
+class Rollback(Exception):
+    pass
+
+
+class Scenario:
+
+    def __init__(self, name, method, path, data=None, data_format='json', writes=False):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.data_format = data_format
+        self.writes = writes
+
+    def request(self, client):
+        data = self.data() if callable(self.data) else self.data
+        return getattr(client, self.method.lower())(self.path, data, format=self.data_format)
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def build_scenarios():
+    room = Room.objects.order_by('id').first()
+    room_type = RoomType.objects.order_by('id').first()
+    reservation = Reservation.objects.order_by('-id').first()
+    client = reservation.client if reservation else Client.objects.order_by('id').first()
+    employee = Employee.objects.order_by('id').first()
+    contract = EmploymentContract.objects.filter(is_active=True).order_by('id').first()
+    position = EmployeePosition.objects.order_by('id').first()
+    cleaning = CleaningSchedule.objects.order_by('id').first()
+    if not all([room, room_type, client, employee, contract, position]):
+        return []
+
+    today = date.today()
+    arrival_date = today + timedelta(days=400)
+    departure_date = arrival_date + timedelta(days=3)
+    quarter = (today.month - 1) // 3 + 1
+    client_ids = list(Client.objects.order_by('id').values_list('id', flat=True)[:50])
+
+    scenarios = [
+        Scenario('hello-world', 'GET', '/hotel/health'),
+        Scenario('clients-list', 'GET', f'/hotel/clients?city={client.city_from}'),
+        Scenario('available-rooms-count', 'GET', '/hotel/rooms?status=AVAILABLE,OCCUPIED'),
+        Scenario('room-availability', 'GET',
+                 f'/hotel/rooms/availability?from={today}&to={today + timedelta(days=7)}'),
+        Scenario('client-stay-overlap', 'GET', f'/hotel/clients/stay-overlap?client_id={client.id}'),
+        Scenario('client-stay-overlap-bulk', 'POST', '/hotel/clients/stay-overlap/bulk', {'client_ids': client_ids}),
+        Scenario('client-room-cleaning', 'GET', f'/hotel/clients/room-cleaner?client_id={client.id}&day_of_week=MONDAY'),
+        Scenario('client-room-cleaning-bulk', 'POST', '/hotel/clients/room-cleaner/bulk', {
+            'client_ids': client_ids,
+            'days_of_week': ['MONDAY', 'WEDNESDAY', 'FRIDAY'],
+        }),
+        Scenario('employee-management', 'PATCH', '/hotel/employees/manage',
+                 {'employee_id': contract.employee_id, 'first_name': 'Пётр', 'end_date': str(today + timedelta(days=365))}, writes=True),
+        Scenario('update-cleaning-schedule', 'PATCH', '/hotel/cleaning-schedules/manage',
+                 {'cleaner_id': contract.employee_id, 'cleaning_dates': [str(today)], 'room_ids': [room.number]},
+                 writes=True),
+        Scenario('cleaning-auto-assign', 'POST', '/hotel/cleaning-schedules/auto-assign', {
+            'start_date': str(today),
+            'end_date': str(today + timedelta(days=6)),
+        }, writes=True),
+        Scenario('create-reservation', 'POST', '/hotel/reservation', {
+            'passport_number': 'BENCH00001',
+            'first_name': 'Иван',
+            'last_name': 'Иванов',
+            'city_from': 'Москва',
+            'room_number': room.number,
+            'arrival_date': str(arrival_date),
+            'departure_date': str(departure_date),
+        }, writes=True),
+        Scenario('price-quote', 'POST', '/hotel/reservation/quote', {'items': [
+            {'room_type_id': room_type.id, 'arrival_date': str(today + timedelta(days=offset)),
+             'departure_date': str(today + timedelta(days=offset + 7))}
+            for offset in range(100)
+        ]}),
+        Scenario('reservation-import', 'POST', '/hotel/reservation/import', lambda: {
+            'file': SimpleUploadedFile('bench.jsonl', '\n'.join(
+                json.dumps({
+                    'passport_number': f'BENCH{index:05d}',
+                    'first_name': 'Иван',
+                    'last_name': 'Иванов',
+                    'city_from': 'Москва',
+                    'room_number': room.number,
+                    'arrival_date': str(arrival_date + timedelta(days=index * 2)),
+                    'departure_date': str(arrival_date + timedelta(days=index * 2 + 1)),
+                }) for index in range(100)
+            ).encode())
+        }, data_format='multipart', writes=True),
+        Scenario('quarterly-report', 'GET', f'/hotel/reports/quarterly?quarter={quarter}&year={today.year}'),
+        Scenario('range-report', 'GET', f'/hotel/reports/range?start_date={today - timedelta(days=365)}&end_date={today}'),
+        Scenario('occupancy-report', 'GET',
+                 f'/hotel/reports/occupancy?start_date={today - timedelta(days=365)}&end_date={today}&granularity=week'),
+        Scenario('reservations-export', 'GET', '/hotel/export/reservations.csv'),
+        Scenario('clients-export', 'GET', '/hotel/export/clients.csv'),
+        Scenario('quarterly-report-export', 'GET',
+                 f'/hotel/export/reports/quarterly.csv?quarter={quarter}&year={today.year}'),
+    ]
+    if reservation:
+        scenarios.append(Scenario('update-reservation', 'PATCH', f'/hotel/reservation/{reservation.id}',
+                                  {'payment_status': 'PAID'}, writes=True))
+
+    details = {
+        'client': client.id,
+        'room': room.id,
+        'reservation': reservation.id if reservation else None,
+        'employee': employee.id,
+        'employee-contracts': contract.id,
+        'employee-position': position.id,
+        'cleaning-schedule': cleaning.id if cleaning else None,
+    }
+    prefixes = {
+        'client': 'clients',
+        'room': 'rooms',
+        'reservation': 'reservations',
+        'employee': 'employees',
+        'employee-contracts': 'employment-contracts',
+        'employee-position': 'positions',
+        'cleaning-schedule': 'cleaning-schedules',
+    }
+    for basename, prefix in prefixes.items():
+        scenarios.append(Scenario(f'{basename}-list', 'GET', f'/hotel/api/{prefix}/'))
+        if details[basename]:
+            scenarios.append(Scenario(f'{basename}-detail', 'GET', f'/hotel/api/{prefix}/{details[basename]}/'))
+
+    # Те же списки с выбором полей: для сравнения объема ответа и затрат процессора с полными списками
+    scenarios += [
+        Scenario('room-list-fields', 'GET', '/hotel/api/rooms/?fields=id,number,status'),
+        Scenario('reservation-list-fields', 'GET',
+                 '/hotel/api/reservations/?fields=id,arrival_date,departure_date,status,room.number'),
+    ]
+
+    return scenarios
+
+
+def measure(client, scenario, iterations, cached=False):
+    timings = []
+    cpu_timings = []
+    queries = []
+    status_code = None
+    size = 0
+    models = [] if cached else list(apps.get_app_config('hotel_app').get_models())
+    for _ in range(iterations):
+        # Без кэша версии всех моделей сбрасываются до замера, и ответ строится заново
+        bump_versions(*models)
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            try:
+                # Изменяющие запросы выполняются в транзакции, которая затем откатывается
+                with transaction.atomic():
+                    response = scenario.request(client)
+                    if hasattr(response, 'streaming_content'):
+                        size = len(b''.join(response.streaming_content))
+                    else:
+                        size = len(response.content)
+                    if scenario.writes:
+                        raise Rollback
+            except Rollback:
+                pass
+            cpu_timings.append((time.process_time() - cpu_started) * 1000)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context.captured_queries))
+        status_code = response.status_code
+
+    return {
+        "method": scenario.method,
+        "path": scenario.path,
+        "status": status_code,
+        "iterations": iterations,
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "cpu_ms": round(sum(cpu_timings) / len(cpu_timings), 3),
+        "bytes": size,
+        "queries": max(queries),
+    }
+
+
+def run_benchmark(user, scenarios, iterations=20, names=None):
+    client = APIClient(SERVER_NAME='localhost')
+    client.force_authenticate(user)
+
+    results = {}
+    for scenario in scenarios:
+        if names and scenario.name not in names:
+            continue
+        # Прогревочный запрос не учитывается в статистике
+        measure(client, scenario, 1)
+        result = measure(client, scenario, iterations)
+        # Повторные запросы без изменения данных отдаются из кэша ответов
+        cached = measure(client, scenario, iterations, cached=True)
+        result['cached'] = {key: cached[key] for key in ('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'cpu_ms', 'queries')}
+        results[scenario.name] = result
+
+    return {
+        "generated_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "iterations": iterations,
+        "database": connection.vendor,
+        "endpoints": results,
+    }
+
+
+def compare_renderers(user, scenarios, iterations=20, names=None):
+    # Одни и те же данные ответа кодируются стандартным JSONRenderer и FastJSONRenderer
+    client = APIClient(SERVER_NAME='localhost')
+    client.force_authenticate(user)
+    renderers = {'json': JSONRenderer(), 'fast': FastJSONRenderer()}
+
+    results = {}
+    for scenario in scenarios:
+        if scenario.method != 'GET' or (names and scenario.name not in names):
+            continue
+        response = scenario.request(client)
+        if getattr(response, 'data', None) is None:
+            continue
+
+        results[scenario.name] = {}
+        for renderer_name, renderer in renderers.items():
+            content = renderer.render(response.data)
+            started = time.process_time()
+            for _ in range(iterations):
+                renderer.render(response.data)
+            results[scenario.name][renderer_name] = {
+                "cpu_ms": round((time.process_time() - started) * 1000 / iterations, 3),
+                "bytes": len(content),
+            }
+
+    return {
+        "generated_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "iterations": iterations,
+        "renderers": results,
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    lines = []
+    regressions = []
+    for name, result in sorted(current['endpoints'].items()):
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            lines.append(f'{name:32} p95 {result["p95_ms"]:9.2f} ms  queries {result["queries"]:4}  (новый)')
+            continue
+
+        latency_change = (result['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] if previous['p95_ms'] else 0
+        queries_change = result['queries'] - previous['queries']
+        is_regression = latency_change > threshold or queries_change > 0
+        if is_regression:
+            regressions.append(name)
+        lines.append(
+            f'{name:32} p95 {previous["p95_ms"]:9.2f} -> {result["p95_ms"]:9.2f} ms ({latency_change:+.0%})  '
+            f'queries {previous["queries"]:4} -> {result["queries"]:4}' + ('  РЕГРЕССИЯ' if is_regression else '')
+        )
+
+    return lines, regressions
+
+
+def uncovered_url_names(scenarios):
+    covered = {scenario.name for scenario in scenarios}
+    names = set()
+    for pattern in get_resolver('hotel_app.urls').url_patterns:
+        # Асинхронные варианты сравниваются отдельно, командой с флагом --asgi
+        if pattern.name and not pattern.name.endswith('-root') and not pattern.name.startswith('async-'):
+            names.add(pattern.name)
+    return sorted(names - covered)
+
+
+def build_serving_paths():
+    client = Client.objects.order_by('id').first()
+    room = Room.objects.order_by('id').first()
+    if client is None or room is None:
+        return []
+
+    today = date.today()
+    quarter = (today.month - 1) // 3 + 1
+    # Синхронный и асинхронный варианты одного и того же эндпоинта
+    return [
+        f'/hotel/clients?city={client.city_from}',
+        '/hotel/rooms?status=AVAILABLE,OCCUPIED',
+        f'/hotel/clients/stay-overlap?client_id={client.id}',
+        f'/hotel/reports/quarterly?quarter={quarter}&year={today.year}',
+        '/hotel/api/clients/',
+        f'/hotel/api/rooms/{room.id}/',
+    ]
+
+
+def summarize(timings, statuses, elapsed):
+    return {
+        "requests": len(timings),
+        "statuses": sorted(set(statuses)),
+        "rps": round(len(timings) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+    }
+
+
+def run_wsgi(path, headers, concurrency, requests):
+    def worker(count):
+        client = TestClient()
+        results = []
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                response = client.get(path, headers=headers)
+                results.append(((time.perf_counter() - started) * 1000, response.status_code))
+        finally:
+            # Каждый поток открывает собственное соединение с базой
+            connections.close_all()
+        return results
+
+    counts = [requests // concurrency + (index < requests % concurrency) for index in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = [item for chunk in executor.map(worker, counts) for item in chunk]
+    elapsed = time.perf_counter() - started
+    return summarize([timing for timing, _ in results], [status for _, status in results], elapsed)
+
+
+async def run_asgi(path, headers, concurrency, requests):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            return (time.perf_counter() - started) * 1000, response.status_code
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(send() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    return summarize([timing for timing, _ in results], [status for _, status in results], elapsed)
+
+
+def compare_serving(user, paths, concurrency=50, requests=200):
+    token, _ = Token.objects.get_or_create(user=user)
+    headers = {'Authorization': f'Token {token.key}'}
+
+    results = {}
+    # AsyncClient всегда отправляет заголовок Host: testserver, синхронный клиент использует тот же хост
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        for path in paths:
+            async_path = path.replace('/hotel/', '/hotel/async/', 1)
+            # Прогревочные запросы не учитываются в статистике
+            run_wsgi(path, headers, 1, 1)
+            asyncio.run(run_asgi(async_path, headers, 1, 1))
+            results[path] = {
+                "wsgi": run_wsgi(path, headers, concurrency, requests),
+                "asgi": asyncio.run(run_asgi(async_path, headers, concurrency, requests)),
+            }
+
+    return {
+        "generated_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "concurrency": concurrency,
+        "requests": requests,
+        "database": connection.vendor,
+        "paths": results,
+    }
+
+
+def run_booking_load(user, concurrency=16, requests=160):
+    # Конкурентные бронирования одной комнаты и разных комнат на одни и те же даты
+    rooms = list(Room.objects.exclude(status='MAINTENANCE').order_by('id')[:requests])
+    if not rooms:
+        return {}
+
+    token, _ = Token.objects.get_or_create(user=user)
+    headers = {'Authorization': f'Token {token.key}'}
+    arrival_date = date.today() + timedelta(days=3650)
+    departure_date = arrival_date + timedelta(days=2)
+    last_id = Reservation.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    room_statuses = {room.id: room.status for room in rooms}
+
+    def book(room_number, index):
+        client = TestClient()
+        try:
+            started = time.perf_counter()
+            response = client.post('/hotel/reservation', {
+                'passport_number': f'LOAD{index:06d}',
+                'first_name': 'Иван',
+                'last_name': 'Иванов',
+                'city_from': 'Москва',
+                'room_number': room_number,
+                'arrival_date': str(arrival_date),
+                'departure_date': str(departure_date),
+            }, content_type='application/json', headers=headers)
+            return (time.perf_counter() - started) * 1000, response.status_code
+        finally:
+            connections.close_all()
+
+    results = {}
+    different_rooms = [rooms[index % len(rooms)].number for index in range(requests)]
+    # Последовательный прогон по разным комнатам - база для оценки выигрыша от параллельности
+    modes = {
+        'same_room': ([rooms[0].number] * requests, concurrency),
+        'different_rooms': (different_rooms, concurrency),
+        'serial': (different_rooms, 1),
+    }
+    try:
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for mode, (room_numbers, workers) in modes.items():
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    responses = list(executor.map(book, room_numbers, range(requests)))
+                elapsed = time.perf_counter() - started
+
+                created = Reservation.objects.filter(id__gt=last_id)
+                double_booked = created.values('room_id').annotate(count=Count('id')).filter(count__gt=1).count()
+                statuses = [status for _, status in responses]
+                results[mode] = {
+                    **summarize([timing for timing, _ in responses], statuses, elapsed),
+                    "created": statuses.count(201),
+                    "rejected": statuses.count(409) + statuses.count(422),
+                    "double_booked_rooms": double_booked,
+                }
+                # Созданные бронирования удаляются, чтобы следующий прогон начинался с тех же условий
+                created.delete()
+                Client.objects.filter(passport_number__startswith='LOAD').delete()
+    finally:
+        Reservation.objects.filter(id__gt=last_id).delete()
+        Client.objects.filter(passport_number__startswith='LOAD').delete()
+        # Бронирование переводит комнату в статус OCCUPIED, исходные статусы восстанавливаются
+        for status in set(room_statuses.values()):
+            Room.objects.filter(
+                id__in=[room_id for room_id, room_status in room_statuses.items() if room_status == status]
+            ).update(status=status)
+        invalidate(Room)
+
+    return {
+        "generated_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "concurrency": concurrency,
+        "requests": requests,
+        "database": connection.vendor,
+        "modes": results,
+    }
@@ -0,0 +1,135 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import router, transaction
+from rest_framework.response import Response
+
+KEY_PREFIX = 'hotel_app'
+CACHED_VIEWS = set()
+
+
+def get_cache():
+    return caches[getattr(settings, 'HOTEL_RESPONSE_CACHE', 'default')]
+
+
+def version_key(model):
+    return f'{KEY_PREFIX}:version:{model._meta.label_lower}'
+
+
+def get_versions(models):
+    cache = get_cache()
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Если счетчик вытеснен из кэша, начинаем с нового значения, а не с нуля,
+            # чтобы не вернуть ответ, сохраненный под старой версией
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*models):
+    cache = get_cache()
+    for model in models:
+        key = version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate(*models):
+    bump_versions(*models)
+    # Повторная инвалидация после фиксации транзакции: запросы, выполненные до фиксации,
+    # могли сохранить в кэш еще не измененные данные под новой версией
+    transaction.on_commit(lambda: bump_versions(*models))
+
+
+def increment_counter(name, view_name):
+    cache = get_cache()
+    key = f'{KEY_PREFIX}:stats:{view_name}:{name}'
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_stats():
+    cache = get_cache()
+    views = {}
+    for view_name in sorted(CACHED_VIEWS):
+        hits = cache.get(f'{KEY_PREFIX}:stats:{view_name}:hits', 0)
+        misses = cache.get(f'{KEY_PREFIX}:stats:{view_name}:misses', 0)
+        views[view_name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+    hits = sum(stats['hits'] for stats in views.values())
+    misses = sum(stats['misses'] for stats in views.values())
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        "views": views,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many([
+        f'{KEY_PREFIX}:stats:{view_name}:{name}' for view_name in CACHED_VIEWS for name in ('hits', 'misses')
+    ])
+
+
+def get_role(user):
+    if not user or not user.is_authenticated:
+        return 'anonymous'
+    if user.is_superuser:
+        return 'superuser'
+    if user.is_staff:
+        return 'staff'
+    return 'user'
+
+
+def response_key(view, request):
+    query = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    versions = get_versions(view.cache_models)
+    # Ответы, прочитанные с реплики, хранятся отдельно: клиент, закрепленный за основной базой
+    # после записи, не должен получить отстающие данные из кэша
+    database = router.db_for_read(view.cache_models[0])
+    raw_key = repr((request.get_host(), request.path, query, get_role(request.user), versions, database))
+    return f'{KEY_PREFIX}:response:{type(view).__name__}:{hashlib.md5(raw_key.encode()).hexdigest()}'
+
+
+def cached_response(view, request, build_response):
+    is_streaming = getattr(view, 'is_streaming_requested', None)
+    if request.method != 'GET' or not view.cache_models or (is_streaming and is_streaming()):
+        return build_response()
+
+    view_name = type(view).__name__
+    key = response_key(view, request)
+    cached = get_cache().get(key)
+    if cached is not None:
+        increment_counter('hits', view_name)
+        data, status = cached
+        return Response(data, status=status)
+
+    increment_counter('misses', view_name)
+    response = build_response()
+    # Потоковые ответы и ошибки не кэшируются
+    if isinstance(response, Response) and response.status_code == 200:
+        get_cache().set(key, (response.data, response.status_code), view.cache_timeout)
+    return response
+
+
+def cache_response(handler):
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        return cached_response(view, request, lambda: handler(view, request, *args, **kwargs))
+    return wrapper
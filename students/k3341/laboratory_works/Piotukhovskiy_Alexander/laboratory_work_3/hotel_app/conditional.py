@@ -0,0 +1,79 @@
+import hashlib
+
+from django.db import router
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from .cache import get_role, get_versions
+
+
+def queryset_validators(queryset, last_modified_field=None, version_field=None):
+    # Один агрегирующий запрос вместо сериализации: количество строк и максимальный id меняются
+    # при добавлении и удалении записей, сумма версий и время последнего изменения - при их обновлении
+    aggregates = {'count': Count('pk'), 'max_pk': Max('pk')}
+    if version_field:
+        aggregates['versions'] = Sum(version_field)
+    if last_modified_field:
+        aggregates['last_modified'] = Max(last_modified_field)
+    return queryset.order_by().aggregate(**aggregates)
+
+
+def representation_digest(view, request, queryset, validators):
+    # Вложенные данные (комнаты, клиенты, уборщики) учитываются через версии моделей из кэша
+    query = sorted((key, request.query_params.getlist(key)) for key in request.query_params)
+    raw = repr((
+        request.path, query, get_role(request.user), sorted(validators.items(), key=lambda item: item[0]),
+        get_versions(view.cache_models), router.db_for_read(queryset.model)
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def entity_tag(pk, version=None):
+    return f'{pk}.{version}' if version is not None else str(pk)
+
+
+def view_validators(view, queryset):
+    return queryset_validators(
+        queryset, getattr(view, 'last_modified_field', None), getattr(view, 'version_field', None)
+    )
+
+
+def list_etag(view, request, queryset):
+    validators = view_validators(view, queryset)
+    return quote_etag(representation_digest(view, request, queryset, validators)), validators.get('last_modified')
+
+
+def detail_etag(view, request, queryset, pk):
+    validators = view_validators(view, queryset.filter(pk=pk))
+    if not validators['count']:
+        return None, None
+    # Начало тега - id и версия записи, по ним проверяется If-Match при изменении
+    tag = f'{entity_tag(pk, validators.get("versions"))}-{representation_digest(view, request, queryset, validators)}'
+    return quote_etag(tag), validators.get('last_modified')
+
+
+def conditional_response(request, etag, last_modified, build_response):
+    # Last-Modified отражает только изменения самих записей, но не вложенных данных,
+    # поэтому ответ 304 выдается только по совпадению ETag
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build_response()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def if_match_failed(request, pk, version):
+    # If-Match сравнивается с id и версией записи: изменение вложенной комнаты или клиента
+    # не должно отклонять обновление
+    header = request.META.get('HTTP_IF_MATCH')
+    if not header:
+        return False
+    tags = parse_etags(header)
+    if '*' in tags:
+        return False
+    current = entity_tag(pk, version)
+    return not any(tag.startswith('"') and tag.strip('"').split('-', 1)[0] == current for tag in tags)
@@ -0,0 +1,134 @@
+import hashlib
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import KEY_PREFIX, get_cache
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Имена маршрутов списков, отчетов и пересечений проживания, которые можно читать с реплики
+REPLICA_ROUTES = [
+    'clients-list',
+    'available-rooms-count',
+    'room-availability',
+    'client-stay-overlap',
+    'quarterly-report',
+    'range-report',
+    'occupancy-report',
+    'reservations-export',
+    'clients-export',
+    'quarterly-report-export',
+    'async-clients-list',
+    'async-available-rooms-count',
+    'async-client-stay-overlap',
+    'async-quarterly-report',
+    'client-list',
+    'room-list',
+    'reservation-list',
+    'employee-list',
+    'employee-contracts-list',
+    'employee-position-list',
+    'cleaning-schedule-list',
+    'async-rooms-list',
+    'async-reservations-list',
+    'async-employees-list',
+    'async-employment-contracts-list',
+    'async-positions-list',
+    'async-cleaning-schedules-list',
+]
+
+# База для чтения моделей hotel_app в текущем запросе, None - основная база
+read_database = ContextVar('hotel_read_database', default=None)
+
+
+def iterate_with_database(content, database):
+    # База устанавливается на время получения каждой части, а не до конца ответа:
+    # между частями сервер выполняет свой код в том же контексте
+    iterator = iter(content)
+    while True:
+        token = read_database.set(database)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            read_database.reset(token)
+        yield chunk
+
+
+async def aiterate_with_database(content, database):
+    iterator = aiter(content)
+    while True:
+        token = read_database.set(database)
+        try:
+            chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        finally:
+            read_database.reset(token)
+        yield chunk
+
+
+def bind_streaming_content(response, database):
+    # Тело потокового ответа (выгрузки, списки с ?stream=) формируется уже после выхода из представления,
+    # поэтому запросы при его итерации тоже должны читать из выбранной базы
+    if database is None or not getattr(response, 'streaming', False):
+        return response
+    if response.is_async:
+        response.streaming_content = aiterate_with_database(response.streaming_content, database)
+    else:
+        response.streaming_content = iterate_with_database(response.streaming_content, database)
+    return response
+
+
+def pin_key(request):
+    # Пользователь DRF определяется только внутри представления, поэтому клиент различается
+    # по заголовку Authorization, сессии или IP-адресу
+    identity = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get('REMOTE_ADDR', '')
+    )
+    return f'{KEY_PREFIX}:replica:pin:{hashlib.sha256(identity.encode()).hexdigest()}'
+
+
+def pin_timeout():
+    return getattr(settings, 'HOTEL_REPLICA_PIN_SECONDS', 5)
+
+
+def is_pinned(request):
+    return get_cache().get(pin_key(request)) is not None
+
+
+def pin_to_primary(request):
+    get_cache().set(pin_key(request), True, timeout=pin_timeout())
+
+
+async def ais_pinned(request):
+    return await get_cache().aget(pin_key(request)) is not None
+
+
+async def apin_to_primary(request):
+    await get_cache().aset(pin_key(request), True, timeout=pin_timeout())
+
+
+class ReplicaRouter:
+    route_app_labels = {'hotel_app'}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in self.route_app_labels:
+            return read_database.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На реплике те же данные, что и в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика получает схему вместе с данными из основной базы
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,126 @@
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+EXPORT_FORMATS = ['csv', 'xlsx']
+CHUNK_SIZE = 2000
+# Сколько строк CSV объединяется в один фрагмент потокового ответа
+CSV_ROWS_PER_CHUNK = 500
+
+RESERVATION_COLUMNS = [
+    ('ID бронирования', 'id'),
+    ('Дата бронирования', 'booking_date'),
+    ('Дата заселения', 'arrival_date'),
+    ('Дата выселения', 'departure_date'),
+    ('Статус', 'status'),
+    ('Статус оплаты', 'payment_status'),
+    ('Стоимость при бронировании', 'price_at_booking'),
+    ('Итоговая стоимость', 'final_price'),
+    ('Номер комнаты', 'room__number'),
+    ('Тип комнаты', 'room__type__name'),
+    ('Номер паспорта', 'client__passport_number'),
+    ('Фамилия', 'client__last_name'),
+    ('Имя', 'client__first_name'),
+    ('Отчество', 'client__middle_name'),
+    ('Город', 'client__city_from'),
+    ('Администратор', 'admin__username'),
+]
+
+CLIENT_COLUMNS = [
+    ('ID клиента', 'id'),
+    ('Номер паспорта', 'passport_number'),
+    ('Фамилия', 'last_name'),
+    ('Имя', 'first_name'),
+    ('Отчество', 'middle_name'),
+    ('Город', 'city_from'),
+]
+
+
+class Echo:
+    # csv.writer пишет строку в "файл" и возвращает ее, не накапливая в памяти
+    def write(self, value):
+        return value
+
+
+def table_rows(queryset, columns):
+    yield [title for title, _ in columns]
+    # values_list + iterator не создают объекты моделей и читают строки порциями
+    # (на PostgreSQL через серверный курсор)
+    yield from queryset.order_by('pk').values_list(*[field for _, field in columns]).iterator(chunk_size=CHUNK_SIZE)
+
+
+def quarterly_report_rows(report):
+    yield ['Период', report['start_date'], report['end_date']]
+    yield []
+    yield ['Количество клиентов по комнатам']
+    yield ['Номер комнаты', 'Количество клиентов']
+    yield from ([row['room__number'], row['client_count']] for row in report['clients_per_room'])
+    yield []
+    yield ['Количество комнат по этажам']
+    yield ['Этаж', 'Количество комнат']
+    yield from ([row['floor'], row['room_count']] for row in report['rooms_per_floor'])
+    yield []
+    yield ['Доход по комнатам']
+    yield ['Номер комнаты', 'Доход']
+    yield from ([row['room__number'], row['total_income']] for row in report['income_per_room'])
+    yield []
+    yield ['Общий доход', report['total_income']]
+
+
+def csv_response(rows, filename):
+    writer = csv.writer(Echo())
+
+    def content():
+        # BOM нужен, чтобы Excel правильно определил кодировку UTF-8
+        yield '\ufeff'
+        chunk = []
+        for row in rows:
+            chunk.append(writer.writerow(row))
+            if len(chunk) == CSV_ROWS_PER_CHUNK:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+
+    response = StreamingHttpResponse(content(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(rows, filename):
+    # В режиме write_only строки сразу сбрасываются во временные файлы openpyxl, а готовая книга
+    # пишется на диск и отдается по частям, поэтому память не зависит от количества строк
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(filename)
+    for row in rows:
+        sheet.append(list(row))
+
+    stream = tempfile.TemporaryFile()
+    workbook.save(stream)
+    stream.seek(0)
+    return FileResponse(
+        stream,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+def export_error(file_format):
+    if file_format not in EXPORT_FORMATS:
+        return {"file_format": f"Неподдерживаемый формат {file_format}. Доступные форматы: {EXPORT_FORMATS}"}
+    if file_format == 'xlsx' and Workbook is None:
+        return {"file_format": "Экспорт в XLSX недоступен: не установлен пакет openpyxl."}
+    return None
+
+
+def export_response(rows, file_format, filename):
+    if file_format == 'xlsx':
+        return xlsx_response(rows, filename)
+    return csv_response(rows, filename)
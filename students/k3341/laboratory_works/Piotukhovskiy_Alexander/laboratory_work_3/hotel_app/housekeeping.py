@@ -0,0 +1,268 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .cache import invalidate
+from .models import CleaningSchedule, EmploymentContract, Reservation, Room, RoomNight
+
+CLEANER_POSITION = 'Уборщик'
+
+
+def resolve_cleaning_plans(plans):
+    # В запросах передаются ID сотрудников и номера комнат, в расписании хранятся ID контрактов и комнат
+    contracts = dict(EmploymentContract.objects.filter(
+        employee_id__in={plan['cleaner_id'] for plan in plans},
+        is_active=True
+    ).order_by('id').values_list('employee_id', 'id'))
+    rooms = dict(Room.objects.filter(
+        number__in={room_number for plan in plans for room_number in plan['room_ids']}
+    ).values_list('number', 'id'))
+
+    desired = {}
+    scope = set()
+    for plan in plans:
+        cleaner_id = contracts[plan['cleaner_id']]
+        for cleaning_date in plan['cleaning_dates']:
+            scope.add((cleaner_id, cleaning_date))
+            for room_number in plan['room_ids']:
+                desired[(cleaner_id, rooms[room_number], cleaning_date)] = plan.get('status') or 'PENDING'
+
+    return desired, scope
+
+
+def apply_cleaning_plans(plans, replace=False):
+    desired, scope = resolve_cleaning_plans(plans)
+
+    with transaction.atomic():
+        existing = CleaningSchedule.objects.filter(
+            cleaner_id__in={cleaner_id for cleaner_id, _ in scope},
+            cleaning_date__in={cleaning_date for _, cleaning_date in scope}
+        )
+        if not replace:
+            existing = existing.filter(room_id__in={room_id for _, room_id, _ in desired})
+
+        to_delete = []
+        to_update = defaultdict(list)
+        unchanged = 0
+        for schedule_id, cleaner_id, room_id, cleaning_date, status in existing.select_for_update().values_list(
+                'id', 'cleaner_id', 'room_id', 'cleaning_date', 'status'
+        ):
+            if (cleaner_id, cleaning_date) not in scope:
+                continue
+
+            key = (cleaner_id, room_id, cleaning_date)
+            if key not in desired:
+                # При замене плана удаляются уборки, которых нет в новом плане
+                if replace:
+                    to_delete.append(schedule_id)
+                continue
+
+            new_status = desired.pop(key)
+            if new_status != status:
+                to_update[new_status].append(schedule_id)
+            else:
+                unchanged += 1
+
+        if to_delete:
+            CleaningSchedule.objects.filter(id__in=to_delete).delete()
+        for status, schedule_ids in to_update.items():
+            CleaningSchedule.objects.filter(id__in=schedule_ids).update(status=status)
+        CleaningSchedule.objects.bulk_create(
+            [
+                CleaningSchedule(cleaner_id=cleaner_id, room_id=room_id, cleaning_date=cleaning_date, status=status)
+                for (cleaner_id, room_id, cleaning_date), status in desired.items()
+            ],
+            batch_size=1000
+        )
+
+        updated = sum(len(schedule_ids) for schedule_ids in to_update.values())
+        if to_delete or updated or desired:
+            invalidate(CleaningSchedule)
+
+    return {
+        "created": len(desired),
+        "updated": updated,
+        "deleted": len(to_delete),
+        "unchanged": unchanged,
+    }
+
+
+def cleaning_demand(start_date, end_date):
+    # Комнаты, ожидающие уборки, убираются в первый день периода, остальные - в день выезда гостя
+    demand = {}
+    rooms = Room.objects.exclude(status='MAINTENANCE')
+    for room_id, number, floor, capacity in rooms.filter(status='REQUIRES_CLEANING').values_list(
+            'id', 'number', 'floor', 'type__capacity'
+    ):
+        demand[(room_id, start_date)] = (number, floor, capacity)
+
+    checkouts = Reservation.objects.filter(
+        departure_date__gte=start_date,
+        departure_date__lte=end_date,
+        status__in=Reservation.ACTIVE_STATUSES,
+        room__in=rooms
+    ).values_list('room_id', 'departure_date', 'room__number', 'room__floor', 'room__type__capacity')
+    for room_id, departure_date, number, floor, capacity in checkouts:
+        demand[(room_id, departure_date)] = (number, floor, capacity)
+
+    return demand
+
+
+def available_cleaners(start_date, end_date, position_ids=None):
+    contracts = EmploymentContract.objects.filter(
+        Q(end_date__isnull=True) | Q(end_date__gte=start_date),
+        Q(termination_date__isnull=True) | Q(termination_date__gte=start_date),
+        is_active=True,
+        start_date__lte=end_date
+    )
+    if position_ids:
+        contracts = contracts.filter(position_id__in=position_ids)
+    else:
+        contracts = contracts.filter(position__name=CLEANER_POSITION)
+
+    cleaners = defaultdict(list)
+    for contract_id, employee_id, contract_start, contract_end, termination_date in contracts.order_by('id').values_list(
+            'id', 'employee_id', 'start_date', 'end_date', 'termination_date'
+    ):
+        last_day = min(day for day in (contract_end, termination_date, end_date) if day is not None)
+        day = max(contract_start, start_date)
+        while day <= last_day:
+            cleaners[day].append((contract_id, employee_id))
+            day += timedelta(days=1)
+    return cleaners
+
+
+def assign_cleanings(start_date, end_date, position_ids=None, dry_run=False):
+    demand = cleaning_demand(start_date, end_date)
+    cleaners = available_cleaners(start_date, end_date, position_ids)
+
+    # Уже запланированные уборки не переназначаются, но учитываются в нагрузке сотрудников
+    load = defaultdict(int)
+    for room_id, cleaner_id, cleaning_date, capacity in CleaningSchedule.objects.filter(
+            cleaning_date__gte=start_date,
+            cleaning_date__lte=end_date
+    ).values_list('room_id', 'cleaner_id', 'cleaning_date', 'room__type__capacity'):
+        load[(cleaner_id, cleaning_date)] += capacity
+        demand.pop((room_id, cleaning_date), None)
+
+    tasks = defaultdict(list)
+    for (room_id, cleaning_date), (number, floor, capacity) in demand.items():
+        tasks[cleaning_date].append((capacity, floor, number, room_id))
+
+    schedules = []
+    assignments = []
+    unassigned = []
+    for cleaning_date in sorted(tasks):
+        day_cleaners = cleaners.get(cleaning_date, [])
+        if not day_cleaners:
+            unassigned.extend(
+                {"date": cleaning_date, "room_number": number}
+                for _, _, number, _ in sorted(tasks[cleaning_date], key=lambda task: task[2])
+            )
+            continue
+
+        # Жадная балансировка: самые трудоемкие номера достаются наименее загруженному сотруднику
+        heap = [
+            (load[(contract_id, cleaning_date)], index, contract_id, employee_id)
+            for index, (contract_id, employee_id) in enumerate(day_cleaners)
+        ]
+        heapq.heapify(heap)
+        rooms_by_cleaner = defaultdict(list)
+        for capacity, _, number, room_id in sorted(tasks[cleaning_date], key=lambda task: (-task[0], task[1], task[2])):
+            cleaner_load, index, contract_id, employee_id = heap[0]
+            heapq.heapreplace(heap, (cleaner_load + capacity, index, contract_id, employee_id))
+            rooms_by_cleaner[(contract_id, employee_id)].append(number)
+            schedules.append(CleaningSchedule(cleaner_id=contract_id, room_id=room_id, cleaning_date=cleaning_date))
+
+        for cleaner_load, _, contract_id, employee_id in sorted(heap, key=lambda item: item[1]):
+            room_numbers = rooms_by_cleaner.get((contract_id, employee_id))
+            if room_numbers:
+                assignments.append({
+                    "date": cleaning_date,
+                    "cleaner_id": employee_id,
+                    "rooms": sorted(room_numbers),
+                    "load": cleaner_load,
+                })
+
+    if schedules and not dry_run:
+        with transaction.atomic():
+            CleaningSchedule.objects.bulk_create(schedules, batch_size=1000)
+            invalidate(CleaningSchedule)
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "created": 0 if dry_run else len(schedules),
+        "planned": len(schedules),
+        "assignments": assignments,
+        "unassigned": unassigned,
+    }
+
+
+def room_status_rules(day):
+    cleaned_today = Q(id__in=CleaningSchedule.objects.filter(
+        cleaning_date=day, status='COMPLETED'
+    ).values('room_id'))
+    last_departure = Reservation.objects.filter(
+        room=OuterRef(OuterRef('pk')), departure_date__lte=day
+    ).exclude(status='CANCELLED').order_by('-departure_date').values('departure_date')[:1]
+    # Уборка учитывается, если она выполнена в день последнего выезда или позже: пропущенный ночной запуск
+    # или уборка, отмеченная с опозданием, не оставляют чистую комнату грязной. Для комнат без выездов
+    # учитываются уборки за вчера и сегодня
+    cleaned_since_departure = Q(Exists(CleaningSchedule.objects.filter(
+        room=OuterRef('pk'),
+        status='COMPLETED',
+        cleaning_date__lte=day,
+        cleaning_date__gte=Coalesce(
+            Subquery(last_departure), Value(day - timedelta(days=1)), output_field=models.DateField()
+        ),
+    )))
+    departures = Q(id__in=Reservation.objects.filter(
+        departure_date=day
+    ).exclude(status='CANCELLED').values('room_id'))
+    # Комната, не убранная после прошлых выездов, остается грязной, пока уборку не отметят выполненной
+    carried_over = Q(status__in=['REQUIRES_CLEANING', 'CLEANING_IN_PROGRESS']) & ~cleaned_since_departure
+
+    # Правила проверяются по порядку: комната получает статус первого подходящего правила
+    return [
+        ('CLEANING_IN_PROGRESS', Q(id__in=CleaningSchedule.objects.filter(
+            cleaning_date=day, status='IN_PROGRESS'
+        ).values('room_id'))),
+        ('REQUIRES_CLEANING', (departures | carried_over) & ~cleaned_today),
+        ('OCCUPIED', Q(id__in=RoomNight.objects.filter(date=day).values('room_id'))),
+        ('AVAILABLE', Q()),
+    ]
+
+
+def rollover_room_statuses(day, dry_run=False):
+    # Статус каждой комнаты пересчитывается несколькими UPDATE по всей таблице, по одному на статус;
+    # комнаты на обслуживании не меняются, повторный запуск за тот же день ничего не меняет
+    rooms = Room.objects.exclude(status='MAINTENANCE')
+    changes = []
+    matched = Q()
+
+    with transaction.atomic():
+        for status, condition in room_status_rules(day):
+            target = rooms.filter(condition).exclude(matched).exclude(status=status)
+            changes.extend(
+                {"room_number": number, "previous_status": previous_status, "status": status}
+                for number, previous_status in target.select_for_update().order_by('number').values_list(
+                    'number', 'status'
+                )
+            )
+            if not dry_run:
+                target.update(status=status)
+            matched |= condition
+
+        if changes and not dry_run:
+            invalidate(Room)
+
+    return {
+        "date": day,
+        "changed": len(changes),
+        "changes": changes,
+    }
@@ -0,0 +1,208 @@
+import csv
+import io
+import json
+
+from django.db import DatabaseError, transaction
+
+from .availability import reservation_nights, sync_room_nights
+from .cache import invalidate
+from .models import Client, Reservation, Room, RoomNight
+from .pricing import quote_stays
+from .rollups import refresh_daily_stats
+from .serializers import ReservationImportRowSerializer
+
+CLIENT_FIELDS = ['first_name', 'last_name', 'middle_name', 'city_from']
+FILE_FORMATS = ['csv', 'jsonl']
+
+
+def read_rows(stream, file_format):
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.BytesIO(stream)
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if file_format == 'csv':
+        for row_number, row in enumerate(csv.DictReader(stream), start=1):
+            yield row_number, {key: value for key, value in row.items() if value not in ('', None)}, None
+        return
+
+    for row_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_number, None, {"non_field_errors": ["Строка не является корректным JSON."]}
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, {"non_field_errors": ["Строка должна содержать JSON-объект."]}
+            continue
+        yield row_number, row, None
+
+
+class ReservationImporter:
+
+    def __init__(self, admin, chunk_size=1000):
+        self.admin = admin
+        self.chunk_size = chunk_size
+        self.rooms = {}
+        self.processed = 0
+        self.created = 0
+        self.errors = []
+
+    def run(self, rows):
+        chunk = []
+        for row_number, row, parse_errors in rows:
+            self.processed += 1
+            if parse_errors:
+                self.add_error(row_number, parse_errors)
+                continue
+
+            serializer = ReservationImportRowSerializer(data=row)
+            if not serializer.is_valid():
+                self.add_error(row_number, serializer.errors)
+                continue
+
+            chunk.append((row_number, serializer.validated_data))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+
+        if chunk:
+            self.import_chunk(chunk)
+
+        return self.summary()
+
+    def summary(self):
+        return {
+            "processed": self.processed,
+            "created": self.created,
+            "failed": len(self.errors),
+            "errors": sorted(self.errors, key=lambda error: error['row'])
+        }
+
+    def add_error(self, row_number, errors):
+        self.errors.append({"row": row_number, "errors": errors})
+
+    def load_rooms(self, room_numbers):
+        missing_numbers = set(room_numbers) - set(self.rooms)
+        if missing_numbers:
+            for room in Room.objects.filter(number__in=missing_numbers).only('id', 'number', 'type_id', 'status'):
+                self.rooms[room.number] = room
+        return self.rooms
+
+    def reject_unavailable(self, chunk):
+        rooms = self.load_rooms(data['room_number'] for _, data in chunk)
+
+        accepted = []
+        for row_number, data in chunk:
+            room = rooms.get(data['room_number'])
+            if room is None:
+                self.add_error(row_number, {"room_number": [f"Комната с номером {data['room_number']} не найдена."]})
+            elif room.status == 'MAINTENANCE':
+                self.add_error(row_number, {"room_number": ["Комната недоступна для заселения."]})
+            else:
+                data['room'] = room
+                accepted.append((row_number, data))
+
+        if not accepted:
+            return accepted
+
+        occupied = set(RoomNight.objects.filter(
+            room_id__in={data['room'].id for _, data in accepted},
+            date__gte=min(data['arrival_date'] for _, data in accepted),
+            date__lt=max(data['departure_date'] for _, data in accepted)
+        ).values_list('room_id', 'date'))
+
+        available = []
+        for row_number, data in accepted:
+            nights = reservation_nights(self.build_reservation(data))
+            if nights & occupied:
+                self.add_error(row_number, {"room_number": ["Комната уже забронирована на указанные даты."]})
+                continue
+            # Учитываем и пересечения между строками одного файла
+            occupied |= nights
+            available.append((row_number, data))
+
+        return available
+
+    def upsert_clients(self, chunk):
+        client_data = {}
+        for _, data in chunk:
+            client_data[data['passport_number']] = {
+                "first_name": data['first_name'],
+                "last_name": data['last_name'],
+                "middle_name": data.get('middle_name') or None,
+                "city_from": data['city_from'],
+            }
+
+        clients = Client.objects.in_bulk(client_data, field_name='passport_number')
+        changed = []
+        for passport_number, client in clients.items():
+            values = client_data[passport_number]
+            if any(getattr(client, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(client, field, value)
+                changed.append(client.fill_search_fields())
+        Client.objects.bulk_update(changed, CLIENT_FIELDS + Client.SEARCH_FIELDS, batch_size=1000)
+
+        new_clients = Client.objects.bulk_create(
+            [
+                Client(passport_number=passport_number, **values).fill_search_fields()
+                for passport_number, values in client_data.items()
+                if passport_number not in clients
+            ],
+            batch_size=1000
+        )
+        if new_clients and new_clients[0].pk is None:
+            new_clients = Client.objects.filter(passport_number__in=[client.passport_number for client in new_clients])
+        clients.update((client.passport_number, client) for client in new_clients)
+        return clients
+
+    def build_reservation(self, data, client=None, price=0):
+        return Reservation(
+            client=client,
+            room=data['room'],
+            admin=self.admin,
+            arrival_date=data['arrival_date'],
+            departure_date=data['departure_date'],
+            status=data.get('status') or Reservation._meta.get_field('status').get_default(),
+            payment_status=data.get('payment_status') or Reservation._meta.get_field('payment_status').get_default(),
+            price_at_booking=price,
+            final_price=price,
+        )
+
+    def import_chunk(self, chunk):
+        try:
+            with transaction.atomic():
+                chunk = self.reject_unavailable(chunk)
+                if not chunk:
+                    return
+
+                clients = self.upsert_clients(chunk)
+                prices = quote_stays(
+                    (data['room'].type_id, data['arrival_date'], data['departure_date'])
+                    for _, data in chunk
+                )
+                reservations = Reservation.objects.bulk_create(
+                    [
+                        self.build_reservation(data, clients[data['passport_number']], price)
+                        for (_, data), price in zip(chunk, prices)
+                    ],
+                    batch_size=1000
+                )
+
+                # bulk_create не отправляет сигналы, поэтому индексы обновляются явно
+                sync_room_nights(reservations)
+                invalidate(Client, Reservation)
+                refresh_daily_stats(
+                    {reservation.room_id for reservation in reservations},
+                    min(reservation.arrival_date for reservation in reservations),
+                    max(reservation.departure_date for reservation in reservations)
+                )
+        except DatabaseError as error:
+            for row_number, _ in chunk:
+                self.add_error(row_number, {"non_field_errors": [f"Ошибка записи в базу данных: {error}"]})
+            return
+
+        self.created += len(reservations)
@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from hotel_app.housekeeping import assign_cleanings
+
+
+class Command(BaseCommand):
+    help = 'Автоматически распределяет уборки между уборщиками на период.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=date.fromisoformat, default=None,
+                            help='Дата начала периода (YYYY-MM-DD), по умолчанию сегодня.')
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                            help='Дата окончания периода включительно (YYYY-MM-DD), по умолчанию дата начала.')
+        parser.add_argument('--position-id', dest='position_ids', type=int, action='append',
+                            help='ID должности уборщиков, можно указать несколько раз.')
+        parser.add_argument('--dry-run', action='store_true', help='Только рассчитать распределение, не сохраняя его.')
+
+    def handle(self, *args, **options):
+        start_date = options['start_date'] or date.today()
+        end_date = options['end_date'] or start_date
+        if end_date < start_date:
+            raise CommandError('Дата окончания не может быть раньше даты начала.')
+
+        try:
+            result = assign_cleanings(start_date, end_date, options['position_ids'], options['dry_run'])
+        except IntegrityError:
+            raise CommandError('Расписание было изменено другим процессом, повторите попытку.')
+
+        for assignment in result['assignments']:
+            self.stdout.write(
+                f"{assignment['date']}  сотрудник {assignment['cleaner_id']}: "
+                f"{', '.join(map(str, assignment['rooms']))} (нагрузка {assignment['load']})"
+            )
+        for item in result['unassigned']:
+            self.stderr.write(f"{item['date']}  комната {item['room_number']}: нет доступных уборщиков")
+        self.stdout.write(self.style.SUCCESS(
+            f"Запланировано уборок: {result['planned']}, сохранено: {result['created']}, "
+            f"не распределено: {len(result['unassigned'])}."
+        ))
@@ -0,0 +1,130 @@
+import json
+import logging
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_app.benchmark import build_scenarios, run_benchmark, compare, uncovered_url_names, build_serving_paths, \
+    compare_serving, run_booking_load, compare_renderers
+
+
+class Command(BaseCommand):
+    help = 'Измеряет время ответа и количество SQL-запросов для эндпоинтов hotel_app.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Количество запросов к каждому эндпоинту.')
+        parser.add_argument('--user', default=None, help='Имя пользователя, от имени которого выполняются запросы.')
+        parser.add_argument('--only', nargs='+', default=None, help='Имена сценариев (имена маршрутов) для запуска.')
+        parser.add_argument('--output', help='Сохранить результаты в JSON-файл.')
+        parser.add_argument('--compare', dest='baseline', help='JSON-файл с результатами предыдущего запуска.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост p95 относительно базового запуска (0.2 = 20%%).')
+        parser.add_argument('--asgi', action='store_true',
+                            help='Сравнить синхронные эндпоинты с асинхронными под конкурентной нагрузкой.')
+        parser.add_argument('--bookings', action='store_true',
+                            help='Конкурентно бронировать одну и ту же и разные комнаты и проверить отсутствие '
+                                 'двойных бронирований.')
+        parser.add_argument('--renderers', action='store_true',
+                            help='Сравнить время кодирования ответов стандартным JSONRenderer и FastJSONRenderer.')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Количество одновременных запросов для --asgi и --bookings.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Количество запросов к каждому пути для --asgi и --bookings.')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).first() or User.objects.first()
+        if user is None:
+            raise CommandError('Пользователь не найден, создайте его или укажите --user.')
+
+        # Ответы 4xx ожидаемы для части сценариев и не должны засорять вывод
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        if options['asgi']:
+            return self.handle_serving(user, options)
+        if options['bookings']:
+            return self.handle_bookings(user, options)
+
+        scenarios = build_scenarios()
+        if not scenarios:
+            raise CommandError('Недостаточно данных для измерений, заполните базу командой seed_hotel_data.')
+        if options['renderers']:
+            return self.handle_renderers(user, scenarios, options)
+        for name in uncovered_url_names(scenarios):
+            self.stderr.write(self.style.WARNING(f'Для маршрута {name} нет сценария измерения.'))
+
+        report = run_benchmark(user, scenarios, options['iterations'], options['only'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+
+        if not options['baseline']:
+            for name, result in sorted(report['endpoints'].items()):
+                self.stdout.write(
+                    f'{name:32} {result["status"]}  p50 {result["p50_ms"]:9.2f}  p95 {result["p95_ms"]:9.2f}  '
+                    f'p99 {result["p99_ms"]:9.2f} ms  cpu {result["cpu_ms"]:9.2f} ms  '
+                    f'{result["bytes"]:9} B  queries {result["queries"]:4}  '
+                    f'из кэша p95 {result["cached"]["p95_ms"]:9.2f} ms  queries {result["cached"]["queries"]:4}'
+                )
+            return
+
+        with open(options['baseline'], encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        lines, regressions = compare(baseline, report, options['threshold'])
+        for line in lines:
+            self.stdout.write(line)
+        if regressions:
+            raise CommandError(f'Обнаружены регрессии: {", ".join(regressions)}.')
+        self.stdout.write(self.style.SUCCESS('Регрессий не обнаружено.'))
+
+    def handle_renderers(self, user, scenarios, options):
+        report = compare_renderers(user, scenarios, options['iterations'], options['only'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+
+        for name, result in sorted(report['renderers'].items()):
+            standard, fast = result['json'], result['fast']
+            speedup = standard['cpu_ms'] / fast['cpu_ms'] if fast['cpu_ms'] else 0
+            self.stdout.write(
+                f'{name:32} json {standard["cpu_ms"]:8.3f} ms  fast {fast["cpu_ms"]:8.3f} ms  '
+                f'(x{speedup:.1f})  {fast["bytes"]:9} B'
+            )
+
+    def handle_serving(self, user, options):
+        paths = build_serving_paths()
+        if not paths:
+            raise CommandError('Недостаточно данных для измерений, заполните базу командой seed_hotel_data.')
+
+        report = compare_serving(user, paths, options['concurrency'], options['requests'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+
+        for path, result in report['paths'].items():
+            self.stdout.write(path)
+            for mode in ('wsgi', 'asgi'):
+                stats = result[mode]
+                self.stdout.write(
+                    f'  {mode}  {stats["statuses"]}  {stats["rps"]:8.1f} req/s  '
+                    f'p50 {stats["p50_ms"]:9.2f}  p95 {stats["p95_ms"]:9.2f} ms'
+                )
+
+    def handle_bookings(self, user, options):
+        report = run_booking_load(user, options['concurrency'], options['requests'])
+        if not report:
+            raise CommandError('Недостаточно данных для измерений, заполните базу командой seed_hotel_data.')
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+
+        for mode, stats in report['modes'].items():
+            self.stdout.write(
+                f'{mode:16} {stats["rps"]:8.1f} req/s  p50 {stats["p50_ms"]:9.2f}  p95 {stats["p95_ms"]:9.2f} ms  '
+                f'created {stats["created"]:4}  rejected {stats["rejected"]:4}  statuses {stats["statuses"]}'
+            )
+        if any(stats['double_booked_rooms'] for stats in report['modes'].values()):
+            raise CommandError('Обнаружены двойные бронирования.')
+        self.stdout.write(self.style.SUCCESS('Двойных бронирований не обнаружено.'))
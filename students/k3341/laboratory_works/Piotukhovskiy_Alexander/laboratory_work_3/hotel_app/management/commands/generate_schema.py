@@ -0,0 +1,33 @@
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import resolve, reverse
+
+from hotel_app.schema import SPEC_RENDERERS, render_schema
+
+
+class Command(BaseCommand):
+    help = ('Заранее генерирует OpenAPI-схему и сохраняет ее в кэш ответов, чтобы первый запрос к /swagger '
+            'не ждал генерации. Имеет смысл при общем для воркеров кэше (Redis, Memcached, база данных).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/',
+                            help='Адрес, по которому клиенты открывают API, например https://hotel.example.com/.')
+        parser.add_argument('--output', help='Дополнительно записать схему в JSON-файл.')
+
+    def handle(self, *args, **options):
+        parts = urlsplit(options['url'])
+        if not parts.scheme or not parts.netloc:
+            raise CommandError('Укажите адрес вместе со схемой, например https://hotel.example.com/.')
+        url = f'{parts.scheme}://{parts.netloc}'
+
+        view_class = resolve(reverse('schema-swagger-ui')).func.view_class
+        contents = {
+            renderer_class.format: render_schema(view_class, url, '', renderer_class())
+            for renderer_class in SPEC_RENDERERS
+        }
+        if options['output']:
+            with open(options['output'], 'wb') as file:
+                file.write(contents['openapi'])
+
+        self.stdout.write(self.style.SUCCESS(f'Схема для {url} сгенерирована ({len(contents["openapi"])} байт).'))
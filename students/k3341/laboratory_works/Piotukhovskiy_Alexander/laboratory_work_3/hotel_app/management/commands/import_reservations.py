@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_app.importer import FILE_FORMATS, ReservationImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Импортирует бронирования из файла CSV или JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с бронированиями.')
+        parser.add_argument('--admin', required=True, help='Имя пользователя администратора, создающего бронирования.')
+        parser.add_argument('--format', dest='file_format', choices=FILE_FORMATS,
+                            help='Формат файла. По умолчанию определяется по расширению.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Количество строк в одной транзакции.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in FILE_FORMATS:
+            raise CommandError('Не удалось определить формат файла, укажите --format csv или --format jsonl.')
+
+        try:
+            admin = User.objects.get(username=options['admin'])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['admin']} не найден.")
+
+        importer = ReservationImporter(admin=admin, chunk_size=options['chunk_size'])
+        with open(path, 'rb') as stream:
+            result = importer.run(read_rows(stream, file_format))
+
+        for error in result['errors']:
+            self.stderr.write(f"Строка {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Обработано строк: {result['processed']}, создано бронирований: {result['created']}, "
+            f"ошибок: {result['failed']}."
+        ))
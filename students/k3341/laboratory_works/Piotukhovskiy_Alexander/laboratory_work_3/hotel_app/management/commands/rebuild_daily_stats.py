@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel_app.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает ежедневную статистику номеров (RoomDailyStat) по бронированиям.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=date.fromisoformat, help='Начало периода (YYYY-MM-DD).')
+        parser.add_argument('--end-date', type=date.fromisoformat, help='Конец периода, не включительно (YYYY-MM-DD).')
+        parser.add_argument('--rooms-per-batch', type=int, default=100, help='Количество номеров в одной пачке.')
+
+    def handle(self, *args, **options):
+        start_date = options['start_date']
+        end_date = options['end_date']
+        if start_date and end_date and start_date >= end_date:
+            raise CommandError('Дата окончания должна быть позже даты начала.')
+
+        total = rebuild_daily_stats(start_date, end_date, rooms_per_batch=options['rooms_per_batch'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано записей статистики: {total}.'))
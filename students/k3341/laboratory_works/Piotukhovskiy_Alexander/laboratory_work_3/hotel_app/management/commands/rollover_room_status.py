@@ -0,0 +1,30 @@
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from hotel_app.housekeeping import rollover_room_statuses
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает статусы всех комнат на день по заездам, выездам и расписанию уборок. '
+            'Предназначена для ежедневного запуска по расписанию.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help='День, на который пересчитываются статусы (YYYY-MM-DD), по умолчанию сегодня.')
+        parser.add_argument('--dry-run', action='store_true', help='Показать изменения, не сохраняя их.')
+
+    def handle(self, *args, **options):
+        day = options['date'] or date.today()
+        result = rollover_room_statuses(day, dry_run=options['dry_run'])
+
+        transitions = Counter((change['previous_status'], change['status']) for change in result['changes'])
+        for (previous_status, status), count in sorted(transitions.items()):
+            self.stdout.write(f'{previous_status} -> {status}: {count}')
+        if options['verbosity'] > 1:
+            for change in result['changes']:
+                self.stdout.write(f"  комната {change['room_number']}: {change['previous_status']} -> {change['status']}")
+
+        prefix = 'Будет изменено' if options['dry_run'] else 'Изменено'
+        self.stdout.write(self.style.SUCCESS(f"{prefix} статусов комнат на {day}: {result['changed']}."))
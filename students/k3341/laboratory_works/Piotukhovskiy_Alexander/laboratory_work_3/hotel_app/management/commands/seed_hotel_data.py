@@ -0,0 +1,218 @@
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from hotel_app.availability import sync_room_nights
+from hotel_app.cache import invalidate
+from hotel_app.models import RoomType, RoomPriceHistory, Room, Client, Reservation, EmployeePosition, \
+    EmploymentContract, Employee, CleaningSchedule
+from hotel_app.pricing import quote_stays
+from hotel_app.rollups import rebuild_daily_stats
+
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург', 'Самара', 'Омск', 'Сочи']
+FIRST_NAMES = ['Иван', 'Анна', 'Пётр', 'Мария', 'Алексей', 'Ольга', 'Дмитрий', 'Елена']
+LAST_NAMES = ['Иванов', 'Петрова', 'Смирнов', 'Кузнецова', 'Попов', 'Соколова', 'Лебедев', 'Козлова']
+MIDDLE_NAMES = ['Иванович', 'Александровна', 'Петрович', 'Сергеевна', None]
+POSITIONS = [('Уборщик', 35000), ('Администратор', 60000), ('Менеджер', 80000)]
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными гостиницы для нагрузочного тестирования.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора случайных чисел.')
+        parser.add_argument('--room-types', type=int, default=5)
+        parser.add_argument('--price-periods', type=int, default=12, help='Периодов цен на каждый тип номера.')
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--clients', type=int, default=5000)
+        parser.add_argument('--reservations', type=int, default=20000)
+        parser.add_argument('--employees', type=int, default=30)
+        parser.add_argument('--cleanings', type=int, default=10000)
+        parser.add_argument('--start-date', type=date.fromisoformat, default=date(2024, 1, 1),
+                            help='Дата начала истории бронирований (YYYY-MM-DD).')
+        parser.add_argument('--clear', action='store_true', help='Удалить существующие данные гостиницы перед заполнением.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start_date = options['start_date']
+
+        with transaction.atomic():
+            if options['clear']:
+                for model in [CleaningSchedule, Reservation, EmploymentContract, Employee, EmployeePosition, Client,
+                              Room, RoomPriceHistory, RoomType]:
+                    model.objects.all().delete()
+
+            admin, _ = User.objects.get_or_create(username='seed_admin', defaults={'is_staff': True})
+            room_types = self.create_room_types(rng, options['room_types'], options['price_periods'], start_date)
+            rooms = self.create_rooms(rng, options['rooms'], room_types)
+            clients = self.create_clients(rng, options['clients'])
+            reservations = self.create_reservations(rng, options['reservations'], rooms, clients, admin, start_date)
+            contracts = self.create_staff(rng, options['employees'], start_date)
+            cleanings = self.create_cleanings(rng, options['cleanings'], rooms, contracts, start_date)
+
+            for offset in range(0, len(reservations), 2000):
+                sync_room_nights(reservations[offset:offset + 2000])
+            stats = rebuild_daily_stats()
+            invalidate(RoomType, RoomPriceHistory, Room, Client, Reservation, EmployeePosition, Employee,
+                       EmploymentContract, CleaningSchedule)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: типов номеров {len(room_types)}, номеров {len(rooms)}, клиентов {len(clients)}, '
+            f'бронирований {len(reservations)}, контрактов {len(contracts)}, уборок {len(cleanings)}, '
+            f'записей статистики {stats}.'
+        ))
+
+    def create_room_types(self, rng, count, price_periods, start_date):
+        room_types = RoomType.objects.bulk_create(
+            RoomType(
+                name=f'Тип {index + 1}',
+                capacity=rng.randint(1, 4),
+                has_wifi=rng.random() < 0.9,
+                has_tv=rng.random() < 0.8,
+                has_safe=rng.random() < 0.5,
+                has_balcony=rng.random() < 0.3,
+            )
+            for index in range(RoomType.objects.count(), RoomType.objects.count() + count)
+        )
+
+        period_length = 730 // max(price_periods, 1)
+        prices = []
+        for room_type in room_types:
+            base_price = rng.randint(20, 100) * 100
+            for index in range(price_periods):
+                period_start = start_date + timedelta(days=index * period_length)
+                is_last = index == price_periods - 1
+                prices.append(RoomPriceHistory(
+                    room_type=room_type,
+                    start_date=period_start,
+                    end_date=None if is_last else period_start + timedelta(days=period_length - 1),
+                    price=base_price + rng.randint(-10, 10) * 100,
+                ))
+        RoomPriceHistory.objects.bulk_create(prices, batch_size=2000)
+        return room_types
+
+    def create_rooms(self, rng, count, room_types):
+        taken_numbers = set(Room.objects.values_list('number', flat=True))
+        rooms = []
+        floor, index = 1, 1
+        while len(rooms) < count:
+            number = floor * 100 + index
+            if number not in taken_numbers:
+                rooms.append(Room(number=number, type=rng.choice(room_types), phone=f'{number:07d}'))
+            index += 1
+            if index == 100:
+                floor, index = floor + 1, 1
+        return Room.objects.bulk_create(rooms, batch_size=2000)
+
+    def create_clients(self, rng, count):
+        offset = Client.objects.count()
+        return Client.objects.bulk_create(
+            (
+                Client(
+                    passport_number=f'{offset + index:010d}',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    middle_name=rng.choice(MIDDLE_NAMES),
+                    city_from=rng.choice(CITIES),
+                ).fill_search_fields()
+                for index in range(count)
+            ),
+            batch_size=2000
+        )
+
+    def create_reservations(self, rng, count, rooms, clients, admin, start_date):
+        if not rooms or not clients:
+            return []
+
+        today = date.today()
+        next_free_date = {room.id: start_date for room in rooms}
+        stays = []
+        for _ in range(count):
+            room = rng.choice(rooms)
+            arrival_date = next_free_date[room.id] + timedelta(days=rng.randint(0, 5))
+            departure_date = arrival_date + timedelta(days=rng.randint(1, 10))
+            next_free_date[room.id] = departure_date
+
+            if departure_date <= today:
+                status = rng.choice(['CHECKED_OUT'] * 9 + ['CANCELLED'])
+            elif arrival_date <= today:
+                status = 'CHECKED_IN'
+            else:
+                status = rng.choice(['BOOKED', 'CONFIRMED'])
+            stays.append((room, rng.choice(clients), arrival_date, departure_date, status))
+
+        prices = quote_stays((room.type_id, arrival_date, departure_date) for room, _, arrival_date, departure_date, _ in stays)
+        return Reservation.objects.bulk_create(
+            (
+                Reservation(
+                    room=room,
+                    client=client,
+                    admin=admin,
+                    booking_date=arrival_date - timedelta(days=rng.randint(0, 60)),
+                    arrival_date=arrival_date,
+                    departure_date=departure_date,
+                    status=status,
+                    payment_status='PAID' if status == 'CHECKED_OUT' else rng.choice(['PREPAID', 'UNPAID']),
+                    price_at_booking=price,
+                    final_price=price,
+                )
+                for (room, client, arrival_date, departure_date, status), price in zip(stays, prices)
+            ),
+            batch_size=2000
+        )
+
+    def create_staff(self, rng, count, start_date):
+        positions = []
+        for name, salary in POSITIONS:
+            position, _ = EmployeePosition.objects.get_or_create(name=name, defaults={'salary': salary})
+            positions.append(position)
+
+        offset = Employee.objects.count()
+        employees = Employee.objects.bulk_create(
+            Employee(
+                passport_number=f'E{offset + index:09d}',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                middle_name=rng.choice(MIDDLE_NAMES),
+            )
+            for index in range(count)
+        )
+        return EmploymentContract.objects.bulk_create(
+            EmploymentContract(
+                employee=employee,
+                # Большая часть сотрудников - уборщики
+                position=positions[0] if index % 4 else rng.choice(positions[1:]),
+                contract_type='PERMANENT',
+                start_date=start_date,
+            )
+            for index, employee in enumerate(employees)
+        )
+
+    def create_cleanings(self, rng, count, rooms, contracts, start_date):
+        cleaners = [contract for contract in contracts if contract.position.name == POSITIONS[0][0]]
+        if not rooms or not cleaners:
+            return []
+
+        planned = set()
+        days = (date.today() + timedelta(days=14) - start_date).days
+        for _ in range(count * 2):
+            if len(planned) >= count:
+                break
+            planned.add((rng.choice(cleaners).id, rng.choice(rooms).id, start_date + timedelta(days=rng.randint(0, days))))
+
+        today = date.today()
+        return CleaningSchedule.objects.bulk_create(
+            (
+                CleaningSchedule(
+                    cleaner_id=cleaner_id,
+                    room_id=room_id,
+                    cleaning_date=cleaning_date,
+                    status='COMPLETED' if cleaning_date < today else 'PENDING',
+                )
+                for cleaner_id, room_id, cleaning_date in sorted(planned)
+            ),
+            batch_size=2000
+        )
@@ -0,0 +1,172 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from rest_framework.serializers import BaseSerializer
+
+DURATION_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HISTOGRAMS = {
+    'hotel_request_duration_ms': ('Полное время обработки запроса, мс.', DURATION_BUCKETS),
+    'hotel_db_duration_ms': ('Суммарное время SQL-запросов за запрос, мс.', DURATION_BUCKETS),
+    'hotel_serializer_duration_ms': ('Время сериализации ответа, мс.', DURATION_BUCKETS),
+    'hotel_db_queries': ('Количество SQL-запросов за запрос.', QUERY_BUCKETS),
+}
+
+current_metrics = ContextVar('hotel_request_metrics', default=None)
+
+
+class RequestMetrics:
+
+    def __init__(self, keep_queries=True):
+        self.started = time.perf_counter()
+        self.keep_queries = keep_queries
+        self.queries = []
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.serializer_ms = 0.0
+        self.serializer_depth = 0
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.query_count += 1
+            self.db_ms += duration
+            if self.keep_queries:
+                self.queries.append((duration, sql))
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    # Обертка ставится на соединение постоянно, а не на время запроса: асинхронные представления
+    # выполняют SQL в потоках sync_to_async, у которых свои соединения. Контекст запроса
+    # передается в эти потоки через current_metrics. Обертка ставится первой, чтобы не сломать
+    # стек оберток connection.execute_wrapper, которые снимаются через pop()
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, route, method, status, metrics, total_ms):
+        values = {
+            'hotel_request_duration_ms': total_ms,
+            'hotel_db_duration_ms': metrics.db_ms,
+            'hotel_serializer_duration_ms': metrics.serializer_ms,
+            'hotel_db_queries': metrics.query_count,
+        }
+        labels = (route, method, str(status))
+        with self.lock:
+            for name, value in values.items():
+                key = (name, labels)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+                self.histograms[key].observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self):
+        with self.lock:
+            snapshot = {
+                key: (histogram.buckets, list(histogram.counts), histogram.count, histogram.sum)
+                for key, histogram in self.histograms.items()
+            }
+
+        lines = []
+        for name, (description, _) in HISTOGRAMS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for (metric, (route, method, status)), (buckets, counts, count, total) in sorted(snapshot.items()):
+                if metric != name:
+                    continue
+                labels = f'route="{escape_label(route)}",method="{method}",status="{status}"'
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {format_value(total)}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_value(value):
+    return f'{value:.3f}'.rstrip('0').rstrip('.')
+
+
+registry = Registry()
+
+
+def server_timing(metrics, total_ms):
+    return ', '.join([
+        f'db;dur={metrics.db_ms:.2f};desc="{metrics.query_count} queries"',
+        f'serializer;dur={metrics.serializer_ms:.2f}',
+        f'total;dur={total_ms:.2f}',
+    ])
+
+
+def instrument_serializers():
+    # Время сериализации считается по внешнему вызову BaseSerializer.data:
+    # вложенные сериализаторы вызывают to_representation и повторно не учитываются
+    if getattr(BaseSerializer.data.fget, 'hotel_instrumented', False):
+        return
+
+    original = BaseSerializer.data.fget
+
+    def data(self):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serializer_depth:
+            return original(self)
+
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            metrics.serializer_depth -= 1
+            metrics.serializer_ms += (time.perf_counter() - started) * 1000
+
+    instrumented = property(data)
+    instrumented.fget.hotel_instrumented = True
+    BaseSerializer.data = instrumented
@@ -0,0 +1,132 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.urls import Resolver404, resolve
+
+from .db_router import REPLICA_ROUTES, SAFE_METHODS, ais_pinned, apin_to_primary, bind_streaming_content, is_pinned, \
+    pin_to_primary, read_database
+
+from .metrics import RequestMetrics, current_metrics, instrument_serializers, install_query_recorder, registry, \
+    server_timing
+
+logger = logging.getLogger('hotel_app.requests')
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_queries = getattr(settings, 'HOTEL_SLOW_REQUEST_QUERIES', None)
+        self.slow_ms = getattr(settings, 'HOTEL_SLOW_REQUEST_MS', None)
+        instrument_serializers()
+        connection_created.connect(install_query_recorder, dispatch_uid='hotel_app.metrics')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        for connection in connections.all():
+            install_query_recorder(connection)
+
+        metrics = self.start()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = self.start()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def start(self):
+        # Текст запросов сохраняется только если включено логирование медленных запросов
+        return RequestMetrics(keep_queries=self.slow_queries is not None or self.slow_ms is not None)
+
+    def finish(self, request, response, metrics):
+        total_ms = metrics.total_ms
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match and match.view_name else 'unresolved'
+
+        registry.observe(route, request.method, response.status_code, metrics, total_ms)
+        response['Server-Timing'] = server_timing(metrics, total_ms)
+
+        is_slow = (
+            (self.slow_queries is not None and metrics.query_count > self.slow_queries)
+            or (self.slow_ms is not None and total_ms > self.slow_ms)
+        )
+        if is_slow:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.1f мс, SQL-запросов %s (%.1f мс)\n%s',
+                request.method, request.get_full_path(), route, total_ms, metrics.query_count, metrics.db_ms,
+                '\n'.join(f'{duration:8.2f} мс  {sql}' for duration, sql in metrics.queries)
+            )
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.replica = getattr(settings, 'HOTEL_REPLICA_DATABASE', None)
+        self.routes = set(getattr(settings, 'HOTEL_REPLICA_ROUTES', REPLICA_ROUTES))
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.replica is None:
+            return self.get_response(request)
+
+        database = self.replica if self.is_replica_route(request) and not is_pinned(request) else None
+        token = read_database.set(database)
+        try:
+            response = bind_streaming_content(self.get_response(request), database)
+        finally:
+            read_database.reset(token)
+
+        # После записи клиент некоторое время читает из основной базы и видит свои изменения,
+        # даже если реплика еще не догнала основную базу
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        if self.replica is None:
+            return await self.get_response(request)
+
+        database = self.replica if self.is_replica_route(request) and not await ais_pinned(request) else None
+        token = read_database.set(database)
+        try:
+            response = bind_streaming_content(await self.get_response(request), database)
+        finally:
+            read_database.reset(token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            await apin_to_primary(request)
+        return response
+
+    def is_replica_route(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        return match.url_name in self.routes
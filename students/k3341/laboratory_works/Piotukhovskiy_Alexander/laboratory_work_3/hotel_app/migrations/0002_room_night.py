@@ -0,0 +1,48 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:24
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_room_nights(apps, schema_editor):
+    Reservation = apps.get_model('hotel_app', 'Reservation')
+    RoomNight = apps.get_model('hotel_app', 'RoomNight')
+
+    nights = []
+    reservations = Reservation.objects.filter(status__in=['BOOKED', 'CONFIRMED', 'CHECKED_IN'])
+    for reservation in reservations.iterator(chunk_size=2000):
+        current_date = reservation.arrival_date
+        while current_date < reservation.departure_date:
+            nights.append(RoomNight(reservation_id=reservation.id, room_id=reservation.room_id, date=current_date))
+            current_date += timedelta(days=1)
+
+        if len(nights) >= 5000:
+            RoomNight.objects.bulk_create(nights)
+            nights = []
+
+    RoomNight.objects.bulk_create(nights)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('reservation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nights', to='hotel_app.reservation', verbose_name='Бронирование')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hotel_app.room', verbose_name='Комната')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['room', 'date'], name='roomnight_room_date_idx'), models.Index(fields=['date', 'room'], name='roomnight_date_room_idx')],
+            },
+        ),
+        migrations.RunPython(fill_room_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:26
+
+from datetime import timedelta
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def fill_room_daily_stats(apps, schema_editor):
+    Reservation = apps.get_model('hotel_app', 'Reservation')
+    RoomDailyStat = apps.get_model('hotel_app', 'RoomDailyStat')
+
+    stats = {}
+    for reservation in Reservation.objects.order_by('id').iterator(chunk_size=2000):
+        nights = (reservation.departure_date - reservation.arrival_date).days
+        is_reported = reservation.status in ['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT']
+        is_paid = reservation.payment_status in ['PREPAID', 'PAID']
+        if nights <= 0 or not (is_reported or is_paid):
+            continue
+
+        income, remainder = divmod(reservation.price_at_booking, nights) if is_paid else (0, 0)
+        for offset in range(nights):
+            day = reservation.arrival_date + timedelta(days=offset)
+            stat = stats.setdefault((reservation.room_id, day), RoomDailyStat(room_id=reservation.room_id, date=day))
+            stat.is_occupied = stat.is_occupied or is_reported
+            stat.client_count += int(is_reported and offset == 0)
+            stat.income += income + int(offset < remainder)
+
+    RoomDailyStat.objects.bulk_create(stats.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0003_reservation_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='floor',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.comparison.Cast(django.db.models.functions.text.Substr(django.db.models.functions.comparison.Cast('number', models.CharField()), 1, 1), models.IntegerField()), output_field=models.IntegerField(), verbose_name='Этаж'),
+        ),
+        migrations.CreateModel(
+            name='RoomDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('is_occupied', models.BooleanField(default=False, verbose_name='Номер занят')),
+                ('client_count', models.PositiveIntegerField(default=0, verbose_name='Количество заездов')),
+                ('income', models.PositiveIntegerField(default=0, verbose_name='Признанный доход')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='hotel_app.room', verbose_name='Комната')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'room'], name='roomdailystat_date_room_idx')],
+                'constraints': [models.UniqueConstraint(fields=('room', 'date'), name='unique_room_daily_stat')],
+            },
+        ),
+        migrations.RunPython(fill_room_daily_stats, migrations.RunPython.noop),
+    ]
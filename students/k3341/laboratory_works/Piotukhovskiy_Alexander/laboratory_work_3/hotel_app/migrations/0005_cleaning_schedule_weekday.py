@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:35
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0004_room_daily_stat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cleaningschedule',
+            name='weekday',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.datetime.ExtractIsoWeekDay('cleaning_date'), output_field=models.PositiveSmallIntegerField(), verbose_name='День недели'),
+        ),
+        migrations.AddIndex(
+            model_name='cleaningschedule',
+            index=models.Index(fields=['room', 'weekday'], name='cleaning_room_weekday_idx'),
+        ),
+    ]
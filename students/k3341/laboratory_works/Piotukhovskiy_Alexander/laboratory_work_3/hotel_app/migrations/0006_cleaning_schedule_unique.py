@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:38
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_cleanings(apps, schema_editor):
+    CleaningSchedule = apps.get_model('hotel_app', 'CleaningSchedule')
+
+    # Из повторяющихся уборок остается последняя созданная
+    duplicates = CleaningSchedule.objects.values('cleaner_id', 'room_id', 'cleaning_date').annotate(
+        count=Count('id'),
+        last_id=Max('id')
+    ).filter(count__gt=1)
+    for duplicate in duplicates.iterator():
+        CleaningSchedule.objects.filter(
+            cleaner_id=duplicate['cleaner_id'],
+            room_id=duplicate['room_id'],
+            cleaning_date=duplicate['cleaning_date']
+        ).exclude(id=duplicate['last_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0005_cleaning_schedule_weekday'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_cleanings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cleaningschedule',
+            constraint=models.UniqueConstraint(fields=('cleaner', 'room', 'cleaning_date'), name='unique_cleaning_schedule'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.3 on 2026-10-18 14:51
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_double_bookings(apps, schema_editor):
+    RoomNight = apps.get_model('hotel_app', 'RoomNight')
+
+    # Если ночь комнаты уже занята несколькими бронированиями, она остается за более ранним
+    duplicates = RoomNight.objects.values('room_id', 'date').annotate(
+        count=Count('id'),
+        first_reservation_id=Min('reservation_id')
+    ).filter(count__gt=1)
+    for duplicate in duplicates.iterator():
+        RoomNight.objects.filter(
+            room_id=duplicate['room_id'],
+            date=duplicate['date']
+        ).exclude(reservation_id=duplicate['first_reservation_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0006_cleaning_schedule_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_double_bookings, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='roomnight',
+            name='roomnight_room_date_idx',
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Версия'),
+        ),
+        migrations.AddConstraint(
+            model_name='roomnight',
+            constraint=models.UniqueConstraint(fields=('room', 'date'), name='unique_room_night'),
+        ),
+    ]
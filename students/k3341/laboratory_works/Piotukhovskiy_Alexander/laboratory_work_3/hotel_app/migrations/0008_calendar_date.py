@@ -0,0 +1,51 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:02
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def fill_calendar(apps, schema_editor):
+    Reservation = apps.get_model('hotel_app', 'Reservation')
+    CalendarDate = apps.get_model('hotel_app', 'CalendarDate')
+
+    bounds = Reservation.objects.aggregate(start_date=Min('arrival_date'), end_date=Max('departure_date'))
+    if bounds['start_date'] is None:
+        return
+
+    days = []
+    day = bounds['start_date']
+    while day <= bounds['end_date']:
+        days.append(CalendarDate(
+            date=day,
+            week_start=day - timedelta(days=day.weekday()),
+            month_start=day.replace(day=1),
+            year=day.year,
+            quarter=(day.month - 1) // 3 + 1,
+            weekday=day.isoweekday(),
+        ))
+        day += timedelta(days=1)
+    CalendarDate.objects.bulk_create(days, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0007_reservation_concurrency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarDate',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False, verbose_name='Дата')),
+                ('week_start', models.DateField(db_index=True, verbose_name='Понедельник недели')),
+                ('month_start', models.DateField(db_index=True, verbose_name='Первый день месяца')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Год')),
+                ('quarter', models.PositiveSmallIntegerField(verbose_name='Квартал')),
+                ('weekday', models.PositiveSmallIntegerField(verbose_name='День недели')),
+            ],
+        ),
+        migrations.RunPython(fill_calendar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.3 on 2026-10-18 15:04
+
+from django.db import migrations, models
+
+
+def fill_search_fields(apps, schema_editor):
+    Client = apps.get_model('hotel_app', 'Client')
+
+    def normalize(value):
+        return (value or '').strip().casefold().replace('ё', 'е')
+
+    batch = []
+    for client in Client.objects.order_by('id').iterator(chunk_size=2000):
+        client.search_first_name = normalize(client.first_name)
+        client.search_last_name = normalize(client.last_name)
+        client.search_city = normalize(client.city_from)
+        batch.append(client)
+        if len(batch) == 2000:
+            Client.objects.bulk_update(batch, ['search_first_name', 'search_last_name', 'search_city'])
+            batch = []
+    Client.objects.bulk_update(batch, ['search_first_name', 'search_last_name', 'search_city'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel_app', '0008_calendar_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_city',
+            field=models.CharField(default='', editable=False, max_length=50, verbose_name='Город для поиска'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='search_first_name',
+            field=models.CharField(default='', editable=False, max_length=50, verbose_name='Имя для поиска'),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='search_last_name',
+            field=models.CharField(default='', editable=False, max_length=50, verbose_name='Фамилия для поиска'),
+        ),
+        migrations.RunPython(fill_search_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['search_last_name'], name='client_search_last_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['search_first_name'], name='client_search_first_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['search_city'], name='client_search_city_idx'),
+        ),
+    ]
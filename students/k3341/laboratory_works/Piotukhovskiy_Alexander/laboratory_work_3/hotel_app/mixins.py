@@ -0,0 +1,217 @@
+import copy
+from functools import lru_cache
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+from .cache import CACHED_VIEWS, cached_response
+from .conditional import conditional_response, detail_etag, list_etag
+from .renderers import dumps
+
+
+def prefixed(lookups, prefix):
+    if not prefix:
+        return list(lookups)
+
+    result = []
+    for lookup in lookups:
+        if isinstance(lookup, Prefetch):
+            lookup = copy.copy(lookup)
+            lookup.add_prefix(prefix)
+            result.append(lookup)
+        else:
+            result.append(f'{prefix}__{lookup}')
+    return result
+
+
+FIELDS_QUERY_PARAM = 'fields'
+
+
+def parse_fields(value):
+    # "id,number,room.number" -> {'id': {}, 'number': {}, 'room': {'number': {}}}.
+    # Пустой словарь у вложенного поля означает все его поля
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree or None
+
+
+def requested_fields(request):
+    if request is None:
+        return None
+    params = getattr(request, 'query_params', None) or request.GET
+    return parse_fields(params.get(FIELDS_QUERY_PARAM))
+
+
+def freeze_fields(fields):
+    if fields is None:
+        return None
+    return tuple(sorted((name, freeze_fields(nested) or None) for name, nested in fields.items()))
+
+
+def selected_lookups(lookups, field_names):
+    # Связи в Meta задаются списком (нужны всегда) или словарем "поле -> связи" (нужны только для поля)
+    if not isinstance(lookups, dict):
+        return list(lookups)
+    return [
+        lookup for field_name, field_lookups in lookups.items()
+        if field_names is None or field_name in field_names
+        for lookup in field_lookups
+    ]
+
+
+@lru_cache(maxsize=None)
+def collect_relations(serializer_class, fields=None):
+    # Связи объявляются в Meta сериализатора: select_related и prefetch_related.
+    # Связи вложенных сериализаторов добавляются с префиксом поля, в котором они вложены.
+    # fields - выбранные через ?fields= поля (см. freeze_fields), связи остальных полей не загружаются
+    selected = dict(fields) if fields is not None else None
+    meta = getattr(serializer_class, 'Meta', None)
+    select = selected_lookups(getattr(meta, 'select_related', []), selected)
+    prefetch = selected_lookups(getattr(meta, 'prefetch_related', []), selected)
+
+    for field_name, field in serializer_class().fields.items():
+        if selected is not None and field_name not in selected:
+            continue
+        is_many = isinstance(field, ListSerializer)
+        nested = field.child if is_many else field
+        if not isinstance(nested, BaseSerializer) or field.source == '*':
+            continue
+
+        path = field.source.replace('.', '__')
+        nested_select, nested_prefetch = collect_relations(type(nested), selected[field_name] if selected else None)
+        if is_many:
+            # Для связей "ко многим" JOIN невозможен, все вложенные связи загружаются отдельными запросами
+            prefetch.append(path)
+            prefetch.extend(prefixed(nested_select, path))
+        else:
+            select.append(path)
+            select.extend(prefixed(nested_select, path))
+        prefetch.extend(prefixed(nested_prefetch, path))
+
+    return tuple(dict.fromkeys(select)), tuple(prefetch)
+
+
+def plan_queryset(queryset, serializer_class, fields=None):
+    select, prefetch = collect_relations(serializer_class, freeze_fields(fields))
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class SparseFieldsetMixin:
+    # Поля, не перечисленные в ?fields=, удаляются до сериализации: SerializerMethodField для них
+    # не вызываются, а связанные объекты не загружаются (см. plan_queryset)
+    sparse_fields = None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.get_sparse_fields()
+        if selected is None:
+            return fields
+
+        for field_name in list(fields):
+            if field_name not in selected:
+                del fields[field_name]
+                continue
+            field = fields[field_name]
+            nested = field.child if isinstance(field, ListSerializer) else field
+            if isinstance(nested, SparseFieldsetMixin) and selected[field_name]:
+                nested.sparse_fields = selected[field_name]
+        return fields
+
+    def get_sparse_fields(self):
+        if self.sparse_fields is not None:
+            return self.sparse_fields
+        # Выбор полей применяется только к ответам: при записи сериализатор проверяет все поля
+        if hasattr(self.root, 'initial_data'):
+            return None
+        parent = self.parent.parent if isinstance(self.parent, ListSerializer) else self.parent
+        if parent is not None:
+            return None
+        return requested_fields(self.context.get('request'))
+
+
+class QueryPlanningMixin:
+
+    def get_queryset(self):
+        return plan_queryset(super().get_queryset(), self.get_serializer_class(), requested_fields(self.request))
+
+
+class StreamingListMixin:
+    stream_query_param = 'stream'
+    stream_chunk_size = 2000
+
+    def is_streaming_requested(self):
+        return self.request.query_params.get(self.stream_query_param, '').lower() in ('1', 'true')
+
+    def stream_response(self, queryset, serializer_class=None):
+        serializer_class = serializer_class or self.get_serializer_class()
+        context = self.get_serializer_context()
+        chunk_size = self.stream_chunk_size
+
+        def serialize(chunk):
+            # Порция кодируется одним вызовом как массив, скобки массива отбрасываются
+            return dumps(serializer_class(chunk, many=True, context=context).data)[1:-1]
+
+        def rows():
+            yield b'['
+            chunk = []
+            is_first_chunk = True
+            for obj in queryset.order_by('pk').iterator(chunk_size=chunk_size):
+                chunk.append(obj)
+                if len(chunk) == chunk_size:
+                    yield (b'' if is_first_chunk else b',') + serialize(chunk)
+                    chunk = []
+                    is_first_chunk = False
+            if chunk:
+                yield (b'' if is_first_chunk else b',') + serialize(chunk)
+            yield b']'
+
+        return StreamingHttpResponse(rows(), content_type='application/json')
+
+    def list(self, request, *args, **kwargs):
+        if self.is_streaming_requested():
+            return self.stream_response(self.filter_queryset(self.get_queryset()))
+        return super().list(request, *args, **kwargs)
+
+
+class CachedResponseMixin:
+    cache_models = []
+    cache_timeout = 300
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        CACHED_VIEWS.add(cls.__name__)
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(self, request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+
+class ConditionalGetMixin:
+    # Повторные запросы без изменений получают 304 по ETag без выборки страницы и сериализации
+    last_modified_field = None
+    version_field = None
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = list_etag(self, request, self.filter_queryset(self.get_queryset()))
+        return conditional_response(
+            request, etag, last_modified, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        etag, last_modified = detail_etag(self, request, self.filter_queryset(self.get_queryset()), pk)
+        if etag is None:
+            return super().retrieve(request, *args, **kwargs)
+        return conditional_response(
+            request, etag, last_modified, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
@@ -1,9 +1,14 @@
+from datetime import timedelta
+
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.functions import Cast, Substr, ExtractIsoWeekDay
+
+from .search import normalize
 
 
 class RoomType(models.Model):
@@ -43,6 +48,13 @@ class Room(models.Model):
     type = models.ForeignKey(RoomType, on_delete=models.CASCADE, verbose_name='Тип комнаты')
     status = models.CharField(max_length=len(max(STATUS_CHOICES, key=lambda x: len(x[0]))[0]), choices=STATUS_CHOICES, default='AVAILABLE', verbose_name='Статус комнаты')
     phone = models.CharField(max_length=11, verbose_name='Телефон в номере')
+    floor = models.GeneratedField(
+        expression=Cast(Substr(Cast('number', models.CharField()), 1, 1), models.IntegerField()),
+        output_field=models.IntegerField(),
+        db_persist=True,
+        db_index=True,
+        verbose_name='Этаж'
+    )
 
 
 class Client(models.Model):
@@ -52,6 +64,32 @@ class Client(models.Model):
     middle_name = models.CharField(max_length=50, blank=True, null=True, verbose_name="Отчество")
     city_from = models.CharField(max_length=50, verbose_name='Город')
 
+    # Нормализованные копии полей для индексного поиска по префиксу
+    search_first_name = models.CharField(max_length=50, default='', editable=False, verbose_name='Имя для поиска')
+    search_last_name = models.CharField(max_length=50, default='', editable=False, verbose_name='Фамилия для поиска')
+    search_city = models.CharField(max_length=50, default='', editable=False, verbose_name='Город для поиска')
+
+    SEARCH_FIELDS = ['search_first_name', 'search_last_name', 'search_city']
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['search_last_name'], name='client_search_last_name_idx'),
+            models.Index(fields=['search_first_name'], name='client_search_first_name_idx'),
+            models.Index(fields=['search_city'], name='client_search_city_idx'),
+        ]
+
+    def fill_search_fields(self):
+        self.search_first_name = normalize(self.first_name)
+        self.search_last_name = normalize(self.last_name)
+        self.search_city = normalize(self.city_from)
+        return self
+
+    def save(self, *args, **kwargs):
+        self.fill_search_fields()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], *self.SEARCH_FIELDS}
+        super().save(*args, **kwargs)
+
 
 class Reservation(models.Model):
     STATUS_CHOICES = [
@@ -67,6 +105,9 @@ class Reservation(models.Model):
         ('UNPAID', 'Не оплачен'),
         ('REFUNDED', 'Возврат')
     ]
+    ACTIVE_STATUSES = ['BOOKED', 'CONFIRMED', 'CHECKED_IN']
+    REPORTED_STATUSES = ['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT']
+    PAID_STATUSES = ['PREPAID', 'PAID']
 
     room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Комната')
     client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name='Клиент')
@@ -81,6 +122,74 @@ class Reservation(models.Model):
     payment_status = models.CharField(max_length=len(max(PAYMENT_STATUS_CHOICES, key=lambda x: len(x[0]))[0]), choices=PAYMENT_STATUS_CHOICES, default='UNPAID', verbose_name='Статус оплаты')
     price_at_booking = models.PositiveIntegerField(verbose_name='Стоимость при бронировании')
     final_price = models.PositiveIntegerField(verbose_name='Стоимость при бронировании')
+    version = models.PositiveIntegerField(default=1, verbose_name='Версия')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'arrival_date', 'departure_date'], name='reservation_client_dates_idx'),
+            models.Index(fields=['arrival_date', 'departure_date'], name='reservation_dates_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Версия увеличивается при каждом изменении бронирования, по ней проверяются конкурентные обновления
+        if self.pk is not None and not kwargs.get('force_insert'):
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+
+
+class RoomNight(models.Model):
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Комната')
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='nights', verbose_name='Бронирование')
+    date = models.DateField(verbose_name='Дата')
+
+    class Meta:
+        # Одна ночь комнаты может принадлежать только одному бронированию: ограничение
+        # не дает двум конкурентным транзакциям забронировать одну комнату на одни даты
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'date'], name='unique_room_night'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'room'], name='roomnight_date_room_idx'),
+        ]
+
+
+class RoomDailyStat(models.Model):
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Комната')
+    date = models.DateField(verbose_name='Дата')
+    is_occupied = models.BooleanField(default=False, verbose_name='Номер занят')
+    client_count = models.PositiveIntegerField(default=0, verbose_name='Количество заездов')
+    income = models.PositiveIntegerField(default=0, verbose_name='Признанный доход')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'date'], name='unique_room_daily_stat'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'room'], name='roomdailystat_date_room_idx'),
+        ]
+
+
+class CalendarDate(models.Model):
+    date = models.DateField(primary_key=True, verbose_name='Дата')
+    week_start = models.DateField(db_index=True, verbose_name='Понедельник недели')
+    month_start = models.DateField(db_index=True, verbose_name='Первый день месяца')
+    year = models.PositiveSmallIntegerField(verbose_name='Год')
+    quarter = models.PositiveSmallIntegerField(verbose_name='Квартал')
+    # ISO-номер дня недели: 1 - понедельник, 7 - воскресенье
+    weekday = models.PositiveSmallIntegerField(verbose_name='День недели')
+
+    @classmethod
+    def for_date(cls, day):
+        return cls(
+            date=day,
+            week_start=day - timedelta(days=day.weekday()),
+            month_start=day.replace(day=1),
+            year=day.year,
+            quarter=(day.month - 1) // 3 + 1,
+            weekday=day.isoweekday(),
+        )
 
 
 class EmployeePosition(models.Model):
@@ -131,4 +240,19 @@ class CleaningSchedule(models.Model):
     cleaner = models.ForeignKey(EmploymentContract, on_delete=models.CASCADE, verbose_name='Сотрудник')
     room = models.ForeignKey(Room, on_delete=models.CASCADE, verbose_name='Комната')
     cleaning_date = models.DateField(verbose_name='Дата уборки')
+    # ISO-номер дня недели: 1 - понедельник, 7 - воскресенье
+    weekday = models.GeneratedField(
+        expression=ExtractIsoWeekDay('cleaning_date'),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+        verbose_name='День недели'
+    )
     status = models.CharField(max_length=len(max(STATUS_CHOICES, key=lambda x: len(x[0]))[0]), choices=STATUS_CHOICES, default='PENDING', verbose_name='Статус уборки')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cleaner', 'room', 'cleaning_date'], name='unique_cleaning_schedule'),
+        ]
+        indexes = [
+            models.Index(fields=['room', 'weekday'], name='cleaning_room_weekday_idx'),
+        ]
@@ -0,0 +1,74 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Q
+
+from .models import RoomPriceHistory
+
+
+def load_price_periods(room_type_ids, start_date, end_date):
+    periods = defaultdict(list)
+    price_history = (
+        RoomPriceHistory.objects.filter(room_type_id__in=set(room_type_ids), start_date__lt=end_date)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=start_date))
+        .order_by('start_date', 'id')
+        .values_list('room_type_id', 'start_date', 'end_date', 'price')
+    )
+    for room_type_id, period_start, period_end, price in price_history:
+        periods[room_type_id].append((period_start, period_end, price))
+    return periods
+
+
+# Периоды должны быть отсортированы по дате начала: если периоды пересекаются,
+# ночь оплачивается по первому из них. Ночи без цены не оплачиваются.
+def quote_stay(periods, arrival_date, departure_date):
+    total_price = 0
+    uncovered = [(arrival_date, departure_date)]
+
+    for period_start, period_end, price in periods:
+        # Дата окончания периода включительная, переводим её в полуинтервал
+        period_end = departure_date if period_end is None else min(period_end + timedelta(days=1), departure_date)
+        period_start = max(period_start, arrival_date)
+        if period_start >= period_end:
+            continue
+
+        remaining = []
+        for segment_start, segment_end in uncovered:
+            overlap_start = max(segment_start, period_start)
+            overlap_end = min(segment_end, period_end)
+            if overlap_start >= overlap_end:
+                remaining.append((segment_start, segment_end))
+                continue
+
+            total_price += (overlap_end - overlap_start).days * price
+            if segment_start < overlap_start:
+                remaining.append((segment_start, overlap_start))
+            if overlap_end < segment_end:
+                remaining.append((overlap_end, segment_end))
+
+        uncovered = remaining
+        if not uncovered:
+            break
+
+    return total_price
+
+
+def calculate_total_price(room_type_id, arrival_date, departure_date):
+    periods = load_price_periods([room_type_id], arrival_date, departure_date)
+    return quote_stay(periods[room_type_id], arrival_date, departure_date)
+
+
+def quote_stays(stays):
+    stays = list(stays)
+    if not stays:
+        return []
+
+    periods = load_price_periods(
+        [room_type_id for room_type_id, _, _ in stays],
+        min(arrival_date for _, arrival_date, _ in stays),
+        max(departure_date for _, _, departure_date in stays),
+    )
+    return [
+        quote_stay(periods[room_type_id], arrival_date, departure_date)
+        for room_type_id, arrival_date, departure_date in stays
+    ]
@@ -0,0 +1,208 @@
+from datetime import timedelta
+
+from django.db import connection, models, transaction
+from django.db.models import Count, Max, Min, Sum
+
+from .cache import invalidate
+from .models import CalendarDate, Reservation, Room, RoomDailyStat, RoomType
+
+OCCUPANCY_GRANULARITIES = {
+    'day': 'date',
+    'week': 'week_start',
+    'month': 'month_start',
+}
+
+
+def reservation_days(reservation):
+    nights = (reservation.departure_date - reservation.arrival_date).days
+    is_reported = reservation.status in Reservation.REPORTED_STATUSES
+    is_paid = reservation.payment_status in Reservation.PAID_STATUSES
+    if nights <= 0 or not (is_reported or is_paid):
+        return
+
+    # Доход распределяется по ночам проживания, остаток приходится на первые ночи
+    income, remainder = divmod(reservation.price_at_booking, nights) if is_paid else (0, 0)
+    for offset in range(nights):
+        yield (
+            reservation.arrival_date + timedelta(days=offset),
+            is_reported,
+            int(is_reported and offset == 0),
+            income + int(offset < remainder),
+        )
+
+
+def collect_daily_stats(reservations, start_date, end_date):
+    stats = {}
+    for reservation in reservations:
+        for day, is_occupied, client_count, income in reservation_days(reservation):
+            if not start_date <= day < end_date:
+                continue
+
+            stat = stats.get((reservation.room_id, day))
+            if stat is None:
+                stat = stats[(reservation.room_id, day)] = RoomDailyStat(room_id=reservation.room_id, date=day)
+            stat.is_occupied = stat.is_occupied or is_occupied
+            stat.client_count += client_count
+            stat.income += income
+
+    return list(stats.values())
+
+
+def refresh_daily_stats(room_ids, start_date, end_date):
+    room_ids = set(room_ids)
+    if not room_ids or start_date >= end_date:
+        return 0
+
+    reservations = Reservation.objects.filter(
+        room_id__in=room_ids,
+        arrival_date__lt=end_date,
+        departure_date__gt=start_date
+    ).only('room_id', 'arrival_date', 'departure_date', 'status', 'payment_status', 'price_at_booking')
+    stats = collect_daily_stats(reservations.iterator(chunk_size=2000), start_date, end_date)
+
+    with transaction.atomic():
+        RoomDailyStat.objects.filter(room_id__in=room_ids, date__gte=start_date, date__lt=end_date).delete()
+        RoomDailyStat.objects.bulk_create(stats, batch_size=2000)
+    invalidate(RoomDailyStat)
+
+    return len(stats)
+
+
+def rebuild_daily_stats(start_date=None, end_date=None, rooms_per_batch=100):
+    if start_date is None or end_date is None:
+        bounds = Reservation.objects.aggregate(start_date=Min('arrival_date'), end_date=Max('departure_date'))
+        start_date = start_date or bounds['start_date']
+        end_date = end_date or bounds['end_date']
+    if start_date is None or end_date is None:
+        RoomDailyStat.objects.all().delete()
+        invalidate(RoomDailyStat)
+        return 0
+
+    total = 0
+    room_ids = list(Room.objects.order_by('id').values_list('id', flat=True))
+    for offset in range(0, len(room_ids), rooms_per_batch):
+        total += refresh_daily_stats(room_ids[offset:offset + rooms_per_batch], start_date, end_date)
+    return total
+
+
+def build_report(start_date, end_date):
+    # end_date входит в период отчета
+    per_room = (
+        RoomDailyStat.objects.filter(date__gte=start_date, date__lte=end_date)
+        .values('room__number')
+        .annotate(client_count=Sum('client_count'), total_income=Sum('income'))
+        .order_by('room__number')
+    )
+    rooms_per_floor = Room.objects.values('floor').annotate(room_count=Count('id')).order_by('floor')
+
+    clients_per_room = []
+    income_per_room = []
+    for row in per_room:
+        if row['client_count']:
+            clients_per_room.append({"room__number": row['room__number'], "client_count": row['client_count']})
+        if row['total_income']:
+            income_per_room.append({"room__number": row['room__number'], "total_income": row['total_income']})
+
+    return {
+        "clients_per_room": clients_per_room,
+        "rooms_per_floor": list(rooms_per_floor),
+        "income_per_room": income_per_room,
+        "total_income": sum(row['total_income'] for row in income_per_room),
+        "start_date": start_date,
+        "end_date": end_date
+    }
+
+
+def ensure_calendar(start_date, end_date):
+    days = (end_date - start_date).days + 1
+    if CalendarDate.objects.filter(date__gte=start_date, date__lte=end_date).count() == days:
+        return
+    CalendarDate.objects.bulk_create(
+        [CalendarDate.for_date(start_date + timedelta(days=offset)) for offset in range(days)],
+        batch_size=2000,
+        ignore_conflicts=True
+    )
+
+
+def occupancy_rows(start_date, end_date, granularity):
+    # Дни календаря перемножаются с типами номеров, чтобы дни без заселений тоже попали в знаменатель.
+    # Факты сначала сворачиваются из дневных агрегатов до (дата, тип номера), поэтому объем работы
+    # зависит от количества дней и типов номеров, а не от количества комнат.
+    # Весь диапазон считается одним сгруппированным запросом
+    period = OCCUPANCY_GRANULARITIES[granularity]
+    calendar_table = CalendarDate._meta.db_table
+    room_table = Room._meta.db_table
+    stat_table = RoomDailyStat._meta.db_table
+    sql = f"""
+        SELECT calendar.{period}, room_type.id, room_type.name,
+               SUM(rooms.room_count),
+               COALESCE(SUM(facts.occupied_nights), 0),
+               COALESCE(SUM(facts.income), 0)
+        FROM {calendar_table} calendar
+        CROSS JOIN (
+            SELECT type_id, COUNT(*) AS room_count FROM {room_table} GROUP BY type_id
+        ) rooms
+        INNER JOIN {RoomType._meta.db_table} room_type ON room_type.id = rooms.type_id
+        LEFT JOIN (
+            SELECT stat.date, room.type_id,
+                   SUM(CASE WHEN stat.is_occupied THEN 1 ELSE 0 END) AS occupied_nights,
+                   SUM(stat.income) AS income
+            FROM {stat_table} stat
+            INNER JOIN {room_table} room ON room.id = stat.room_id
+            WHERE stat.date >= %s AND stat.date <= %s
+            GROUP BY stat.date, room.type_id
+        ) facts ON facts.date = calendar.date AND facts.type_id = rooms.type_id
+        WHERE calendar.date >= %s AND calendar.date <= %s
+        GROUP BY calendar.{period}, room_type.id, room_type.name
+        ORDER BY calendar.{period}, room_type.name
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [start_date, end_date, start_date, end_date])
+        return cursor.fetchall()
+
+
+def occupancy_metrics(available_nights, occupied_nights, revenue):
+    return {
+        "available_nights": available_nights,
+        "occupied_nights": occupied_nights,
+        "occupancy_rate": round(occupied_nights / available_nights, 4) if available_nights else 0,
+        "revenue": revenue,
+        # ADR - средняя цена проданной ночи, RevPAR - доход на одну доступную ночь
+        "adr": round(revenue / occupied_nights, 2) if occupied_nights else 0,
+        "revpar": round(revenue / available_nights, 2) if available_nights else 0,
+    }
+
+
+def build_occupancy_report(start_date, end_date, granularity='day'):
+    # end_date входит в период отчета
+    ensure_calendar(start_date, end_date)
+    date_field = models.DateField()
+
+    periods = []
+    totals = {}
+    for period, room_type_id, room_type, available_nights, occupied_nights, revenue in occupancy_rows(
+            start_date, end_date, granularity):
+        occupied_nights = int(occupied_nights or 0)
+        revenue = int(revenue or 0)
+        periods.append({
+            "period": date_field.to_python(period),
+            "room_type_id": room_type_id,
+            "room_type": room_type,
+            **occupancy_metrics(available_nights, occupied_nights, revenue),
+        })
+
+        total = totals.setdefault(room_type_id, [room_type, 0, 0, 0])
+        total[1] += available_nights
+        total[2] += occupied_nights
+        total[3] += revenue
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "granularity": granularity,
+        "periods": periods,
+        "room_types": [
+            {"room_type_id": room_type_id, "room_type": room_type, **occupancy_metrics(*values)}
+            for room_type_id, (room_type, *values) in totals.items()
+        ],
+    }
@@ -0,0 +1,89 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer, SwaggerYAMLRenderer
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.views import get_schema_view
+
+from .cache import KEY_PREFIX, get_cache
+
+SPEC_RENDERERS = (OpenAPIRenderer, SwaggerJSONRenderer, SwaggerYAMLRenderer)
+
+pending_schemas = []
+schema_lock = threading.Lock()
+generation_lock = threading.Lock()
+
+
+def lazy_swagger_auto_schema(build):
+    # Параметры swagger_auto_schema с примерами ответов создаются только при генерации схемы,
+    # а не при импорте модуля представлений в каждом воркере
+    def decorator(view_method):
+        pending_schemas.append((view_method, build))
+        return view_method
+    return decorator
+
+
+def load_swagger_schemas():
+    with schema_lock:
+        while pending_schemas:
+            view_method, build = pending_schemas.pop()
+            swagger_auto_schema(**build())(view_method)
+
+
+class HotelSchemaGenerator(OpenAPISchemaGenerator):
+
+    def get_schema(self, request=None, public=False):
+        load_swagger_schemas()
+        return super().get_schema(request, public)
+
+
+def schema_cache_key(url, version, renderer):
+    release = getattr(settings, 'HOTEL_RELEASE', '')
+    return f'{KEY_PREFIX}:schema:{release}:{version}:{url}:{renderer.codec_class.__name__}'
+
+
+def render_schema(view_class, url, version, renderer, request=None):
+    cache = get_cache()
+    key = schema_cache_key(url, version, renderer)
+    content = cache.get(key)
+    if content is not None:
+        return content
+
+    # Генерация занимает сотни миллисекунд, поэтому одновременные первые запросы ждут одну генерацию
+    with generation_lock:
+        content = cache.get(key)
+        if content is None:
+            generator = view_class.generator_class(view_class.schema_info, version, url)
+            schema = generator.get_schema(request, view_class.public)
+            content = renderer.render(schema, renderer.media_type)
+            cache.set(key, content, timeout=None)
+    return content
+
+
+def get_cached_schema_view(info, **kwargs):
+    base_view = get_schema_view(info, **kwargs)
+
+    class CachedSchemaView(base_view):
+        schema_info = info
+
+        def get(self, request, version='', format=None):
+            renderer = request.accepted_renderer
+            if not isinstance(renderer, SPEC_RENDERERS):
+                # Страница Swagger UI не содержит схему и загружает ее отдельным запросом
+                return super().get(request, version, format)
+
+            url = request.build_absolute_uri('/').rstrip('/')
+            content = render_schema(type(self), url, request.version or version or '', renderer, request)
+            etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = HttpResponse(content, content_type=f'{renderer.media_type}; charset=utf-8')
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+            return response
+
+    return CachedSchemaView
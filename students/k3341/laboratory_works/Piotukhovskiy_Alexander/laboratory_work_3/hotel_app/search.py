@@ -0,0 +1,26 @@
+from django.db.models import Q
+
+
+def normalize(value):
+    # Регистр и буква "ё" не учитываются при поиске
+    return (value or '').strip().casefold().replace('ё', 'е')
+
+
+def prefix_filter(field, prefix):
+    # Поиск по префиксу записывается диапазоном: в отличие от LIKE (icontains/istartswith) он всегда
+    # использует обычный B-tree индекс по колонке
+    upper_bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper_bound})
+
+
+def client_search_filter(search):
+    query = Q()
+    for term in search.split():
+        normalized = normalize(term)
+        query &= (
+            prefix_filter('passport_number', term.upper())
+            | prefix_filter('search_last_name', normalized)
+            | prefix_filter('search_first_name', normalized)
+            | prefix_filter('search_city', normalized)
+        )
+    return query
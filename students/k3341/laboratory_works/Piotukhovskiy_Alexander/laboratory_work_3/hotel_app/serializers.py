@@ -1,9 +1,13 @@
 from datetime import datetime
 
+from django.db.models import OuterRef, Prefetch, Subquery
 from rest_framework import serializers
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from django.contrib.auth.models import User
-from .models import Client, Room, Employee, EmploymentContract, EmployeePosition, Reservation, CleaningSchedule
+from .availability import is_room_available
+from .mixins import SparseFieldsetMixin
+from .models import Client, Room, Employee, EmploymentContract, EmployeePosition, Reservation, CleaningSchedule, \
+    RoomType
 
 
 class CustomUserSerializer(UserSerializer):
@@ -20,13 +24,13 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         fields = ('id', 'username', 'email', 'password', 'first_name', 'last_name')
 
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Client
         fields = ['id', 'passport_number', 'first_name', 'last_name', 'middle_name', 'city_from']
 
 
-class RoomSerializer(serializers.ModelSerializer):
+class RoomSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     type_id = serializers.IntegerField(source='type.id', read_only=True)
     type_name = serializers.CharField(source='type.name', read_only=True)
     current_client = serializers.SerializerMethodField()
@@ -35,21 +39,54 @@ class RoomSerializer(serializers.ModelSerializer):
     class Meta:
         model = Room
         fields = ['id', 'number', 'type_id', 'type_name', 'phone', 'status', 'current_client', 'last_cleaner']
+        # Связи загружаются только для запрошенных полей (см. SparseFieldsetMixin)
+        select_related = {'type_id': ['type'], 'type_name': ['type']}
+        prefetch_related = {
+            'current_client': [Prefetch(
+                'reservation_set',
+                queryset=Reservation.objects.filter(id=Subquery(
+                    Reservation.objects.filter(
+                        room=OuterRef('room'),
+                        status__in=['CONFIRMED', 'CHECKED_IN']
+                    ).order_by('-arrival_date', '-id').values('id')[:1]
+                )).select_related('client'),
+                to_attr='current_reservations'
+            )],
+            'last_cleaner': [Prefetch(
+                'cleaningschedule_set',
+                queryset=CleaningSchedule.objects.filter(id=Subquery(
+                    CleaningSchedule.objects.filter(
+                        room=OuterRef('room')
+                    ).order_by('-cleaning_date', '-id').values('id')[:1]
+                )).select_related('cleaner__employee'),
+                to_attr='last_cleanings'
+            )],
+        }
 
     def get_current_client(self, obj):
         if obj.status == 'AVAILABLE':
             return None
 
-        reservation = Reservation.objects.filter(
-            room=obj,
-            status__in=['CONFIRMED', 'CHECKED_IN']
-        ).order_by('-arrival_date').first()
+        if hasattr(obj, 'current_reservations'):
+            reservation = next(iter(obj.current_reservations), None)
+        else:
+            reservation = Reservation.objects.filter(
+                room=obj,
+                status__in=['CONFIRMED', 'CHECKED_IN']
+            ).select_related('client').order_by('-arrival_date', '-id').first()
 
         if reservation:
             return ClientSerializer(reservation.client).data
 
+        return None
+
     def get_last_cleaner(self, obj):
-        last_cleaning = CleaningSchedule.objects.order_by('-cleaning_date').first()
+        if hasattr(obj, 'last_cleanings'):
+            last_cleaning = next(iter(obj.last_cleanings), None)
+        else:
+            last_cleaning = CleaningSchedule.objects.filter(
+                room=obj
+            ).select_related('cleaner__employee').order_by('-cleaning_date', '-id').first()
 
         if last_cleaning:
             cleaner = last_cleaning.cleaner.employee
@@ -64,6 +101,31 @@ class RoomSerializer(serializers.ModelSerializer):
         return None
 
 
+class AvailableRoomSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    type_id = serializers.IntegerField(source='type.id', read_only=True)
+    type_name = serializers.CharField(source='type.name', read_only=True)
+
+    class Meta:
+        model = Room
+        fields = ['id', 'number', 'type_id', 'type_name', 'phone']
+
+
+class RoomAvailabilitySerializer(serializers.Serializer):
+    type = serializers.IntegerField(required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # "from" - зарезервированное слово, поэтому поля объявляются здесь
+        fields['from'] = serializers.DateField(required=True)
+        fields['to'] = serializers.DateField(required=True)
+        return fields
+
+    def validate(self, data):
+        if data['to'] <= data['from']:
+            raise serializers.ValidationError({"to": "Дата окончания должна быть позже даты начала."})
+        return data
+
+
 class ClientStayOverlapSerializer(serializers.Serializer):
     client_id = serializers.IntegerField(required=True)
     start_date = serializers.DateField(required=False)
@@ -79,23 +141,36 @@ class ClientStayOverlapSerializer(serializers.Serializer):
         return data
 
 
-class CleaningEmployeeSerializer(serializers.ModelSerializer):
+class ClientStayOverlapBulkSerializer(ClientStayOverlapSerializer):
+    client_id = None
+    client_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=True,
+        allow_empty=False,
+        max_length=100
+    )
+
+
+class CleaningEmployeeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Employee
         fields = ['id', 'first_name', 'last_name', 'middle_name']
 
 
+DAYS_OF_WEEK = [
+    ('MONDAY', 'Понедельник'),
+    ('TUESDAY', 'Вторник'),
+    ('WEDNESDAY', 'Среда'),
+    ('THURSDAY', 'Четверг'),
+    ('FRIDAY', 'Пятница'),
+    ('SATURDAY', 'Суббота'),
+    ('SUNDAY', 'Воскресенье'),
+]
+
+
 class ClientRoomCleaningSerializer(serializers.Serializer):
     client_id = serializers.IntegerField(required=True)
-    day_of_week = serializers.ChoiceField(choices=[
-        ('MONDAY', 'Понедельник'),
-        ('TUESDAY', 'Вторник'),
-        ('WEDNESDAY', 'Среда'),
-        ('THURSDAY', 'Четверг'),
-        ('FRIDAY', 'Пятница'),
-        ('SATURDAY', 'Суббота'),
-        ('SUNDAY', 'Воскресенье'),
-    ], required=True)
+    day_of_week = serializers.ChoiceField(choices=DAYS_OF_WEEK, required=True)
 
     def to_internal_value(self, data):
         data = data.copy()
@@ -104,7 +179,30 @@ class ClientRoomCleaningSerializer(serializers.Serializer):
         return super().to_internal_value(data)
 
 
-class EmploymentContractDetailSerializer(serializers.ModelSerializer):
+class ClientRoomCleaningBulkSerializer(serializers.Serializer):
+    client_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=True,
+        allow_empty=False,
+        max_length=100
+    )
+    days_of_week = serializers.ListField(
+        child=serializers.ChoiceField(choices=DAYS_OF_WEEK),
+        required=True,
+        allow_empty=False,
+        max_length=len(DAYS_OF_WEEK)
+    )
+
+    def to_internal_value(self, data):
+        data = data.copy()
+        if isinstance(data.get('days_of_week'), list):
+            data['days_of_week'] = [
+                day.upper() if isinstance(day, str) else day for day in data['days_of_week']
+            ]
+        return super().to_internal_value(data)
+
+
+class EmploymentContractDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     employee_id = serializers.IntegerField(source='employee.id', read_only=True)
     employee_first_name = serializers.CharField(source='employee.first_name', read_only=True)
     employee_last_name = serializers.CharField(source='employee.last_name', read_only=True)
@@ -127,6 +225,14 @@ class EmploymentContractDetailSerializer(serializers.ModelSerializer):
             'position_id',
             'position_name',
         ]
+        select_related = {
+            'employee_id': ['employee'],
+            'employee_first_name': ['employee'],
+            'employee_last_name': ['employee'],
+            'employee_middle_name': ['employee'],
+            'position_id': ['position'],
+            'position_name': ['position'],
+        }
 
 
 class HireEmployeeSerializer(serializers.Serializer):
@@ -215,7 +321,7 @@ class FireEmployeeSerializer(serializers.Serializer):
         return data
 
 
-class UpdateCleaningScheduleSerializer(serializers.Serializer):
+class CleaningPlanSerializer(serializers.Serializer):
     cleaner_id = serializers.IntegerField(required=True)
     cleaning_dates = serializers.ListField(
         child=serializers.DateField(),
@@ -225,8 +331,24 @@ class UpdateCleaningScheduleSerializer(serializers.Serializer):
     room_ids = serializers.ListField(
         child=serializers.IntegerField(),
         required=True,
+        allow_empty=True
+    )
+    status = serializers.ChoiceField(choices=CleaningSchedule.STATUS_CHOICES, required=False, default='PENDING')
+
+
+class UpdateCleaningScheduleSerializer(serializers.Serializer):
+    cleaner_id = serializers.IntegerField(required=False)
+    cleaning_dates = serializers.ListField(
+        child=serializers.DateField(),
+        required=False,
+        allow_empty=False
+    )
+    room_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
         allow_empty=False
     )
+    plans = CleaningPlanSerializer(many=True, required=False, allow_empty=False, max_length=1000)
 
     def validate_cleaner_id(self, value):
         if not EmploymentContract.objects.filter(employee_id=value, is_active=True).exists():
@@ -244,6 +366,63 @@ class UpdateCleaningScheduleSerializer(serializers.Serializer):
 
         return value
 
+    def validate(self, data):
+        single_fields = ['cleaner_id', 'cleaning_dates', 'room_ids']
+        if 'plans' not in data:
+            missing_fields = [field for field in single_fields if field not in data]
+            if missing_fields:
+                raise serializers.ValidationError({field: "Обязательное поле." for field in missing_fields})
+            return data
+
+        if any(field in data for field in single_fields):
+            raise serializers.ValidationError(
+                "Укажите либо plans, либо cleaner_id, cleaning_dates и room_ids, но не одновременно."
+            )
+
+        # Проверка всех планов двумя запросами вместо двух запросов на каждый план
+        cleaner_ids = {plan['cleaner_id'] for plan in data['plans']}
+        room_numbers = {room_number for plan in data['plans'] for room_number in plan['room_ids']}
+
+        active_cleaner_ids = set(EmploymentContract.objects.filter(
+            employee_id__in=cleaner_ids,
+            is_active=True
+        ).values_list('employee_id', flat=True))
+        existing_numbers = set(Room.objects.filter(number__in=room_numbers).values_list('number', flat=True))
+
+        errors = {}
+        missing_cleaners = sorted(cleaner_ids - active_cleaner_ids)
+        if missing_cleaners:
+            errors["missing_cleaners"] = (
+                f"Следующие служащие не найдены или не имеют активного контракта: "
+                f"{', '.join(map(str, missing_cleaners))}."
+            )
+        missing_numbers = sorted(room_numbers - existing_numbers)
+        if missing_numbers:
+            errors["missing_rooms"] = f"Следующие номера комнат не найдены: {', '.join(map(str, missing_numbers))}."
+        if errors:
+            raise serializers.ValidationError({"plans": errors})
+
+        return data
+
+
+class AutoAssignCleaningSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=True)
+    end_date = serializers.DateField(required=False)
+    position_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False
+    )
+    dry_run = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        data.setdefault('end_date', data['start_date'])
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError({"end_date": "Дата окончания не может быть раньше даты начала."})
+        if (data['end_date'] - data['start_date']).days > 31:
+            raise serializers.ValidationError({"end_date": "Период планирования не может превышать 31 день."})
+        return data
+
 
 class CreateReservationSerializer(serializers.Serializer):
     passport_number = serializers.CharField(max_length=10, required=True)
@@ -267,22 +446,49 @@ class CreateReservationSerializer(serializers.Serializer):
         except Room.DoesNotExist:
             raise serializers.ValidationError({"room_number": f"Комната с номером {room_number} не найдена."})
 
-        if room.status != 'AVAILABLE':
+        if room.status == 'MAINTENANCE':
             raise serializers.ValidationError({"room_number": "Комната недоступна для заселения."})
 
         if departure_date <= arrival_date:
             raise serializers.ValidationError({"departure_date": "Дата выезда должна быть позже даты заселения."})
 
+        if not is_room_available(room, arrival_date, departure_date):
+            raise serializers.ValidationError({"room_number": "Комната уже забронирована на указанные даты."})
+
         data['room'] = room
         return data
 
 
+class ReservationImportRowSerializer(CreateReservationSerializer):
+
+    def validate(self, data):
+        if data['departure_date'] <= data['arrival_date']:
+            raise serializers.ValidationError({"departure_date": "Дата выезда должна быть позже даты заселения."})
+        return data
+
+
+class ReservationImportSerializer(serializers.Serializer):
+    file = serializers.FileField(required=True)
+    file_format = serializers.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], required=False)
+
+    def validate(self, data):
+        if 'file_format' not in data:
+            extension = data['file'].name.rsplit('.', 1)[-1].lower()
+            if extension not in ('csv', 'jsonl'):
+                raise serializers.ValidationError(
+                    {"file_format": "Не удалось определить формат файла, укажите csv или jsonl."}
+                )
+            data['file_format'] = extension
+        return data
+
+
 class UpdateReservationSerializer(serializers.Serializer):
     arrival_date = serializers.DateField(required=False)
     departure_date = serializers.DateField(required=False)
     status = serializers.ChoiceField(choices=Reservation.STATUS_CHOICES, required=False)
     payment_status = serializers.ChoiceField(choices=Reservation.PAYMENT_STATUS_CHOICES, required=False)
     room_number = serializers.IntegerField(required=False)
+    version = serializers.IntegerField(required=False, min_value=1)
 
     def validate(self, data):
         arrival_date = data.get('arrival_date')
@@ -309,6 +515,66 @@ class UpdateReservationSerializer(serializers.Serializer):
         return data
 
 
+class RangeReportSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=True)
+    end_date = serializers.DateField(required=True)
+
+    def validate(self, data):
+        if data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("Дата окончания не может быть раньше даты начала.")
+        return data
+
+
+class OccupancyReportSerializer(RangeReportSerializer):
+    MAX_DAYS = 3660
+
+    granularity = serializers.ChoiceField(choices=['day', 'week', 'month'], default='day')
+
+    def validate(self, data):
+        data = super().validate(data)
+        if (data['end_date'] - data['start_date']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"Период отчета не может превышать {self.MAX_DAYS} дней.")
+        return data
+
+
+class ReservationExportSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    status = serializers.ChoiceField(choices=Reservation.STATUS_CHOICES, required=False)
+
+    def validate(self, data):
+        if 'start_date' in data and 'end_date' in data and data['start_date'] > data['end_date']:
+            raise serializers.ValidationError("Дата окончания не может быть раньше даты начала.")
+        return data
+
+
+class PriceQuoteItemSerializer(serializers.Serializer):
+    room_type_id = serializers.IntegerField(required=True)
+    arrival_date = serializers.DateField(required=True)
+    departure_date = serializers.DateField(required=True)
+
+    def validate(self, data):
+        if data['departure_date'] <= data['arrival_date']:
+            raise serializers.ValidationError({"departure_date": "Дата выезда должна быть позже даты заселения."})
+        return data
+
+
+class PriceQuoteSerializer(serializers.Serializer):
+    items = PriceQuoteItemSerializer(many=True, allow_empty=False, max_length=1000)
+
+    def validate_items(self, value):
+        room_type_ids = {item['room_type_id'] for item in value}
+        existing_ids = set(RoomType.objects.filter(id__in=room_type_ids).values_list('id', flat=True))
+        missing_ids = sorted(room_type_ids - existing_ids)
+
+        if missing_ids:
+            raise serializers.ValidationError(
+                f"Следующие типы номеров не найдены: {', '.join(map(str, missing_ids))}."
+            )
+
+        return value
+
+
 class QuarterlyReportSerializer(serializers.Serializer):
     quarter = serializers.IntegerField(min_value=1, max_value=4, required=True)
     year = serializers.IntegerField(required=True)
@@ -329,7 +595,7 @@ class QuarterlyReportSerializer(serializers.Serializer):
         return data
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     client = ClientSerializer(read_only=True)
     room = RoomSerializer(read_only=True)
 
@@ -348,12 +614,22 @@ class ReservationSerializer(serializers.ModelSerializer):
             'price_at_booking',
             'final_price',
             'last_updated_date',
-            'updated_by_id'
+            'updated_by_id',
+            'version',
         ]
+        read_only_fields = ['version']
 
+    def validate(self, data):
+        arrival_date = data.get('arrival_date', getattr(self.instance, 'arrival_date', None))
+        departure_date = data.get('departure_date', getattr(self.instance, 'departure_date', None))
+        if arrival_date and departure_date and departure_date <= arrival_date:
+            raise serializers.ValidationError(
+                {"departure_date": "Дата выезда должна быть позже даты прибытия."}
+            )
+        return data
 
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     position = serializers.SerializerMethodField()
 
     class Meta:
@@ -366,9 +642,19 @@ class EmployeeSerializer(serializers.ModelSerializer):
             'middle_name',
             'position',
         ]
+        prefetch_related = {
+            'position': [Prefetch(
+                'employmentcontract_set',
+                queryset=EmploymentContract.objects.filter(is_active=True).select_related('position').order_by('id'),
+                to_attr='active_contracts'
+            )],
+        }
 
     def get_position(self, obj):
-        active_contract = EmploymentContract.objects.filter(employee=obj, is_active=True).first()
+        if hasattr(obj, 'active_contracts'):
+            active_contract = next(iter(obj.active_contracts), None)
+        else:
+            active_contract = EmploymentContract.objects.filter(employee=obj, is_active=True).first()
         if active_contract and active_contract.position:
             return {
                 'id': active_contract.position.id,
@@ -378,7 +664,7 @@ class EmployeeSerializer(serializers.ModelSerializer):
         return None
 
 
-class EmployeePositionSerializer(serializers.ModelSerializer):
+class EmployeePositionSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = EmployeePosition
         fields = [
@@ -388,13 +674,14 @@ class EmployeePositionSerializer(serializers.ModelSerializer):
         ]
 
 
-class CleaningScheduleSerializer(serializers.ModelSerializer):
+class CleaningScheduleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     cleaner = serializers.SerializerMethodField()
     room = serializers.SerializerMethodField()
 
     class Meta:
         model = CleaningSchedule
         fields = ['id', 'cleaner', 'room', 'cleaning_date', 'status']
+        select_related = {'cleaner': ['cleaner__employee'], 'room': ['room__type']}
 
     def get_cleaner(self, obj):
         employee = obj.cleaner.employee
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token, invalidate_user
+from .availability import sync_room_nights
+from .cache import invalidate
+from .models import Client, Room, RoomType, RoomPriceHistory, Reservation, Employee, EmployeePosition, \
+    EmploymentContract, CleaningSchedule
+from .rollups import refresh_daily_stats
+
+# RoomNight и RoomDailyStat обновляются массово, для них версии кэша повышаются явно
+CACHED_MODELS = [Client, Room, RoomType, RoomPriceHistory, Reservation, Employee, EmployeePosition,
+                 EmploymentContract, CleaningSchedule]
+
+
+def refresh_reservation_stats(*stays):
+    stays_by_room = {}
+    for room_id, arrival_date, departure_date in stays:
+        if room_id in stays_by_room:
+            start_date, end_date = stays_by_room[room_id]
+            arrival_date, departure_date = min(start_date, arrival_date), max(end_date, departure_date)
+        stays_by_room[room_id] = (arrival_date, departure_date)
+
+    for room_id, (arrival_date, departure_date) in stays_by_room.items():
+        refresh_daily_stats([room_id], arrival_date, departure_date)
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_previous_stay(sender, instance, raw=False, **kwargs):
+    instance._previous_stay = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_stay = Reservation.objects.filter(pk=instance.pk).values_list(
+        'room_id', 'arrival_date', 'departure_date'
+    ).first()
+
+
+@receiver(post_save, sender=Reservation)
+def update_reservation_indexes(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    sync_room_nights([instance])
+
+    stays = [(instance.room_id, instance.arrival_date, instance.departure_date)]
+    if getattr(instance, '_previous_stay', None):
+        stays.append(instance._previous_stay)
+    refresh_reservation_stats(*stays)
+
+
+@receiver(post_delete, sender=Reservation)
+def clear_reservation_stats(sender, instance, **kwargs):
+    refresh_reservation_stats((instance.room_id, instance.arrival_date, instance.departure_date))
+
+
+def invalidate_cached_responses(sender, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate(sender)
+
+
+for model in CACHED_MODELS:
+    post_save.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'cache_{model.__name__}_save')
+    post_delete.connect(invalidate_cached_responses, sender=model, dispatch_uid=f'cache_{model.__name__}_delete')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_credentials(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token_credentials(sender, instance, **kwargs):
+    forget_token(instance.key)
@@ -1,3 +1,925 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import threading
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connection, connections, router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from .authentication import basic_cache_key, get_auth_cache, get_cached_credentials, token_cache_key
+from .availability import available_rooms, sync_room_nights
+from .cache import get_cache
+from .db_router import read_database
+from .housekeeping import apply_cleaning_plans, assign_cleanings, rollover_room_statuses
+from .importer import ReservationImporter, read_rows
+from .middleware import ReplicaRoutingMiddleware
+from .models import RoomType, Room, Client, Reservation, Employee, EmployeePosition, EmploymentContract, \
+    CleaningSchedule, RoomNight, RoomPriceHistory, RoomDailyStat
+from .pricing import quote_stay, quote_stays
+from .rollups import refresh_daily_stats
+
+
+class RoomListQueryCountTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='admin')
+        cls.room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+        position = EmployeePosition.objects.create(name='Уборщик', salary=30000)
+        cls.cleaners = []
+        for index in range(2):
+            employee = Employee.objects.create(passport_number=f'9{index:09d}', first_name='Иван', last_name='Иванов')
+            cls.cleaners.append(EmploymentContract.objects.create(
+                employee=employee,
+                position=position,
+                contract_type='PERMANENT',
+                start_date=date(2024, 1, 1)
+            ))
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def create_rooms(self, count):
+        for index in range(Room.objects.count(), Room.objects.count() + count):
+            room = Room.objects.create(number=100 + index, type=self.room_type, status='OCCUPIED', phone='1234567')
+            guest = Client.objects.create(
+                passport_number=f'{index:010d}',
+                first_name='Анна',
+                last_name='Петрова',
+                city_from='Москва'
+            )
+            Reservation.objects.create(
+                room=room,
+                client=guest,
+                admin=self.admin,
+                arrival_date=date(2024, 1, 1) + timedelta(days=index),
+                departure_date=date(2024, 1, 5) + timedelta(days=index),
+                status='CHECKED_IN',
+                price_at_booking=1000,
+                final_price=1000
+            )
+            for day in range(3):
+                CleaningSchedule.objects.create(
+                    cleaner=self.cleaners[(index + day) % 2],
+                    room=room,
+                    cleaning_date=date(2024, 1, 1) + timedelta(days=day)
+                )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def test_rooms_by_status_query_count_is_constant(self):
+        self.create_rooms(2)
+        small_count, _ = self.count_queries('/hotel/rooms?status=OCCUPIED')
+        self.create_rooms(20)
+        large_count, response = self.count_queries('/hotel/rooms?status=OCCUPIED')
+
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(len(response.data['rooms']), 22)
+        self.assertIsNotNone(response.data['rooms'][0]['current_client'])
+
+    def test_room_viewset_query_count_is_constant(self):
+        self.create_rooms(2)
+        small_count, _ = self.count_queries('/hotel/api/rooms/')
+        self.create_rooms(20)
+        large_count, _ = self.count_queries('/hotel/api/rooms/')
+
+        self.assertEqual(small_count, large_count)
+
+    def test_last_cleaner_is_scoped_per_room(self):
+        self.create_rooms(2)
+        _, response = self.count_queries('/hotel/api/rooms/')
+
+        for room_data in response.data['results']:
+            last_cleaning = CleaningSchedule.objects.filter(
+                room_id=room_data['id']
+            ).order_by('-cleaning_date').first()
+            self.assertEqual(room_data['last_cleaner']['id'], last_cleaning.cleaner.employee_id)
+            self.assertEqual(room_data['last_cleaner']['cleaning_date'], last_cleaning.cleaning_date)
+
+
+class ReservationConcurrencyTest(APITransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='admin')
+        room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+        RoomPriceHistory.objects.create(room_type=room_type, price=1000, start_date=date(2024, 1, 1))
+        self.rooms = [
+            Room.objects.create(number=200 + index, type=room_type, status='AVAILABLE', phone='1234567')
+            for index in range(self.threads)
+        ]
+
+    def book(self, index, room, barrier, results):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        barrier.wait()
+        response = client.post('/hotel/reservation', {
+            'passport_number': f'{index:010d}',
+            'first_name': 'Анна',
+            'last_name': 'Петрова',
+            'city_from': 'Москва',
+            'room_number': room.number,
+            'arrival_date': '2030-01-10',
+            'departure_date': '2030-01-15',
+        }, format='json')
+        results[index] = response.status_code
+        connections.close_all()
+
+    def book_concurrently(self, rooms):
+        barrier = threading.Barrier(len(rooms))
+        results = [None] * len(rooms)
+        workers = [
+            threading.Thread(target=self.book, args=(index, room, barrier, results))
+            for index, room in enumerate(rooms)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def test_same_room_is_booked_once(self):
+        room = self.rooms[0]
+        results = self.book_concurrently([room] * self.threads)
+
+        self.assertEqual(results.count(201), 1)
+        self.assertTrue(all(status in (201, 409, 422) for status in results), results)
+        self.assertEqual(Reservation.objects.filter(room=room).count(), 1)
+        self.assertEqual(RoomNight.objects.filter(room=room).count(), 5)
+
+    # SQLite в режиме IMMEDIATE выполняет пишущие транзакции по одной, поэтому тест проверяет только
+    # корректность параллельных бронирований; выигрыш в пропускной способности измеряется командой
+    # benchmark_api --bookings в сравнении с последовательным прогоном
+    def test_different_rooms_are_all_booked(self):
+        results = self.book_concurrently(self.rooms)
+
+        self.assertEqual(results, [201] * self.threads)
+        self.assertEqual(RoomNight.objects.count(), 5 * self.threads)
+
+    def test_stale_version_is_rejected(self):
+        self.client.force_authenticate(self.admin)
+        reservation = Reservation.objects.create(
+            room=self.rooms[0],
+            client=Client.objects.create(passport_number='0000000001', first_name='Анна', last_name='Петрова',
+                                         city_from='Москва'),
+            admin=self.admin,
+            arrival_date=date(2030, 1, 10),
+            departure_date=date(2030, 1, 15),
+            price_at_booking=5000,
+            final_price=5000
+        )
+
+        response = self.client.patch(f'/hotel/reservation/{reservation.id}',
+                                     {'payment_status': 'PAID', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['version'], 2)
+
+        response = self.client.patch(f'/hotel/reservation/{reservation.id}',
+                                     {'payment_status': 'REFUNDED', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], 2)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.payment_status, 'PAID')
+
+    def test_rejected_update_keeps_room_statuses(self):
+        self.client.force_authenticate(self.admin)
+        guest = Client.objects.create(passport_number='0000000001', first_name='Анна', last_name='Петрова',
+                                      city_from='Москва')
+        reservations = [
+            Reservation.objects.create(room=room, client=guest, admin=self.admin, arrival_date=date(2030, 1, 10),
+                                       departure_date=date(2030, 1, 15), price_at_booking=5000, final_price=5000)
+            for room in self.rooms[:2]
+        ]
+        Room.objects.filter(id=self.rooms[0].id).update(status='OCCUPIED')
+        statuses = dict(Room.objects.values_list('id', 'status'))
+
+        response = self.client.patch(f'/hotel/reservation/{reservations[0].id}',
+                                     {'room_number': self.rooms[1].number}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.patch(f'/hotel/reservation/{reservations[0].id}',
+                                     {'room_number': self.rooms[2].number, 'departure_date': '2030-01-05'},
+                                     format='json')
+        self.assertEqual(response.status_code, 422)
+
+        self.assertEqual(dict(Room.objects.values_list('id', 'status')), statuses)
+        reservations[0].refresh_from_db()
+        self.assertEqual((reservations[0].room_id, reservations[0].version), (self.rooms[0].id, 1))
+
+    def test_viewset_rejects_overlapping_dates(self):
+        self.client.force_authenticate(self.admin)
+        guest = Client.objects.create(passport_number='0000000001', first_name='Анна', last_name='Петрова',
+                                      city_from='Москва')
+        reservation, _ = [
+            Reservation.objects.create(room=self.rooms[0], client=guest, admin=self.admin, arrival_date=arrival_date,
+                                       departure_date=departure_date, price_at_booking=2000, final_price=2000)
+            for arrival_date, departure_date in [
+                (date(2030, 1, 10), date(2030, 1, 12)),
+                (date(2030, 1, 1), date(2030, 1, 5)),
+            ]
+        ]
+
+        response = self.client.patch(f'/hotel/api/reservations/{reservation.id}/',
+                                     {'arrival_date': '2030-01-03'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.arrival_date, date(2030, 1, 10))
+        self.assertEqual(sorted(reservation.nights.values_list('date', flat=True)),
+                         [date(2030, 1, 10), date(2030, 1, 11)])
+
+        response = self.client.patch(f'/hotel/api/reservations/{reservation.id}/',
+                                     {'departure_date': '2030-01-09'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.patch(f'/hotel/api/reservations/{reservation.id}/',
+                                     {'arrival_date': '2030-01-07'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(reservation.nights.count(), 5)
+
+
+class PriceQuoteTest(APITestCase):
+
+    def test_overlapping_periods_use_the_earliest_period(self):
+        periods = [
+            (date(2024, 1, 1), date(2024, 1, 10), 100),
+            (date(2024, 1, 5), None, 200),
+        ]
+
+        # Ночи с 3 по 10 января по первому периоду, ночь на 11 января - по второму
+        self.assertEqual(quote_stay(periods, date(2024, 1, 3), date(2024, 1, 12)), 8 * 100 + 200)
+
+    def test_uncovered_nights_are_free(self):
+        periods = [
+            (date(2024, 1, 1), date(2024, 1, 2), 100),
+            (date(2024, 1, 5), None, 300),
+        ]
+
+        self.assertEqual(quote_stay(periods, date(2024, 1, 1), date(2024, 1, 7)), 2 * 100 + 2 * 300)
+        self.assertEqual(quote_stay(periods, date(2024, 1, 3), date(2024, 1, 5)), 0)
+        self.assertEqual(quote_stay([], date(2024, 1, 3), date(2024, 1, 5)), 0)
+
+    def test_period_end_date_is_inclusive(self):
+        periods = [(date(2024, 1, 1), date(2024, 1, 1), 100)]
+
+        self.assertEqual(quote_stay(periods, date(2024, 1, 1), date(2024, 1, 3)), 100)
+
+    def test_quote_stays_loads_prices_once(self):
+        cheap = RoomType.objects.create(name='Одноместный', capacity=1)
+        expensive = RoomType.objects.create(name='Люкс', capacity=2)
+        RoomPriceHistory.objects.create(room_type=cheap, price=1000, start_date=date(2024, 1, 1),
+                                        end_date=date(2024, 1, 31))
+        RoomPriceHistory.objects.create(room_type=cheap, price=1500, start_date=date(2024, 2, 1))
+        RoomPriceHistory.objects.create(room_type=expensive, price=5000, start_date=date(2024, 1, 10))
+
+        with self.assertNumQueries(1):
+            prices = quote_stays([
+                (cheap.id, date(2024, 1, 30), date(2024, 2, 2)),
+                (expensive.id, date(2024, 1, 8), date(2024, 1, 12)),
+                (cheap.id, date(2023, 12, 30), date(2024, 1, 1)),
+            ])
+
+        self.assertEqual(prices, [2 * 1000 + 1500, 2 * 5000, 0])
+        self.assertEqual(quote_stays([]), [])
+
+
+class CacheStatsPermissionTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='manager', password='secret')
+        cls.admin = User.objects.create_superuser(username='admin', password='admin')
+
+    def test_only_admin_can_reset_counters(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/hotel/cache/stats').status_code, 200)
+        self.assertEqual(self.client.delete('/hotel/cache/stats').status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.delete('/hotel/cache/stats').status_code, 204)
+
+
+class RoomNightSyncTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='admin')
+        room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+        cls.room, cls.other_room = [
+            Room.objects.create(number=300 + index, type=room_type, status='AVAILABLE', phone='1234567')
+            for index in range(2)
+        ]
+        cls.guest = Client.objects.create(passport_number='0000000001', first_name='Анна', last_name='Петрова',
+                                          city_from='Москва')
+
+    def create_reservation(self, **fields):
+        return Reservation.objects.create(**{
+            'room': self.room,
+            'client': self.guest,
+            'admin': self.admin,
+            'arrival_date': date(2024, 3, 1),
+            'departure_date': date(2024, 3, 4),
+            'price_at_booking': 3000,
+            'final_price': 3000,
+            **fields,
+        })
+
+    def nights(self, reservation):
+        return sorted(RoomNight.objects.filter(reservation=reservation).values_list('room_id', 'date'))
+
+    def test_nights_follow_date_change(self):
+        reservation = self.create_reservation()
+        self.assertEqual(self.nights(reservation), [
+            (self.room.id, date(2024, 3, 1)), (self.room.id, date(2024, 3, 2)), (self.room.id, date(2024, 3, 3)),
+        ])
+
+        reservation.arrival_date = date(2024, 3, 3)
+        reservation.departure_date = date(2024, 3, 5)
+        reservation.save()
+
+        self.assertEqual(self.nights(reservation), [(self.room.id, date(2024, 3, 3)), (self.room.id, date(2024, 3, 4))])
+
+    def test_nights_follow_room_change(self):
+        reservation = self.create_reservation()
+
+        reservation.room = self.other_room
+        reservation.save()
+
+        self.assertEqual({room_id for room_id, _ in self.nights(reservation)}, {self.other_room.id})
+        self.assertEqual(len(self.nights(reservation)), 3)
+        rooms = available_rooms(date(2024, 3, 1), date(2024, 3, 4))
+        self.assertIn(self.room, rooms)
+        self.assertNotIn(self.other_room, rooms)
+
+    def test_cancelled_reservation_releases_nights(self):
+        reservation = self.create_reservation()
+
+        reservation.status = 'CANCELLED'
+        reservation.save()
+
+        self.assertEqual(self.nights(reservation), [])
+        self.assertIn(self.room, available_rooms(date(2024, 3, 1), date(2024, 3, 4)))
+
+    def test_sync_repairs_nights_after_bulk_update(self):
+        reservation = self.create_reservation()
+        # update() не вызывает сигналы, ночи приводятся в соответствие явным вызовом
+        Reservation.objects.filter(id=reservation.id).update(departure_date=date(2024, 3, 2))
+
+        sync_room_nights(Reservation.objects.filter(id=reservation.id))
+
+        self.assertEqual(self.nights(reservation), [(self.room.id, date(2024, 3, 1))])
+
+
+class DailyStatRollupTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='admin')
+        room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+        cls.room, cls.other_room = [
+            Room.objects.create(number=400 + index, type=room_type, status='AVAILABLE', phone='1234567')
+            for index in range(2)
+        ]
+        cls.guest = Client.objects.create(passport_number='0000000001', first_name='Анна', last_name='Петрова',
+                                          city_from='Москва')
+
+    def setUp(self):
+        self.reservation = Reservation.objects.create(
+            room=self.room,
+            client=self.guest,
+            admin=self.admin,
+            arrival_date=date(2024, 3, 1),
+            departure_date=date(2024, 3, 4),
+            status='CHECKED_OUT',
+            payment_status='PAID',
+            price_at_booking=3000,
+            final_price=3000
+        )
+
+    def stats(self, room):
+        return list(
+            RoomDailyStat.objects.filter(room=room).order_by('date')
+            .values_list('date', 'is_occupied', 'client_count', 'income')
+        )
+
+    def test_stats_are_created_per_night(self):
+        self.assertEqual(self.stats(self.room), [
+            (date(2024, 3, 1), True, 1, 1000),
+            (date(2024, 3, 2), True, 0, 1000),
+            (date(2024, 3, 3), True, 0, 1000),
+        ])
+
+    def test_stats_follow_date_change(self):
+        self.reservation.arrival_date = date(2024, 3, 3)
+        self.reservation.departure_date = date(2024, 3, 5)
+        self.reservation.save()
+
+        self.assertEqual(self.stats(self.room), [
+            (date(2024, 3, 3), True, 1, 1500),
+            (date(2024, 3, 4), True, 0, 1500),
+        ])
+
+    def test_stats_follow_room_change(self):
+        self.reservation.room = self.other_room
+        self.reservation.save()
+
+        self.assertEqual(self.stats(self.room), [])
+        self.assertEqual(len(self.stats(self.other_room)), 3)
+
+    def test_stats_are_cleared_on_delete(self):
+        self.reservation.delete()
+
+        self.assertEqual(RoomDailyStat.objects.count(), 0)
+
+    def test_refresh_recomputes_after_bulk_update(self):
+        Reservation.objects.filter(id=self.reservation.id).update(payment_status='UNPAID')
+
+        refresh_daily_stats([self.room.id], date(2024, 3, 1), date(2024, 3, 4))
+
+        self.assertEqual(self.stats(self.room), [
+            (date(2024, 3, 1), True, 1, 0),
+            (date(2024, 3, 2), True, 0, 0),
+            (date(2024, 3, 3), True, 0, 0),
+        ])
+
+
+class ReservationImportTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='admin')
+        room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+        RoomPriceHistory.objects.create(room_type=room_type, price=1000, start_date=date(2024, 1, 1))
+        for number in (501, 502):
+            Room.objects.create(number=number, type=room_type, status='AVAILABLE', phone='1234567')
+
+    def row(self, index, room_number, arrival_date, departure_date):
+        return json.dumps({
+            'passport_number': f'{index:010d}',
+            'first_name': 'Анна',
+            'last_name': 'Петрова',
+            'city_from': 'Москва',
+            'room_number': room_number,
+            'arrival_date': arrival_date,
+            'departure_date': departure_date,
+        })
+
+    def import_lines(self, lines, chunk_size=1000):
+        content = '\n'.join(lines).encode()
+        return ReservationImporter(self.admin, chunk_size).run(read_rows(content, 'jsonl'))
+
+    def test_invalid_rows_are_reported_per_row(self):
+        summary = self.import_lines([
+            self.row(1, 501, '2024-03-01', '2024-03-03'),
+            '{"passport_number": ',
+            self.row(3, 501, '2024-04-05', '2024-04-01'),
+            self.row(4, 999, '2024-03-01', '2024-03-03'),
+            self.row(5, 502, '2024-03-01', '2024-03-03'),
+        ])
+
+        self.assertEqual(summary['processed'], 5)
+        self.assertEqual(summary['created'], 2)
+        self.assertEqual([error['row'] for error in summary['errors']], [2, 3, 4])
+        self.assertIn('departure_date', summary['errors'][1]['errors'])
+        self.assertIn('room_number', summary['errors'][2]['errors'])
+        self.assertEqual(Reservation.objects.get(room__number=501).final_price, 2000)
+        self.assertEqual(RoomNight.objects.count(), 4)
+
+    def test_overlapping_rows_in_one_file_are_rejected(self):
+        summary = self.import_lines([
+            self.row(1, 501, '2024-03-01', '2024-03-04'),
+            self.row(2, 501, '2024-03-03', '2024-03-05'),
+            self.row(3, 501, '2024-03-04', '2024-03-05'),
+        ])
+
+        self.assertEqual(summary['created'], 2)
+        self.assertEqual([error['row'] for error in summary['errors']], [2])
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_database_error_fails_only_its_chunk(self):
+        with mock.patch('hotel_app.importer.sync_room_nights',
+                        side_effect=[IntegrityError('unique_room_night'), None]):
+            summary = self.import_lines([
+                self.row(1, 501, '2024-03-01', '2024-03-03'),
+                self.row(2, 502, '2024-03-01', '2024-03-03'),
+                self.row(3, 501, '2024-04-01', '2024-04-03'),
+            ], chunk_size=2)
+
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual([error['row'] for error in summary['errors']], [1, 2])
+        self.assertIn('unique_room_night', summary['errors'][0]['errors']['non_field_errors'][0])
+        # Транзакция неудачной части откатывается целиком, вместе с клиентами
+        self.assertEqual(list(Client.objects.values_list('passport_number', flat=True)), ['0000000003'])
+
+    def test_csv_rows_skip_empty_values(self):
+        rows = list(read_rows(b'passport_number,middle_name,room_number\n0000000001,,501\n', 'csv'))
+
+        self.assertEqual(rows, [(1, {'passport_number': '0000000001', 'room_number': '501'}, None)])
+
+
+class CleaningPlanApplyTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+        for number in (601, 602, 603):
+            Room.objects.create(number=number, type=room_type, status='AVAILABLE', phone='1234567')
+        cls.employee = Employee.objects.create(passport_number='9000000001', first_name='Иван', last_name='Иванов')
+        cls.contract = EmploymentContract.objects.create(
+            employee=cls.employee,
+            position=EmployeePosition.objects.create(name='Уборщик', salary=30000),
+            contract_type='PERMANENT',
+            start_date=date(2024, 1, 1)
+        )
+
+    def plan(self, dates, room_numbers, status=None):
+        plan = {'cleaner_id': self.employee.id, 'cleaning_dates': dates, 'room_ids': room_numbers}
+        if status:
+            plan['status'] = status
+        return plan
+
+    def schedule(self):
+        return sorted(CleaningSchedule.objects.values_list('room__number', 'cleaning_date', 'status'))
+
+    def test_repeated_plan_is_unchanged(self):
+        plans = [self.plan([date(2024, 3, 1), date(2024, 3, 2)], [601, 602])]
+
+        self.assertEqual(apply_cleaning_plans(plans), {"created": 4, "updated": 0, "deleted": 0, "unchanged": 0})
+        self.assertEqual(apply_cleaning_plans(plans), {"created": 0, "updated": 0, "deleted": 0, "unchanged": 4})
+        self.assertEqual(CleaningSchedule.objects.count(), 4)
+
+    def test_status_change_updates_only_listed_rooms(self):
+        apply_cleaning_plans([self.plan([date(2024, 3, 1)], [601, 602])])
+
+        result = apply_cleaning_plans([self.plan([date(2024, 3, 1)], [601], 'COMPLETED')])
+
+        self.assertEqual(result, {"created": 0, "updated": 1, "deleted": 0, "unchanged": 0})
+        self.assertEqual(self.schedule(), [
+            (601, date(2024, 3, 1), 'COMPLETED'),
+            (602, date(2024, 3, 1), 'PENDING'),
+        ])
+
+    def test_replace_removes_rooms_missing_from_plan(self):
+        apply_cleaning_plans([self.plan([date(2024, 3, 1), date(2024, 3, 2)], [601, 602])])
+
+        result = apply_cleaning_plans([self.plan([date(2024, 3, 1)], [602, 603])], replace=True)
+
+        self.assertEqual(result, {"created": 1, "updated": 0, "deleted": 1, "unchanged": 1})
+        # Дни, которых нет в новом плане, не затрагиваются
+        self.assertEqual(self.schedule(), [
+            (601, date(2024, 3, 2), 'PENDING'),
+            (602, date(2024, 3, 1), 'PENDING'),
+            (602, date(2024, 3, 2), 'PENDING'),
+            (603, date(2024, 3, 1), 'PENDING'),
+        ])
+
+
+class CleaningAssignmentTest(APITestCase):
+    day = date(2024, 3, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        single = RoomType.objects.create(name='Одноместный', capacity=1)
+        suite = RoomType.objects.create(name='Люкс', capacity=3)
+        Room.objects.create(number=701, type=suite, status='REQUIRES_CLEANING', phone='1234567')
+        for number in (702, 703, 704):
+            Room.objects.create(number=number, type=single, status='REQUIRES_CLEANING', phone='1234567')
+        Room.objects.create(number=705, type=single, status='AVAILABLE', phone='1234567')
+
+        position = EmployeePosition.objects.create(name='Уборщик', salary=30000)
+        for index in range(2):
+            EmploymentContract.objects.create(
+                employee=Employee.objects.create(passport_number=f'9{index:09d}', first_name='Иван',
+                                                 last_name='Иванов'),
+                position=position,
+                contract_type='PERMANENT',
+                start_date=date(2024, 1, 1)
+            )
+
+    def test_rooms_are_balanced_by_capacity(self):
+        result = assign_cleanings(self.day, self.day)
+
+        self.assertEqual(result['planned'], 4)
+        self.assertEqual(result['created'], 4)
+        self.assertEqual(sorted(assignment['load'] for assignment in result['assignments']), [3, 3])
+        self.assertEqual(sorted(assignment['rooms'] for assignment in result['assignments']),
+                         [[701], [702, 703, 704]])
+        self.assertEqual(result['unassigned'], [])
+
+    def test_repeated_run_creates_nothing(self):
+        assign_cleanings(self.day, self.day)
+
+        result = assign_cleanings(self.day, self.day)
+
+        self.assertEqual(result['planned'], 0)
+        self.assertEqual(result['assignments'], [])
+        self.assertEqual(CleaningSchedule.objects.count(), 4)
+
+    def test_dry_run_does_not_write(self):
+        result = assign_cleanings(self.day, self.day, dry_run=True)
+
+        self.assertEqual(result['planned'], 4)
+        self.assertEqual(result['created'], 0)
+        self.assertFalse(CleaningSchedule.objects.exists())
+
+    def test_rooms_without_cleaners_are_unassigned(self):
+        day = date(2023, 12, 1)
+
+        result = assign_cleanings(day, day)
+
+        self.assertEqual(result['unassigned'], [{"date": day, "room_number": number} for number in (701, 702, 703, 704)])
+        self.assertFalse(CleaningSchedule.objects.exists())
+
+
+class CachedAuthenticationTest(APITestCase):
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.user = User.objects.create_user(username='manager', password='secret')
+        self.token = Token.objects.create(user=self.user)
+
+    def get_health(self, **credentials):
+        self.client.credentials(**credentials)
+        return self.client.get('/hotel/health')
+
+    def test_token_is_not_cached_after_delete(self):
+        self.assertEqual(self.get_health(HTTP_AUTHORIZATION=f'Token {self.token.key}').status_code, 200)
+        self.assertIsNotNone(get_cached_credentials(token_cache_key(self.token.key)))
+
+        key = self.token.key
+        self.token.delete()
+
+        self.assertIsNone(get_cached_credentials(token_cache_key(key)))
+        self.assertEqual(self.get_health(HTTP_AUTHORIZATION=f'Token {key}').status_code, 401)
+
+    def test_basic_credentials_are_not_cached_after_password_change(self):
+        old_credentials = {'HTTP_AUTHORIZATION': f'Basic {base64.b64encode(b"manager:secret").decode()}'}
+        self.assertEqual(self.get_health(**old_credentials).status_code, 200)
+        self.assertIsNotNone(get_cached_credentials(basic_cache_key('manager', 'secret')))
+
+        self.user.set_password('changed')
+        self.user.save()
+
+        self.assertIsNone(get_cached_credentials(basic_cache_key('manager', 'secret')))
+        self.assertEqual(self.get_health(**old_credentials).status_code, 401)
+
+    @override_settings(HOTEL_AUTH_CACHE='default')
+    def test_process_local_cache_is_not_used(self):
+        self.assertIsNone(get_auth_cache())
+        self.assertEqual(self.get_health(HTTP_AUTHORIZATION=f'Token {self.token.key}').status_code, 200)
+        self.assertIsNone(get_cache().get(token_cache_key(self.token.key)))
+
+        # Без общего кэша токен, удаленный в другом процессе, отклоняется сразу
+        Token.objects.filter(key=self.token.key).delete()
+
+        self.assertEqual(self.get_health(HTTP_AUTHORIZATION=f'Token {self.token.key}').status_code, 401)
+
+    def test_inactive_user_token_is_rejected(self):
+        self.assertEqual(self.get_health(HTTP_AUTHORIZATION=f'Token {self.token.key}').status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.get_health(HTTP_AUTHORIZATION=f'Token {self.token.key}').status_code, 401)
+
+
+class RoomStatusRolloverTest(APITestCase):
+    day = date(2024, 3, 10)
+
+    @classmethod
+    def setUpTestData(cls):
+        admin = User.objects.create_user(username='admin', password='admin')
+        room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+        statuses = {801: 'OCCUPIED', 802: 'OCCUPIED', 803: 'REQUIRES_CLEANING', 804: 'MAINTENANCE', 805: 'OCCUPIED'}
+        rooms = {
+            number: Room.objects.create(number=number, type=room_type, status=status, phone='1234567')
+            for number, status in statuses.items()
+        }
+        guest = Client.objects.create(passport_number='0000000001', first_name='Анна', last_name='Петрова',
+                                      city_from='Москва')
+        # 801 - выезд в этот день, 802 - гость продолжает проживание, 804 - выезд из номера на обслуживании
+        for number, arrival_date, departure_date in [
+            (801, date(2024, 3, 7), cls.day),
+            (802, date(2024, 3, 9), date(2024, 3, 12)),
+            (804, date(2024, 3, 7), cls.day),
+        ]:
+            Reservation.objects.create(room=rooms[number], client=guest, admin=admin, arrival_date=arrival_date,
+                                       departure_date=departure_date, status='CHECKED_IN', price_at_booking=1000,
+                                       final_price=1000)
+        CleaningSchedule.objects.create(
+            cleaner=EmploymentContract.objects.create(
+                employee=Employee.objects.create(passport_number='9000000001', first_name='Иван', last_name='Иванов'),
+                position=EmployeePosition.objects.create(name='Уборщик', salary=30000),
+                contract_type='PERMANENT',
+                start_date=date(2024, 1, 1)
+            ),
+            room=rooms[803],
+            cleaning_date=cls.day,
+            status='COMPLETED'
+        )
+
+    def statuses(self):
+        return dict(Room.objects.values_list('number', 'status'))
+
+    def test_statuses_are_rolled_over(self):
+        result = rollover_room_statuses(self.day)
+
+        self.assertEqual(result['changed'], 3)
+        self.assertEqual(self.statuses(), {
+            801: 'REQUIRES_CLEANING',
+            802: 'OCCUPIED',
+            803: 'AVAILABLE',
+            804: 'MAINTENANCE',
+            805: 'AVAILABLE',
+        })
+
+    def test_repeated_rollover_changes_nothing(self):
+        rollover_room_statuses(self.day)
+        statuses = self.statuses()
+
+        result = rollover_room_statuses(self.day)
+
+        self.assertEqual(result['changed'], 0)
+        self.assertEqual(result['changes'], [])
+        self.assertEqual(self.statuses(), statuses)
+
+    def test_cleaning_after_last_departure_counts_when_a_day_is_skipped(self):
+        room_type = RoomType.objects.get()
+        guest = Client.objects.get()
+        cleaner = EmploymentContract.objects.get()
+        # Обе комнаты освободились 8 марта, запуск 9 марта пропущен; 810 убрана 8 марта
+        # (уборку отметили уже после ночного запуска), 811 - только до выезда гостя
+        for number, cleaning_date in [(810, date(2024, 3, 8)), (811, date(2024, 3, 6))]:
+            room = Room.objects.create(number=number, type=room_type, status='REQUIRES_CLEANING', phone='1234567')
+            Reservation.objects.create(room=room, client=guest, admin=User.objects.get(), arrival_date=date(2024, 3, 5),
+                                       departure_date=date(2024, 3, 8), status='CHECKED_OUT', price_at_booking=1000,
+                                       final_price=1000)
+            CleaningSchedule.objects.create(cleaner=cleaner, room=room, cleaning_date=cleaning_date,
+                                            status='COMPLETED')
+
+        rollover_room_statuses(self.day)
+
+        statuses = self.statuses()
+        self.assertEqual((statuses[810], statuses[811]), ('AVAILABLE', 'REQUIRES_CLEANING'))
+
+    def test_dry_run_reports_changes_without_writing(self):
+        statuses = self.statuses()
+
+        result = rollover_room_statuses(self.day, dry_run=True)
+
+        self.assertEqual([change['room_number'] for change in result['changes']], [801, 803, 805])
+        self.assertEqual(self.statuses(), statuses)
+
+
+@override_settings(HOTEL_REPLICA_DATABASE='replica')
+class ReplicaRoutingTest(SimpleTestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        self.factory = RequestFactory()
+        self.status = 200
+        self.middleware = ReplicaRoutingMiddleware(self.get_response)
+
+    def get_response(self, request):
+        # Представление не выполняется: запоминается только база, выбранная для чтения
+        self.read_database = router.db_for_read(Client)
+        return HttpResponse(status=self.status)
+
+    def request(self, method, path, user='manager'):
+        request = getattr(self.factory, method)(path, HTTP_AUTHORIZATION=f'Token {user}')
+        self.middleware(request)
+        return self.read_database
+
+    def test_listed_routes_are_read_from_replica(self):
+        self.assertEqual(self.request('get', '/hotel/clients'), 'replica')
+        self.assertEqual(self.request('get', '/hotel/api/reservations/'), 'replica')
+        self.assertEqual(self.request('get', '/hotel/api/reservations/1/'), DEFAULT_DB_ALIAS)
+        self.assertIsNone(read_database.get())
+
+    def test_router_sends_writes_and_other_apps_to_primary(self):
+        token = read_database.set('replica')
+        try:
+            self.assertEqual(router.db_for_read(Reservation), 'replica')
+            self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)
+            self.assertEqual(router.db_for_write(Reservation), DEFAULT_DB_ALIAS)
+        finally:
+            read_database.reset(token)
+
+    def test_client_is_pinned_to_primary_after_write(self):
+        self.request('patch', '/hotel/reservation/1')
+
+        self.assertEqual(self.request('get', '/hotel/clients'), DEFAULT_DB_ALIAS)
+        self.assertEqual(self.request('get', '/hotel/clients', user='other'), 'replica')
+
+    def test_failed_write_does_not_pin(self):
+        self.status = 422
+        self.request('patch', '/hotel/reservation/1')
+
+        self.status = 200
+        self.assertEqual(self.request('get', '/hotel/clients'), 'replica')
+
+    def test_streaming_export_is_read_from_replica(self):
+        def export_rows():
+            # Как в выгрузках: запросы выполняются только при итерации тела ответа
+            yield f'{router.db_for_read(Reservation)}\n'
+
+        self.get_response = lambda request: StreamingHttpResponse(export_rows())
+        self.middleware = ReplicaRoutingMiddleware(self.get_response)
+
+        response = self.middleware(self.factory.get('/hotel/export/reservations.csv'))
+
+        self.assertIsNone(read_database.get())
+        self.assertEqual(b''.join(response.streaming_content), b'replica\n')
+        self.assertIsNone(read_database.get())
+
+    def test_async_streaming_list_is_read_from_replica(self):
+        async def list_rows():
+            yield router.db_for_read(Reservation)
+
+        async def get_response(request):
+            return StreamingHttpResponse(list_rows())
+
+        async def read_body():
+            response = await ReplicaRoutingMiddleware(get_response)(self.factory.get('/hotel/api/reservations/?stream=1'))
+            return [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(asyncio.run(read_body()), [b'replica'])
+
+    @override_settings(HOTEL_REPLICA_DATABASE=None)
+    def test_without_replica_everything_is_read_from_primary(self):
+        self.middleware = ReplicaRoutingMiddleware(self.get_response)
+
+        self.assertEqual(self.request('get', '/hotel/clients'), DEFAULT_DB_ALIAS)
+
+
+class ReservationConditionalRequestTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='admin')
+        room_type = RoomType.objects.create(name='Одноместный', capacity=1)
+        RoomPriceHistory.objects.create(room_type=room_type, price=1000, start_date=date(2024, 1, 1))
+        cls.reservation = Reservation.objects.create(
+            room=Room.objects.create(number=901, type=room_type, status='AVAILABLE', phone='1234567'),
+            client=Client.objects.create(passport_number='0000000001', first_name='Анна', last_name='Петрова',
+                                         city_from='Москва'),
+            admin=cls.admin,
+            arrival_date=date(2030, 1, 10),
+            departure_date=date(2030, 1, 15),
+            price_at_booking=5000,
+            final_price=5000
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def detail_etag(self):
+        response = self.client.get(f'/hotel/api/reservations/{self.reservation.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def patch(self, if_match, payment_status='PAID'):
+        return self.client.patch(f'/hotel/reservation/{self.reservation.id}', {'payment_status': payment_status},
+                                 format='json', HTTP_IF_MATCH=if_match)
+
+    def test_unchanged_detail_returns_not_modified(self):
+        etag = self.detail_etag()
+
+        response = self.client.get(f'/hotel/api/reservations/{self.reservation.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_current_detail_etag_is_accepted(self):
+        response = self.patch(self.detail_etag())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{self.reservation.id}.2"')
+
+    def test_stale_etag_is_rejected(self):
+        stale_etag = self.detail_etag()
+        self.assertEqual(self.patch(stale_etag).status_code, 200)
+
+        response = self.patch(stale_etag, 'REFUNDED')
+
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.data['version'], 2)
+        self.reservation.refresh_from_db()
+        self.assertEqual(self.reservation.payment_status, 'PAID')
+
+        # Короткий тег из ответа 412 подходит для повторной попытки
+        self.assertEqual(self.patch(response['ETag'], 'REFUNDED').status_code, 200)
+        self.assertNotEqual(self.detail_etag(), stale_etag)
+
+    def test_wildcard_is_accepted(self):
+        self.assertEqual(self.patch('*').status_code, 200)
+        self.assertEqual(self.patch('*', 'REFUNDED').status_code, 200)
@@ -1,24 +1,57 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
+from hotel_app import async_views
+
 from hotel_app.views import ClientsListView, RoomsByStatusView, ClientStayOverlapView, ClientRoomCleaningView, \
     EmployeeManagementView, CleaningScheduleManagementView, ReservationManagementView, QuarterlyReportView, \
     ClientViewSet, RoomViewSet, ReservationViewSet, EmployeeViewSet, CleaningScheduleViewSet, PublicEndpoint, \
-    EmployeePositionsViewSet, EmploymentContractViewSet
+    EmployeePositionsViewSet, EmploymentContractViewSet, PriceQuoteView, \
+    RoomAvailabilityView, ClientStayOverlapBulkView, RangeReportView, \
+    ReservationImportView, CacheStatsView, ClientRoomCleaningBulkView, CleaningAutoAssignView, \
+    ReservationExportView, ClientExportView, QuarterlyReportExportView, OccupancyReportView
 
 urlpatterns = [
     path('clients', ClientsListView.as_view(), name='clients-list'),
     path('rooms', RoomsByStatusView.as_view(), name='available-rooms-count'),
+    path('rooms/availability', RoomAvailabilityView.as_view(), name='room-availability'),
     path('clients/stay-overlap', ClientStayOverlapView.as_view(), name='client-stay-overlap'),
+    path('clients/stay-overlap/bulk', ClientStayOverlapBulkView.as_view(), name='client-stay-overlap-bulk'),
     path('clients/room-cleaner', ClientRoomCleaningView.as_view(), name='client-room-cleaning'),
+    path('clients/room-cleaner/bulk', ClientRoomCleaningBulkView.as_view(), name='client-room-cleaning-bulk'),
     path('employees/manage', EmployeeManagementView.as_view(), name='employee-management'),
     path('cleaning-schedules/manage', CleaningScheduleManagementView.as_view(), name='update-cleaning-schedule'),
+    path('cleaning-schedules/auto-assign', CleaningAutoAssignView.as_view(), name='cleaning-auto-assign'),
     path('reservation', ReservationManagementView.as_view(), name='create-reservation'),
     path('reservation/<int:reservation_id>', ReservationManagementView.as_view(), name='update-reservation'),
+    path('reservation/quote', PriceQuoteView.as_view(), name='price-quote'),
+    path('reservation/import', ReservationImportView.as_view(), name='reservation-import'),
     path('reports/quarterly', QuarterlyReportView.as_view(), name='quarterly-report'),
+    path('reports/range', RangeReportView.as_view(), name='range-report'),
+    path('reports/occupancy', OccupancyReportView.as_view(), name='occupancy-report'),
+    path('export/reservations.<str:file_format>', ReservationExportView.as_view(), name='reservations-export'),
+    path('export/clients.<str:file_format>', ClientExportView.as_view(), name='clients-export'),
+    path('export/reports/quarterly.<str:file_format>', QuarterlyReportExportView.as_view(),
+         name='quarterly-report-export'),
+    path('cache/stats', CacheStatsView.as_view(), name='cache-stats'),
     path("health", PublicEndpoint.as_view(), name='hello-world')
 ]
 
+# Асинхронные варианты эндпоинтов чтения для запуска под ASGI
+urlpatterns += [
+    path('async/clients', async_views.clients_list, name='async-clients-list'),
+    path('async/rooms', async_views.rooms_by_status, name='async-available-rooms-count'),
+    path('async/clients/stay-overlap', async_views.client_stay_overlap, name='async-client-stay-overlap'),
+    path('async/reports/quarterly', async_views.quarterly_report, name='async-quarterly-report'),
+]
+for resource in async_views.VIEWSETS:
+    urlpatterns += [
+        path(f'async/api/{resource}/', async_views.resource_list, {'resource': resource},
+             name=f'async-{resource}-list'),
+        path(f'async/api/{resource}/<int:pk>/', async_views.resource_detail, {'resource': resource},
+             name=f'async-{resource}-detail'),
+    ]
+
 router = DefaultRouter()
 router.register(r'api/clients', ClientViewSet, basename='client')
 router.register(r'api/rooms', RoomViewSet, basename='room')
@@ -1,24 +1,45 @@
 import calendar
-from datetime import datetime, timedelta
+from datetime import datetime
 
 from django.core.exceptions import ValidationError as DRFValidationError
-from django.db import transaction
-from django.db.models import Q, Sum, Count, F, ExpressionWrapper, IntegerField
-from django.db.models.functions import Cast, Substr
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Q, Exists, OuterRef, Subquery
+from django.http import HttpResponse
 from django.utils import timezone
+from django.utils.http import quote_etag
 from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
 from rest_framework import generics, viewsets
-from rest_framework.permissions import AllowAny
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 
-from .models import Reservation, Client, Room, CleaningSchedule, Employee, EmployeePosition, EmploymentContract, \
-    RoomPriceHistory
+from .availability import RoomUnavailable, available_rooms, is_room_available
+from .cache import cache_response, cached_response, get_stats, reset_stats
+from .conditional import conditional_response, entity_tag, if_match_failed, list_etag
+from .exports import EXPORT_FORMATS, RESERVATION_COLUMNS, CLIENT_COLUMNS, export_error, export_response, \
+    quarterly_report_rows, table_rows
+from .housekeeping import apply_cleaning_plans, assign_cleanings
+from .importer import ReservationImporter, read_rows
+from .metrics import registry
+from .mixins import StreamingListMixin, CachedResponseMixin, ConditionalGetMixin, QueryPlanningMixin, plan_queryset, \
+    requested_fields
+from .models import Reservation, Client, Room, RoomType, CleaningSchedule, Employee, EmployeePosition, \
+    EmploymentContract, RoomDailyStat
+from .pricing import calculate_total_price, quote_stays
+from .rollups import build_occupancy_report, build_report
+from .schema import lazy_swagger_auto_schema
+from .search import client_search_filter, normalize, prefix_filter
 from .serializers import ClientSerializer, RoomSerializer, ClientStayOverlapSerializer, CleaningEmployeeSerializer, \
     ClientRoomCleaningSerializer, HireEmployeeSerializer, FireEmployeeSerializer, EmploymentContractDetailSerializer, \
     UpdateEmployeeSerializer, UpdateCleaningScheduleSerializer, CreateReservationSerializer, \
     UpdateReservationSerializer, QuarterlyReportSerializer, ReservationSerializer, EmployeeSerializer, \
-    CleaningScheduleSerializer, EmployeePositionSerializer
+    CleaningScheduleSerializer, EmployeePositionSerializer, PriceQuoteSerializer, RoomAvailabilitySerializer, \
+    AvailableRoomSerializer, ClientStayOverlapBulkSerializer, RangeReportSerializer, \
+    ReservationImportSerializer, ClientRoomCleaningBulkSerializer, AutoAssignCleaningSerializer, \
+    ReservationExportSerializer, OccupancyReportSerializer, DAYS_OF_WEEK
+
+# Модели, от которых зависит RoomSerializer: текущий клиент и последний уборщик комнаты
+ROOM_CACHE_MODELS = [Room, RoomType, Reservation, Client, CleaningSchedule, EmploymentContract, Employee]
 
 
 class PublicEndpoint(generics.GenericAPIView):
@@ -31,83 +52,134 @@ class PublicEndpoint(generics.GenericAPIView):
         return Response({"message": "Hello POST world!"})
 
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(ConditionalGetMixin, CachedResponseMixin, StreamingListMixin, QueryPlanningMixin,
+                    viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
+    cache_models = [Client]
 
 
-class RoomViewSet(viewsets.ModelViewSet):
+class RoomViewSet(ConditionalGetMixin, CachedResponseMixin, StreamingListMixin, QueryPlanningMixin,
+                  viewsets.ModelViewSet):
     queryset = Room.objects.all()
     serializer_class = RoomSerializer
+    cache_models = ROOM_CACHE_MODELS
 
 
-class ReservationViewSet(viewsets.ModelViewSet):
+class ReservationViewSet(ConditionalGetMixin, CachedResponseMixin, StreamingListMixin, QueryPlanningMixin,
+                         viewsets.ModelViewSet):
     queryset = Reservation.objects.all()
     serializer_class = ReservationSerializer
+    cache_models = ROOM_CACHE_MODELS
+    last_modified_field = 'last_updated_date'
+    version_field = 'version'
 
-
-class EmployeeViewSet(viewsets.ModelViewSet):
+    def update(self, request, *args, **kwargs):
+        # Сохранение бронирования и его ночей выполняется в одной транзакции: при пересечении
+        # изменения откатываются целиком, и индекс ночей не расходится с датами бронирования
+        try:
+            with transaction.atomic():
+                return super().update(request, *args, **kwargs)
+        except (RoomUnavailable, IntegrityError):
+            return Response({"room_number": "Комната уже забронирована на указанные даты."}, status=409)
+
+    def perform_update(self, serializer):
+        reservation = serializer.instance
+        room = Room.objects.select_for_update().get(id=reservation.room_id)
+        arrival_date = serializer.validated_data.get('arrival_date', reservation.arrival_date)
+        departure_date = serializer.validated_data.get('departure_date', reservation.departure_date)
+        if not is_room_available(room, arrival_date, departure_date, exclude_reservation=reservation):
+            raise RoomUnavailable
+        serializer.save()
+
+
+class EmployeeViewSet(ConditionalGetMixin, CachedResponseMixin, StreamingListMixin, QueryPlanningMixin,
+                      viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
+    cache_models = [Employee, EmploymentContract, EmployeePosition]
 
 
-class EmploymentContractViewSet(viewsets.ModelViewSet):
+class EmploymentContractViewSet(ConditionalGetMixin, CachedResponseMixin, StreamingListMixin, QueryPlanningMixin,
+                                viewsets.ModelViewSet):
     queryset = EmploymentContract.objects.all()
     serializer_class = EmploymentContractDetailSerializer
+    cache_models = [EmploymentContract, Employee, EmployeePosition]
 
 
-class EmployeePositionsViewSet(viewsets.ModelViewSet):
+class EmployeePositionsViewSet(ConditionalGetMixin, CachedResponseMixin, StreamingListMixin, QueryPlanningMixin,
+                               viewsets.ModelViewSet):
     queryset = EmployeePosition.objects.all()
     serializer_class = EmployeePositionSerializer
+    cache_models = [EmployeePosition]
 
 
-class CleaningScheduleViewSet(viewsets.ModelViewSet):
+class CleaningScheduleViewSet(ConditionalGetMixin, CachedResponseMixin, StreamingListMixin, QueryPlanningMixin,
+                              viewsets.ModelViewSet):
     queryset = CleaningSchedule.objects.all()
     serializer_class = CleaningScheduleSerializer
+    cache_models = [CleaningSchedule, EmploymentContract, Employee, Room]
 
 
-class ClientsListView(generics.ListAPIView):
+class ClientsListView(CachedResponseMixin, StreamingListMixin, generics.ListAPIView):
     serializer_class = ClientSerializer
+    cache_models = [Client, Reservation, Room]
 
     def get_queryset(self):
-        room_number = self.request.query_params.get('room', None)
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        city_name = self.request.query_params.get('city', None)
+        return self.filter_clients(self.request.query_params)
+
+    @staticmethod
+    def filter_clients(params):
+        search = params.get('search', None)
+        room_number = params.get('room', None)
+        start_date = params.get('start_date', None)
+        end_date = params.get('end_date', None)
+        city_name = params.get('city', None)
 
         queryset = Client.objects.all()
 
-        if room_number:
-            try:
-                room_number = Room.objects.get(number=room_number)
-            except Room.DoesNotExist:
-                return Client.objects.none()
+        if search and search.strip():
+            queryset = queryset.filter(client_search_filter(search))
 
-            reservations = Reservation.objects.filter(room=room_number)
-            client_ids = reservations.values_list('client_id', flat=True)
-            queryset = queryset.filter(id__in=client_ids)
+        # Фильтры по бронированиям записываются соединением с бронированиями: база начинает с выборочного
+        # индекса (номер комнаты или даты) и не строит список id клиентов. Каждый фильтр получает
+        # свое соединение, поэтому условия по комнате и датам могут выполняться разными бронированиями
+        is_joined = False
+        if room_number:
+            queryset = queryset.filter(reservation__room__number=room_number)
+            is_joined = True
 
         if start_date or end_date:
             date_filter = Q()
 
             if start_date:
-                date_filter &= Q(departure_date__gte=start_date)
+                date_filter &= Q(reservation__departure_date__gte=start_date)
 
             if end_date:
-                date_filter &= Q(arrival_date__lte=end_date)
+                date_filter &= Q(reservation__arrival_date__lte=end_date)
 
-            reservations = Reservation.objects.filter(date_filter)
-            client_ids = reservations.values_list('client_id', flat=True)
-            queryset = queryset.filter(id__in=client_ids)
+            queryset = queryset.filter(date_filter)
+            is_joined = True
 
-        if city_name:
-            queryset = queryset.filter(city_from__icontains=city_name)
+        if city_name and city_name.strip():
+            queryset = queryset.filter(prefix_filter('search_city', normalize(city_name)))
 
+        if is_joined:
+            queryset = queryset.distinct()
         return queryset
 
-    @swagger_auto_schema(
-        operation_description="Получить список клиентов с возможностью фильтрации по номеру комнаты, датам проживания и городу.",
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Получить список клиентов с возможностью поиска по паспорту, фамилии, имени и городу "
+                              "и фильтрации по номеру комнаты, датам проживания и городу.",
         manual_parameters=[
+            openapi.Parameter(
+                'search',
+                openapi.IN_QUERY,
+                description="Строка поиска. Каждое слово ищется по началу номера паспорта, фамилии, имени или города "
+                            "без учета регистра; клиент должен подходить под все слова.",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
             openapi.Parameter(
                 'room',
                 openapi.IN_QUERY,
@@ -134,17 +206,46 @@ class ClientsListView(generics.ListAPIView):
             openapi.Parameter(
                 'city',
                 openapi.IN_QUERY,
-                description="Город, из которого приехал клиент. Фильтрация клиентов по городу.",
+                description="Город, из которого приехал клиент. Фильтрация по началу названия без учета регистра.",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description="Курсор страницы из полей next/previous предыдущего ответа.",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description="Размер страницы (по умолчанию 100, не более 1000).",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                'stream',
+                openapi.IN_QUERY,
+                description="Если true, все записи выгружаются потоком одним JSON-массивом без пагинации.",
+                type=openapi.TYPE_BOOLEAN,
+                required=False,
+            ),
+            openapi.Parameter(
+                'fields',
+                openapi.IN_QUERY,
+                description="Поля ответа через запятую, например id,number,status. По умолчанию возвращаются все поля.",
                 type=openapi.TYPE_STRING,
                 required=False,
             ),
         ],
         responses={
             200: openapi.Response(
-                description="Список клиентов, соответствующих критериям фильтрации.",
+                description="Страница списка клиентов, соответствующих критериям фильтрации.",
                 examples={
                     "application/json": {
-                        "count": 2,
+                        "next": "http://127.0.0.1:8000/hotel/clients?cursor=cD0y",
+                        "previous": None,
                         "clients": [
                             {
                                 "id": 1,
@@ -171,36 +272,50 @@ class ClientsListView(generics.ListAPIView):
                 examples={
                     "application/json": {
                         "detail": "Не найдено ни одного клиента по заданным фильтрам.",
-                        "count": 0,
+                        "next": None,
+                        "previous": None,
                         "clients": []
                     }
                 },
             ),
         },
-    )
+    ))
     def get(self, request, *args, **kwargs):
         queryset = self.get_queryset()
+        etag, last_modified = list_etag(self, request, queryset)
+        return conditional_response(
+            request, etag, last_modified,
+            lambda: cached_response(self, request, lambda: self.clients_response(request, queryset))
+        )
 
-        clients_count = queryset.count()
+    def clients_response(self, request, queryset):
+        if self.is_streaming_requested():
+            return self.stream_response(queryset)
 
-        if clients_count > 0:
-            serializer = self.get_serializer(queryset, many=True)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+
+        if page or request.query_params.get(self.paginator.cursor_query_param):
             return Response({
-                "count": clients_count,
+                "next": self.paginator.get_next_link(),
+                "previous": self.paginator.get_previous_link(),
                 "clients": serializer.data
             })
         else:
             return Response({
                 "detail": "Не найдено ни одного клиента по заданным фильтрам.",
-                "count": clients_count,
+                "next": None,
+                "previous": None,
                 "clients": []
             }, status=404)
 
 
-class RoomsByStatusView(generics.GenericAPIView):
+class RoomsByStatusView(CachedResponseMixin, StreamingListMixin, generics.GenericAPIView):
+    serializer_class = RoomSerializer
+    cache_models = ROOM_CACHE_MODELS
 
-    @swagger_auto_schema(
-        operation_description="Получить список комнат по их статусам. Возвращает комнаты с указанными статусами и общее их количество.",
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Получить список комнат по их статусам. Возвращает комнаты с указанными статусами постранично.",
         manual_parameters=[
             openapi.Parameter(
                 'status',
@@ -209,13 +324,42 @@ class RoomsByStatusView(generics.GenericAPIView):
                 type=openapi.TYPE_STRING,
                 required=True,
             ),
+            openapi.Parameter(
+                'cursor',
+                openapi.IN_QUERY,
+                description="Курсор страницы из полей next/previous предыдущего ответа.",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+            openapi.Parameter(
+                'page_size',
+                openapi.IN_QUERY,
+                description="Размер страницы (по умолчанию 100, не более 1000).",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+            openapi.Parameter(
+                'stream',
+                openapi.IN_QUERY,
+                description="Если true, все записи выгружаются потоком одним JSON-массивом без пагинации.",
+                type=openapi.TYPE_BOOLEAN,
+                required=False,
+            ),
+            openapi.Parameter(
+                'fields',
+                openapi.IN_QUERY,
+                description="Поля ответа через запятую, например id,number,status. По умолчанию возвращаются все поля.",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
         ],
         responses={
             200: openapi.Response(
-                description="Список комнат с указанными статусами.",
+                description="Страница списка комнат с указанными статусами.",
                 examples={
                     "application/json": {
-                        "count": 3,
+                        "next": None,
+                        "previous": None,
                         "rooms": [
                             {
                                 "number": 101,
@@ -260,25 +404,126 @@ class RoomsByStatusView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
     def get(self, request, *args, **kwargs):
-        statuses = request.query_params.get('status', None)
+        rooms_queryset, error = self.filter_rooms(request.query_params.get('status', None), requested_fields(request))
+        if error:
+            return Response(error, status=422)
+
+        etag, last_modified = list_etag(self, request, rooms_queryset)
+        return conditional_response(
+            request, etag, last_modified,
+            lambda: cached_response(self, request, lambda: self.rooms_response(request, rooms_queryset))
+        )
+
+    def rooms_response(self, request, rooms_queryset):
+        if self.is_streaming_requested():
+            return self.stream_response(rooms_queryset)
+
+        page = self.paginate_queryset(rooms_queryset)
+        rooms_data = self.get_serializer(page, many=True).data
+
+        return Response({
+            "next": self.paginator.get_next_link(),
+            "previous": self.paginator.get_previous_link(),
+            "rooms": rooms_data
+        })
+
+    @staticmethod
+    def filter_rooms(statuses, fields=None):
         rooms_queryset = Room.objects.all()
         if statuses:
             status_list = [status.strip().upper() for status in statuses.split(',') if status.strip()]
             valid_statuses = [choice[0] for choice in Room.STATUS_CHOICES]
             invalid_statuses = [status for status in status_list if status not in valid_statuses]
             if invalid_statuses:
-                return Response(
-                    {"detail": f"Недопустимые статусы: {invalid_statuses}. Доступные статусы: {valid_statuses}"},
-                    status=422
-                )
+                return None, {
+                    "detail": f"Недопустимые статусы: {invalid_statuses}. Доступные статусы: {valid_statuses}"
+                }
             rooms_queryset = rooms_queryset.filter(status__in=status_list)
-        rooms_count = rooms_queryset.count()
-        rooms_data = RoomSerializer(rooms_queryset, many=True).data
+        return plan_queryset(rooms_queryset, RoomSerializer, fields), None
+
+
+class RoomAvailabilityView(generics.GenericAPIView):
+    serializer_class = RoomAvailabilitySerializer
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Получить список комнат, свободных на весь указанный период.",
+        manual_parameters=[
+            openapi.Parameter(
+                'from',
+                openapi.IN_QUERY,
+                description="Дата заселения (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'to',
+                openapi.IN_QUERY,
+                description="Дата выезда (формат YYYY-MM-DD). Ночь перед этой датой является последней.",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'type',
+                openapi.IN_QUERY,
+                description="ID типа номера для фильтрации.",
+                type=openapi.TYPE_INTEGER,
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Список свободных комнат.",
+                examples={
+                    "application/json": {
+                        "count": 2,
+                        "rooms": [
+                            {
+                                "id": 1,
+                                "number": 101,
+                                "type_id": 1,
+                                "type_name": "Одноместный",
+                                "phone": "1234567890"
+                            },
+                            {
+                                "id": 2,
+                                "number": 102,
+                                "type_id": 1,
+                                "type_name": "Одноместный",
+                                "phone": "1234567891"
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации. Например, отсутствуют даты или дата окончания раньше даты начала.",
+                examples={
+                    "application/json": {
+                        "to": ["Дата окончания должна быть позже даты начала."]
+                    }
+                },
+            ),
+        },
+    ))
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        rooms = available_rooms(
+            validated_data['from'],
+            validated_data['to'],
+            validated_data.get('type')
+        ).select_related('type').order_by('number')
+        rooms_data = AvailableRoomSerializer(rooms, many=True, context={'request': request}).data
 
         return Response({
-            "count": rooms_count,
+            "count": len(rooms_data),
             "rooms": rooms_data
         })
 
@@ -286,7 +531,7 @@ class RoomsByStatusView(generics.GenericAPIView):
 class ClientStayOverlapView(generics.GenericAPIView):
     serializer_class = ClientStayOverlapSerializer
 
-    @swagger_auto_schema(
+    @lazy_swagger_auto_schema(lambda: dict(
         operation_description="Получить список клиентов, проживавших в те же дни, что и заданный клиент, в определённый период времени.",
         manual_parameters=[
             openapi.Parameter(
@@ -359,7 +604,7 @@ class ClientStayOverlapView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
     def get(self, request, *args, **kwargs):
         overlap_serializer = self.get_serializer(data=request.query_params)
         if not overlap_serializer.is_valid():
@@ -378,41 +623,166 @@ class ClientStayOverlapView(generics.GenericAPIView):
                 status=404
             )
 
-        client_reservations = Reservation.objects.filter(client=target_client)
+        overlapping_clients = Client.objects.filter(
+            id__in=self.overlapping_reservations(target_client.id, start_date, end_date).values('client_id')
+        )
+        clients_data = ClientSerializer(overlapping_clients, many=True, context={'request': request}).data
+
+        return Response({
+            "count": len(clients_data),
+            "clients": clients_data
+        })
 
-        date_filter = Q()
+    @staticmethod
+    def overlapping_reservations(client_id, start_date=None, end_date=None):
+        client_reservations = Reservation.objects.filter(
+            client_id=client_id,
+            arrival_date__lt=OuterRef('departure_date'),
+            departure_date__gt=OuterRef('arrival_date'),
+        )
         if start_date:
-            date_filter &= Q(arrival_date__gte=start_date)
+            client_reservations = client_reservations.filter(arrival_date__gte=start_date)
         if end_date:
-            date_filter &= Q(departure_date__lte=end_date)
+            client_reservations = client_reservations.filter(departure_date__lte=end_date)
 
-        if date_filter:
-            client_reservations = client_reservations.filter(date_filter)
+        return Reservation.objects.filter(Exists(client_reservations)).exclude(client_id=client_id)
 
-        overlapping_filter = Q()
-        for reservation in client_reservations:
-            overlapping_filter |= Q(arrival_date__lt=reservation.departure_date) & Q(
-                departure_date__gt=reservation.arrival_date)
 
-        if overlapping_filter:
-            overlapping_reservations = Reservation.objects.filter(overlapping_filter).exclude(client=target_client)
-            overlapping_clients_ids = overlapping_reservations.values_list('client_id', flat=True).distinct()
-            overlapping_clients = Client.objects.filter(id__in=overlapping_clients_ids)
-        else:
-            overlapping_clients = Client.objects.none()
+class ClientStayOverlapBulkView(generics.GenericAPIView):
+    serializer_class = ClientStayOverlapBulkSerializer
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Получить клиентов, проживавших в те же дни, сразу для нескольких клиентов.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'client_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Items(type=openapi.TYPE_INTEGER),
+                    description="Список ID клиентов (не более 100).",
+                ),
+                'start_date': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    format=openapi.FORMAT_DATE,
+                    description="Дата начала периода (формат YYYY-MM-DD).",
+                    nullable=True,
+                ),
+                'end_date': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    format=openapi.FORMAT_DATE,
+                    description="Дата окончания периода (формат YYYY-MM-DD).",
+                    nullable=True,
+                ),
+            },
+            required=['client_ids'],
+        ),
+        responses={
+            200: openapi.Response(
+                description="Пересекающиеся по датам проживания клиенты для каждого из указанных клиентов.",
+                examples={
+                    "application/json": {
+                        "count": 1,
+                        "results": [
+                            {
+                                "client_id": 1,
+                                "count": 1,
+                                "clients": [
+                                    {
+                                        "id": 2,
+                                        "passport_number": "0987654321",
+                                        "first_name": "Анна",
+                                        "last_name": "Петрова",
+                                        "middle_name": "Александровна",
+                                        "city_from": "Санкт-Петербург"
+                                    }
+                                ]
+                            }
+                        ],
+                        "not_found": [123]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, указаны некорректные даты.",
+                examples={
+                    "application/json": {
+                        "non_field_errors": ["Дата окончания не может быть раньше даты начала."]
+                    }
+                },
+            ),
+        },
+    ))
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        start_date = validated_data.get('start_date', None)
+        end_date = validated_data.get('end_date', None)
+        requested_ids = list(dict.fromkeys(validated_data['client_ids']))
 
-        clients_data = ClientSerializer(overlapping_clients, many=True).data
+        existing_ids = set(Client.objects.filter(id__in=requested_ids).values_list('id', flat=True))
+        client_ids = [client_id for client_id in requested_ids if client_id in existing_ids]
+
+        # Один запрос на все пары (клиент, пересекающийся клиент)
+        overlaps = {client_id: set() for client_id in client_ids}
+        if client_ids:
+            for target_id, overlapping_client_id in self.overlapping_pairs(client_ids, start_date, end_date):
+                overlaps[target_id].add(overlapping_client_id)
+
+        overlapping_ids = set().union(*overlaps.values())
+        clients_data = {
+            client['id']: client
+            for client in ClientSerializer(Client.objects.filter(id__in=overlapping_ids), many=True).data
+        }
+
+        results = []
+        for client_id in client_ids:
+            clients = [clients_data[overlapping_id] for overlapping_id in sorted(overlaps[client_id])]
+            results.append({
+                "client_id": client_id,
+                "count": len(clients),
+                "clients": clients
+            })
 
         return Response({
-            "count": overlapping_clients.count(),
-            "clients": clients_data
+            "count": len(results),
+            "results": results,
+            "not_found": [client_id for client_id in requested_ids if client_id not in existing_ids]
         })
 
+    @staticmethod
+    def overlapping_pairs(client_ids, start_date=None, end_date=None):
+        # Самосоединение бронирований: брони запрошенных клиентов с пересекающимися бронями других клиентов
+        table = Reservation._meta.db_table
+        conditions = [f"target.client_id IN ({', '.join(['%s'] * len(client_ids))})"]
+        params = list(client_ids)
+        if start_date:
+            conditions.append("target.arrival_date >= %s")
+            params.append(start_date)
+        if end_date:
+            conditions.append("target.departure_date <= %s")
+            params.append(end_date)
+
+        sql = f"""
+            SELECT DISTINCT target.client_id, other.client_id AS other_client_id
+            FROM {table} target
+            INNER JOIN {table} other
+                ON other.arrival_date < target.departure_date
+                AND other.departure_date > target.arrival_date
+                AND other.client_id <> target.client_id
+            WHERE {' AND '.join(conditions)}
+        """
+        with connections[router.db_for_read(Reservation)].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
 
 class ClientRoomCleaningView(generics.GenericAPIView):
     serializer_class = ClientRoomCleaningSerializer
 
-    @swagger_auto_schema(
+    @lazy_swagger_auto_schema(lambda: dict(
         operation_description="Получить список сотрудников, убирающих номер указанного клиента в заданный день недели.",
         manual_parameters=[
             openapi.Parameter(
@@ -474,7 +844,7 @@ class ClientRoomCleaningView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
     def get(self, request, *args, **kwargs):
         cleaning_serializer = self.get_serializer(data=request.query_params)
         if not cleaning_serializer.is_valid():
@@ -484,47 +854,168 @@ class ClientRoomCleaningView(generics.GenericAPIView):
         client_id = validated_data['client_id']
         day_of_week = validated_data['day_of_week']
 
-        try:
-            target_client = Client.objects.get(id=client_id)
-        except Client.DoesNotExist:
-            return Response(
-                {"detail": f"Клиент с id {client_id} не найден."},
-                status=404
-            )
-
-        try:
-            reservation = Reservation.objects.filter(client=target_client).latest('departure_date')
-            room = reservation.room
-        except Reservation.DoesNotExist:
+        room_id = Reservation.objects.filter(client_id=client_id).order_by('-departure_date').values_list(
+            'room_id', flat=True
+        ).first()
+        if room_id is None:
+            if not Client.objects.filter(id=client_id).exists():
+                return Response(
+                    {"detail": f"Клиент с id {client_id} не найден."},
+                    status=404
+                )
             return Response(
                 {"detail": f"Нет активных или завершённых бронирований для клиента с id {client_id}."},
                 status=404
             )
 
-        cleaning_schedules = CleaningSchedule.objects.filter(
-            room=room,
-            cleaning_date__week_day=self.get_day_number(day_of_week)
-        )
-
-        employees = [schedule.cleaner.employee for schedule in cleaning_schedules]
-        employees_data = CleaningEmployeeSerializer(employees, many=True).data
+        weekday = self.get_day_number(day_of_week)
+        employees = self.cleaners_by_weekday([room_id], [weekday]).get((room_id, weekday), [])
+        employees_data = CleaningEmployeeSerializer(employees, many=True, context={'request': request}).data
 
         return Response({
             "count": len(employees),
             "employees": employees_data
         })
 
-    def get_day_number(self, day_of_week):
-        days = {
-            'MONDAY': 2,
-            'TUESDAY': 3,
-            'WEDNESDAY': 4,
-            'THURSDAY': 5,
-            'FRIDAY': 6,
-            'SATURDAY': 7,
-            'SUNDAY': 1,
+    @staticmethod
+    def get_day_number(day_of_week):
+        # ISO-нумерация, как в CleaningSchedule.weekday
+        return [day for day, _ in DAYS_OF_WEEK].index(day_of_week.upper()) + 1
+
+    @staticmethod
+    def cleaners_by_weekday(room_ids, weekdays):
+        # Один запрос по индексу (room, weekday), каждый сотрудник учитывается один раз
+        cleaners = {}
+        schedules = CleaningSchedule.objects.filter(
+            room_id__in=room_ids,
+            weekday__in=weekdays
+        ).select_related('cleaner__employee').order_by('cleaning_date', 'id')
+        for schedule in schedules:
+            employees = cleaners.setdefault((schedule.room_id, schedule.weekday), {})
+            employees.setdefault(schedule.cleaner.employee_id, schedule.cleaner.employee)
+        return {key: list(employees.values()) for key, employees in cleaners.items()}
+
+
+class ClientRoomCleaningBulkView(generics.GenericAPIView):
+    serializer_class = ClientRoomCleaningBulkSerializer
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description=(
+                "Получить сотрудников, убирающих номера клиентов в указанные дни недели, "
+                "сразу для нескольких клиентов. Используется номер последнего бронирования клиента."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'client_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Items(type=openapi.TYPE_INTEGER),
+                    description="Список ID клиентов (не более 100).",
+                ),
+                'days_of_week': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Items(
+                        type=openapi.TYPE_STRING,
+                        enum=['MONDAY', 'TUESDAY', 'WEDNESDAY', 'THURSDAY', 'FRIDAY', 'SATURDAY', 'SUNDAY']
+                    ),
+                    description="Дни недели, для которых требуется найти уборщиков.",
+                ),
+            },
+            required=['client_ids', 'days_of_week'],
+        ),
+        responses={
+            200: openapi.Response(
+                description="Уборщики по дням недели для каждого клиента.",
+                examples={
+                    "application/json": {
+                        "count": 1,
+                        "results": [
+                            {
+                                "client_id": 1,
+                                "room_number": 101,
+                                "days": {
+                                    "MONDAY": [
+                                        {
+                                            "id": 1,
+                                            "first_name": "Иван",
+                                            "last_name": "Иванов",
+                                            "middle_name": "Иванович"
+                                        }
+                                    ],
+                                    "FRIDAY": []
+                                }
+                            }
+                        ],
+                        "without_reservations": [2],
+                        "not_found": [123]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, указан недопустимый день недели.",
+                examples={
+                    "application/json": {
+                        "days_of_week": {"0": ["\"FUNDAY\" is not a valid choice."]}
+                    }
+                },
+            ),
+        },
+    ))
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        requested_ids = list(dict.fromkeys(validated_data['client_ids']))
+        weekdays = {
+            day: ClientRoomCleaningView.get_day_number(day)
+            for day in dict.fromkeys(validated_data['days_of_week'])
+        }
+
+        # Номер последнего бронирования каждого клиента одним запросом
+        last_reservation = Reservation.objects.filter(client=OuterRef('pk')).order_by('-departure_date')
+        rooms = {
+            client_id: (room_id, room_number)
+            for client_id, room_id, room_number in Client.objects.filter(id__in=requested_ids).annotate(
+                room_id=Subquery(last_reservation.values('room_id')[:1]),
+                room_number=Subquery(last_reservation.values('room__number')[:1])
+            ).values_list('id', 'room_id', 'room_number')
         }
-        return days.get(day_of_week.upper(), None)
+        cleaners = ClientRoomCleaningView.cleaners_by_weekday(
+            {room_id for room_id, _ in rooms.values() if room_id is not None},
+            weekdays.values()
+        )
+
+        employees_data = {}
+        results = []
+        for client_id in requested_ids:
+            room_id, room_number = rooms.get(client_id, (None, None))
+            if room_id is None:
+                continue
+
+            days_data = {}
+            for day, weekday in weekdays.items():
+                days_data[day] = []
+                for employee in cleaners.get((room_id, weekday), []):
+                    if employee.id not in employees_data:
+                        employees_data[employee.id] = CleaningEmployeeSerializer(employee).data
+                    days_data[day].append(employees_data[employee.id])
+
+            results.append({
+                "client_id": client_id,
+                "room_number": room_number,
+                "days": days_data
+            })
+
+        return Response({
+            "count": len(results),
+            "results": results,
+            "without_reservations": [
+                client_id for client_id in requested_ids if client_id in rooms and rooms[client_id][0] is None
+            ],
+            "not_found": [client_id for client_id in requested_ids if client_id not in rooms]
+        })
 
 
 class EmployeeManagementView(generics.GenericAPIView):
@@ -537,7 +1028,7 @@ class EmployeeManagementView(generics.GenericAPIView):
     def get_serializer_class(self):
         return self.serializer_classes.get(self.request.method.lower())
 
-    @swagger_auto_schema(
+    @lazy_swagger_auto_schema(lambda: dict(
         operation_description="Принять на работу нового сотрудника гостиницы. Создание сотрудника и контракта.",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
@@ -609,7 +1100,7 @@ class EmployeeManagementView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -650,7 +1141,7 @@ class EmployeeManagementView(generics.GenericAPIView):
 
         return Response(serializer.errors, status=422)
 
-    @swagger_auto_schema(
+    @lazy_swagger_auto_schema(lambda: dict(
         operation_description="Обновить данные сотрудника или его контракта.",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
@@ -732,7 +1223,7 @@ class EmployeeManagementView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
     def patch(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -782,7 +1273,7 @@ class EmployeeManagementView(generics.GenericAPIView):
 
         return Response(serializer.errors, status=422)
 
-    @swagger_auto_schema(
+    @lazy_swagger_auto_schema(lambda: dict(
         operation_description="Уволить сотрудника, завершив его активный контракт.",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
@@ -818,7 +1309,7 @@ class EmployeeManagementView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
     def delete(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -843,8 +1334,13 @@ class EmployeeManagementView(generics.GenericAPIView):
 class CleaningScheduleManagementView(generics.GenericAPIView):
     serializer_class = UpdateCleaningScheduleSerializer
 
-    @swagger_auto_schema(
-        operation_description="Обновить расписание уборок для сотрудника.",
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description=(
+                "Обновить расписание уборок. Можно передать расписание одного сотрудника (cleaner_id, cleaning_dates, "
+                "room_ids) - недостающие уборки будут добавлены. Либо передать список plans: для каждого сотрудника "
+                "расписание на указанные даты заменяется переданным, лишние уборки удаляются. "
+                "Изменяются только строки, которые действительно отличаются."
+        ),
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
@@ -860,17 +1356,54 @@ class CleaningScheduleManagementView(generics.GenericAPIView):
                 'room_ids': openapi.Schema(
                     type=openapi.TYPE_ARRAY,
                     items=openapi.Items(type=openapi.TYPE_INTEGER),
-                    description="Список ID комнат, которые сотрудник будет убирать.",
+                    description="Список номеров комнат, которые сотрудник будет убирать.",
+                ),
+                'plans': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    description="Планы уборок для нескольких сотрудников, применяются в одной транзакции.",
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'cleaner_id': openapi.Schema(type=openapi.TYPE_INTEGER, description="ID сотрудника."),
+                            'cleaning_dates': openapi.Schema(
+                                type=openapi.TYPE_ARRAY,
+                                items=openapi.Items(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                                description="Даты, на которые заменяется расписание сотрудника.",
+                            ),
+                            'room_ids': openapi.Schema(
+                                type=openapi.TYPE_ARRAY,
+                                items=openapi.Items(type=openapi.TYPE_INTEGER),
+                                description="Номера комнат. Пустой список снимает сотрудника с уборок в эти даты.",
+                            ),
+                            'status': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                enum=['PENDING', 'IN_PROGRESS', 'COMPLETED'],
+                                description="Статус уборок, по умолчанию PENDING.",
+                            ),
+                        },
+                        required=['cleaner_id', 'cleaning_dates', 'room_ids'],
+                    ),
                 ),
             },
-            required=['cleaner_id', 'cleaning_dates', 'room_ids'],
         ),
         responses={
             200: openapi.Response(
                 description="Расписание уборок успешно обновлено.",
                 examples={
                     "application/json": {
-                        "detail": "Расписание успешно обновлено."
+                        "detail": "Расписание успешно обновлено.",
+                        "created": 12,
+                        "updated": 1,
+                        "deleted": 3,
+                        "unchanged": 140
+                    }
+                },
+            ),
+            409: openapi.Response(
+                description="Расписание одновременно изменено другим запросом.",
+                examples={
+                    "application/json": {
+                        "detail": "Расписание было изменено другим запросом, повторите попытку."
                     }
                 },
             ),
@@ -884,41 +1417,122 @@ class CleaningScheduleManagementView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
     def patch(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             validated_data = serializer.validated_data
 
-            cleaner_id = validated_data['cleaner_id']
-            cleaning_dates = validated_data['cleaning_dates']
-            room_numbers = validated_data['room_ids']
-
-            with transaction.atomic():
-                rooms = Room.objects.filter(number__in=room_numbers)
-
-                CleaningSchedule.objects.filter(
-                    cleaner_id=cleaner_id,
-                    cleaning_date__in=cleaning_dates,
-                    room__in=rooms
-                ).delete()
+            if 'plans' in validated_data:
+                plans, replace = validated_data['plans'], True
+            else:
+                plans, replace = [validated_data], False
 
-                schedules = [
-                    CleaningSchedule(
-                        cleaner_id=cleaner_id,
-                        room=room,
-                        cleaning_date=cleaning_date
-                    )
-                    for cleaning_date in cleaning_dates
-                    for room in rooms
-                ]
-                CleaningSchedule.objects.bulk_create(schedules)
+            try:
+                result = apply_cleaning_plans(plans, replace=replace)
+            except IntegrityError:
+                return Response(
+                    {"detail": "Расписание было изменено другим запросом, повторите попытку."},
+                    status=409
+                )
 
-            return Response({"detail": "Расписание успешно обновлено."})
+            return Response({"detail": "Расписание успешно обновлено.", **result})
 
         return Response(serializer.errors, status=422)
 
 
+class CleaningAutoAssignView(generics.GenericAPIView):
+    serializer_class = AutoAssignCleaningSerializer
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description=(
+                "Автоматически распределить уборки между уборщиками на период. Убираются комнаты в статусе "
+                "REQUIRES_CLEANING (в первый день периода) и комнаты, из которых выезжают гости. "
+                "Уже запланированные уборки сохраняются, новые распределяются так, чтобы выровнять нагрузку."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'start_date': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    format=openapi.FORMAT_DATE,
+                    description="Дата начала периода (формат YYYY-MM-DD).",
+                ),
+                'end_date': openapi.Schema(
+                    type=openapi.TYPE_STRING,
+                    format=openapi.FORMAT_DATE,
+                    description="Дата окончания периода включительно, по умолчанию совпадает с датой начала.",
+                    nullable=True,
+                ),
+                'position_ids': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Items(type=openapi.TYPE_INTEGER),
+                    description="ID должностей сотрудников, выполняющих уборку. По умолчанию - должность 'Уборщик'.",
+                ),
+                'dry_run': openapi.Schema(
+                    type=openapi.TYPE_BOOLEAN,
+                    description="Только рассчитать распределение, не сохраняя его.",
+                ),
+            },
+            required=['start_date'],
+        ),
+        responses={
+            200: openapi.Response(
+                description="Распределение уборок.",
+                examples={
+                    "application/json": {
+                        "start_date": "2024-05-01",
+                        "end_date": "2024-05-01",
+                        "created": 3,
+                        "planned": 3,
+                        "assignments": [
+                            {"date": "2024-05-01", "cleaner_id": 1, "rooms": [101, 203], "load": 3},
+                            {"date": "2024-05-01", "cleaner_id": 2, "rooms": [305], "load": 3}
+                        ],
+                        "unassigned": []
+                    }
+                },
+            ),
+            409: openapi.Response(
+                description="Расписание одновременно изменено другим запросом.",
+                examples={
+                    "application/json": {
+                        "detail": "Расписание было изменено другим запросом, повторите попытку."
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных.",
+                examples={
+                    "application/json": {
+                        "end_date": ["Дата окончания не может быть раньше даты начала."]
+                    }
+                },
+            ),
+        },
+    ))
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        try:
+            result = assign_cleanings(
+                validated_data['start_date'],
+                validated_data['end_date'],
+                position_ids=validated_data.get('position_ids'),
+                dry_run=validated_data['dry_run']
+            )
+        except IntegrityError:
+            return Response(
+                {"detail": "Расписание было изменено другим запросом, повторите попытку."},
+                status=409
+            )
+
+        return Response(result, status=200)
+
+
 class ReservationManagementView(generics.GenericAPIView):
     serializer_classes = {
         'post': CreateReservationSerializer,
@@ -928,7 +1542,7 @@ class ReservationManagementView(generics.GenericAPIView):
     def get_serializer_class(self):
         return self.serializer_classes.get(self.request.method.lower())
 
-    @swagger_auto_schema(
+    @lazy_swagger_auto_schema(lambda: dict(
         operation_description="Создать новое бронирование для клиента.",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
@@ -995,7 +1609,16 @@ class ReservationManagementView(generics.GenericAPIView):
                         "arrival_date": "2024-12-10",
                         "departure_date": "2024-12-15",
                         "status": "BOOKED",
-                        "price_at_booking": 5000
+                        "price_at_booking": 5000,
+                        "version": 1
+                    }
+                },
+            ),
+            409: openapi.Response(
+                description="Комнату на эти даты одновременно забронировал другой пользователь.",
+                examples={
+                    "application/json": {
+                        "room_number": "Комната уже забронирована на указанные даты."
                     }
                 },
             ),
@@ -1009,7 +1632,7 @@ class ReservationManagementView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -1026,41 +1649,51 @@ class ReservationManagementView(generics.GenericAPIView):
             status = request.data.get('status', None)
             payment_status = request.data.get('payment_status', None)
 
-            with transaction.atomic():
-                client, created = Client.objects.get_or_create(
-                    passport_number=passport_number,
-                    defaults={
-                        "first_name": first_name,
-                        "last_name": last_name,
-                        "middle_name": middle_name,
-                        "city_from": city_from
-                    }
-                )
+            try:
+                with transaction.atomic():
+                    # Блокируется только строка бронируемой комнаты, поэтому бронирования разных комнат
+                    # не ждут друг друга. Занятость проверяется повторно уже под блокировкой
+                    room = Room.objects.select_for_update().get(pk=validated_data['room'].pk)
+                    if not is_room_available(room, arrival_date, departure_date):
+                        return Response({"room_number": "Комната уже забронирована на указанные даты."}, status=409)
+
+                    client, created = Client.objects.get_or_create(
+                        passport_number=passport_number,
+                        defaults={
+                            "first_name": first_name,
+                            "last_name": last_name,
+                            "middle_name": middle_name,
+                            "city_from": city_from
+                        }
+                    )
 
-                if not created:
-                    client.first_name = first_name
-                    client.last_name = last_name
-                    client.middle_name = middle_name
-                    client.city_from = city_from
-                    client.save()
-
-                total_price = self.calculate_total_price(room, arrival_date, departure_date)
-
-                reservation = Reservation.objects.create(
-                    client=client,
-                    room=room,
-                    admin=request.user,
-                    booking_date=datetime.now(),
-                    arrival_date=arrival_date,
-                    departure_date=departure_date,
-                    status=status or Reservation._meta.get_field('status').get_default(),
-                    payment_status=payment_status or Reservation._meta.get_field('payment_status').get_default(),
-                    price_at_booking=total_price,
-                    final_price=total_price,
-                )
+                    if not created:
+                        client.first_name = first_name
+                        client.last_name = last_name
+                        client.middle_name = middle_name
+                        client.city_from = city_from
+                        client.save()
+
+                    total_price = self.calculate_total_price(room, arrival_date, departure_date)
 
-                room.status = 'OCCUPIED'
-                room.save()
+                    reservation = Reservation.objects.create(
+                        client=client,
+                        room=room,
+                        admin=request.user,
+                        booking_date=datetime.now(),
+                        arrival_date=arrival_date,
+                        departure_date=departure_date,
+                        status=status or Reservation._meta.get_field('status').get_default(),
+                        payment_status=payment_status or Reservation._meta.get_field('payment_status').get_default(),
+                        price_at_booking=total_price,
+                        final_price=total_price,
+                    )
+
+                    room.status = 'OCCUPIED'
+                    room.save()
+            except IntegrityError:
+                # Уникальность ночей комнаты защищает от двойного бронирования и без блокировки строк
+                return Response({"room_number": "Комната уже забронирована на указанные даты."}, status=409)
 
             return Response(
                 {
@@ -1070,15 +1703,28 @@ class ReservationManagementView(generics.GenericAPIView):
                     "arrival_date": reservation.arrival_date,
                     "departure_date": reservation.departure_date,
                     "status": reservation.status,
-                    "price_at_booking": reservation.price_at_booking
+                    "price_at_booking": reservation.price_at_booking,
+                    "version": reservation.version
                 },
                 status=201
             )
 
         return Response(serializer.errors, status=422)
 
-    @swagger_auto_schema(
+    @lazy_swagger_auto_schema(lambda: dict(
         operation_description="Обновить существующее бронирование.",
+        manual_parameters=[
+            openapi.Parameter(
+                'If-Match',
+                openapi.IN_HEADER,
+                description="ETag бронирования из ответа /hotel/api/reservations/{id}/ (вида \"<id>.<версия>-<хэш>\") "
+                            "или короткий тег \"<id>.<версия>\" из заголовка ETag предыдущего обновления или ответа 412. "
+                            "Сравниваются только id и версия. Если бронирование с тех пор изменилось, "
+                            "обновление отклоняется с кодом 412.",
+                type=openapi.TYPE_STRING,
+                required=False,
+            ),
+        ],
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
@@ -1111,6 +1757,12 @@ class ReservationManagementView(generics.GenericAPIView):
                     description="Новый номер комнаты для бронирования.",
                     nullable=True,
                 ),
+                'version': openapi.Schema(
+                    type=openapi.TYPE_INTEGER,
+                    description="Версия бронирования, полученная при чтении. Если бронирование с тех пор изменилось, "
+                                "обновление отклоняется с кодом 409.",
+                    nullable=True,
+                ),
             },
             required=[],
         ),
@@ -1126,7 +1778,8 @@ class ReservationManagementView(generics.GenericAPIView):
                         "departure_date": "2024-12-18",
                         "status": "CONFIRMED",
                         "payment_status": "PAID",
-                        "price_at_booking": 7000
+                        "price_at_booking": 7000,
+                        "version": 3
                     }
                 },
             ),
@@ -1138,6 +1791,25 @@ class ReservationManagementView(generics.GenericAPIView):
                     }
                 },
             ),
+            409: openapi.Response(
+                description="Бронирование изменено другим пользователем или комната уже занята на новые даты.",
+                examples={
+                    "application/json": {
+                        "detail": "Бронирование было изменено другим пользователем, обновите данные.",
+                        "version": 4
+                    }
+                },
+            ),
+            412: openapi.Response(
+                description="Бронирование изменено после получения ETag из заголовка If-Match. "
+                            "Заголовок ETag ответа содержит короткий тег \"<id>.<версия>\" текущей версии.",
+                examples={
+                    "application/json": {
+                        "detail": "Бронирование было изменено после получения ETag, обновите данные.",
+                        "version": 4
+                    }
+                },
+            ),
             422: openapi.Response(
                 description="Ошибки валидации данных. Например, некорректные даты или комната недоступна.",
                 examples={
@@ -1148,13 +1820,11 @@ class ReservationManagementView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
     def patch(self, request, *args, **kwargs):
         reservation_id = kwargs.get('reservation_id')
 
-        try:
-            reservation = Reservation.objects.select_for_update().get(id=reservation_id)
-        except Reservation.DoesNotExist:
+        if not Reservation.objects.filter(id=reservation_id).exists():
             return Response(
                 {"detail": "Бронирование с указанным ID не найдено."},
                 status=404
@@ -1164,81 +1834,280 @@ class ReservationManagementView(generics.GenericAPIView):
         if serializer.is_valid():
             validated_data = serializer.validated_data
 
-            with transaction.atomic():
-                if 'arrival_date' in validated_data:
-                    reservation.arrival_date = validated_data['arrival_date']
-                if 'departure_date' in validated_data:
-                    reservation.departure_date = validated_data['departure_date']
-
-                previous_status = reservation.status
-                if 'status' in validated_data:
-                    reservation.status = validated_data['status']
-
-                    if validated_data['status'] in ['CANCELED', 'CHECKED_OUT']:
-                        if validated_data['status'] == 'CANCELED' and previous_status != 'CHECKED_IN':
-                            reservation.room.status = 'AVAILABLE'
-                        elif validated_data['status'] == 'CHECKED_OUT' and previous_status == 'CHECKED_IN':
-                            reservation.room.status = 'REQUIRES_CLEANING'
+            try:
+                with transaction.atomic():
+                    reservation = Reservation.objects.select_for_update().get(id=reservation_id)
+                    if if_match_failed(request, reservation.id, reservation.version):
+                        return Response(
+                            {
+                                "detail": "Бронирование было изменено после получения ETag, обновите данные.",
+                                "version": reservation.version
+                            },
+                            status=412,
+                            # Короткий тег: полный ETag из /hotel/api/reservations/{id}/ зависит от пути
+                            # и параметров GET-запроса, для If-Match достаточно id и версии
+                            headers={'ETag': quote_etag(entity_tag(reservation.id, reservation.version))}
+                        )
+                    if 'version' in validated_data and validated_data['version'] != reservation.version:
+                        return Response(
+                            {
+                                "detail": "Бронирование было изменено другим пользователем, обновите данные.",
+                                "version": reservation.version
+                            },
+                            status=409
+                        )
+
+                    # Комнаты блокируются в порядке ID, чтобы встречные переносы не приводили к взаимной блокировке
+                    room_ids = {reservation.room_id}
+                    if 'room' in validated_data:
+                        room_ids.add(validated_data['room'].id)
+                    rooms = {room.id: room for room in Room.objects.select_for_update().filter(id__in=room_ids).order_by('id')}
+                    reservation.room = rooms[reservation.room_id]
+                    new_room = rooms[validated_data['room'].id] if 'room' in validated_data else reservation.room
+
+                    if 'arrival_date' in validated_data:
+                        reservation.arrival_date = validated_data['arrival_date']
+                    if 'departure_date' in validated_data:
+                        reservation.departure_date = validated_data['departure_date']
+
+                    # Проверки выполняются до изменения статусов комнат, чтобы отклоненный запрос ничего не сохранял
+                    stay_changed = 'arrival_date' in validated_data or 'departure_date' in validated_data \
+                        or 'room' in validated_data
+                    if stay_changed:
+                        if reservation.departure_date <= reservation.arrival_date:
+                            return Response(
+                                {"departure_date": ["Дата выезда должна быть позже даты прибытия."]},
+                                status=422
+                            )
+                        if not is_room_available(new_room, reservation.arrival_date, reservation.departure_date,
+                                                 exclude_reservation=reservation):
+                            return Response({"room_number": "Комната уже забронирована на указанные даты."}, status=409)
+
+                    previous_status = reservation.status
+                    if 'status' in validated_data:
+                        reservation.status = validated_data['status']
+
+                        if validated_data['status'] in ['CANCELLED', 'CHECKED_OUT']:
+                            if validated_data['status'] == 'CANCELLED' and previous_status != 'CHECKED_IN':
+                                reservation.room.status = 'AVAILABLE'
+                            elif validated_data['status'] == 'CHECKED_OUT' and previous_status == 'CHECKED_IN':
+                                reservation.room.status = 'REQUIRES_CLEANING'
+                            reservation.room.save()
+
+                    if 'payment_status' in validated_data:
+                        reservation.payment_status = validated_data['payment_status']
+                    if 'room' in validated_data:
+                        reservation.room.status = 'AVAILABLE'
+                        reservation.room.save()
+                        reservation.room = new_room
+                        reservation.room.status = 'OCCUPIED'
                         reservation.room.save()
 
-                if 'payment_status' in validated_data:
-                    reservation.payment_status = validated_data['payment_status']
-                if 'room' in validated_data:
-                    reservation.room.status = 'AVAILABLE'
-                    reservation.room.save()
-                    reservation.room = validated_data['room']
-                    reservation.room.status = 'OCCUPIED'
-                    reservation.room.save()
-
-                if 'arrival_date' in validated_data or 'departure_date' in validated_data or 'room' in validated_data:
-                    reservation.price_at_booking = self.calculate_total_price(
-                        reservation.room,
-                        reservation.arrival_date,
-                        reservation.departure_date
-                    )
+                    if stay_changed:
+                        reservation.price_at_booking = self.calculate_total_price(
+                            reservation.room,
+                            reservation.arrival_date,
+                            reservation.departure_date
+                        )
 
-                reservation.updated_by = request.user
-                reservation.last_updated_date = timezone.now()
-                reservation.save()
+                    reservation.updated_by = request.user
+                    reservation.last_updated_date = timezone.now()
+                    reservation.save()
+            except IntegrityError:
+                return Response({"room_number": "Комната уже забронирована на указанные даты."}, status=409)
 
             return Response(
                 {
                     "reservation_id": reservation.id,
-                    "client_id": reservation.client.id,
+                    "client_id": reservation.client_id,
                     "room_number": reservation.room.number,
                     "arrival_date": reservation.arrival_date,
                     "departure_date": reservation.departure_date,
                     "status": reservation.status,
                     "payment_status": reservation.payment_status,
                     "price_at_booking": reservation.price_at_booking,
+                    "version": reservation.version,
                 },
-                status=200
+                status=200,
+                headers={'ETag': quote_etag(entity_tag(reservation.id, reservation.version))}
             )
 
         return Response(serializer.errors, status=422)
 
     def calculate_total_price(self, room, arrival_date, departure_date):
-        total_price = 0
-        current_date = arrival_date
+        return calculate_total_price(room.type_id, arrival_date, departure_date)
+
+
+class ReservationImportView(generics.GenericAPIView):
+    serializer_class = ReservationImportSerializer
+    parser_classes = [MultiPartParser, FormParser]
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description=(
+                "Массовый импорт бронирований из файла CSV или JSON Lines. "
+                "Поля строки совпадают с полями создания бронирования. "
+                "Клиенты обновляются или создаются по номеру паспорта, строки с ошибками пропускаются."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'file',
+                openapi.IN_FORM,
+                description="Файл с бронированиями (.csv или .jsonl).",
+                type=openapi.TYPE_FILE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'file_format',
+                openapi.IN_FORM,
+                description="Формат файла: csv или jsonl. По умолчанию определяется по расширению.",
+                type=openapi.TYPE_STRING,
+                enum=['csv', 'jsonl'],
+                required=False,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Результат импорта с ошибками по строкам.",
+                examples={
+                    "application/json": {
+                        "processed": 3,
+                        "created": 2,
+                        "failed": 1,
+                        "errors": [
+                            {
+                                "row": 2,
+                                "errors": {
+                                    "room_number": ["Комната с номером 999 не найдена."]
+                                }
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Файл не передан или его формат не поддерживается.",
+                examples={
+                    "application/json": {
+                        "file_format": ["Не удалось определить формат файла, укажите csv или jsonl."]
+                    }
+                },
+            ),
+        },
+    ))
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        importer = ReservationImporter(admin=request.user)
+        result = importer.run(read_rows(validated_data['file'], validated_data['file_format']))
 
-        price_history = RoomPriceHistory.objects.filter(
-            room_type=room.type
-        ).order_by('start_date')
+        return Response(result, status=200)
 
-        while current_date < departure_date:
-            for price_period in price_history:
-                if price_period.start_date <= current_date and (
-                        price_period.end_date is None or price_period.end_date >= current_date):
-                    total_price += price_period.price
-                    break
 
-            current_date += timedelta(days=1)
-        return total_price
+class PriceQuoteView(generics.GenericAPIView):
+    serializer_class = PriceQuoteSerializer
 
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Рассчитать стоимость проживания сразу для нескольких типов номеров и периодов.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'items': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'room_type_id': openapi.Schema(
+                                type=openapi.TYPE_INTEGER,
+                                description="ID типа номера.",
+                            ),
+                            'arrival_date': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                format=openapi.FORMAT_DATE,
+                                description="Дата заселения (формат YYYY-MM-DD).",
+                            ),
+                            'departure_date': openapi.Schema(
+                                type=openapi.TYPE_STRING,
+                                format=openapi.FORMAT_DATE,
+                                description="Дата выезда (формат YYYY-MM-DD).",
+                            ),
+                        },
+                        required=['room_type_id', 'arrival_date', 'departure_date'],
+                    ),
+                    description="Список проживаний для расчёта (не более 1000).",
+                ),
+            },
+            required=['items'],
+        ),
+        responses={
+            200: openapi.Response(
+                description="Стоимость проживания для каждого элемента запроса в исходном порядке.",
+                examples={
+                    "application/json": {
+                        "count": 2,
+                        "quotes": [
+                            {
+                                "room_type_id": 1,
+                                "arrival_date": "2024-12-10",
+                                "departure_date": "2024-12-15",
+                                "nights": 5,
+                                "total_price": 25000
+                            },
+                            {
+                                "room_type_id": 2,
+                                "arrival_date": "2024-12-10",
+                                "departure_date": "2024-12-12",
+                                "nights": 2,
+                                "total_price": 14000
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, некорректные даты или несуществующий тип номера.",
+                examples={
+                    "application/json": {
+                        "items": ["Следующие типы номеров не найдены: 7."]
+                    }
+                },
+            ),
+        },
+    ))
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        items = serializer.validated_data['items']
+        prices = quote_stays(
+            (item['room_type_id'], item['arrival_date'], item['departure_date'])
+            for item in items
+        )
 
-class QuarterlyReportView(generics.GenericAPIView):
+        quotes = [
+            {
+                "room_type_id": item['room_type_id'],
+                "arrival_date": item['arrival_date'],
+                "departure_date": item['departure_date'],
+                "nights": (item['departure_date'] - item['arrival_date']).days,
+                "total_price": price,
+            }
+            for item, price in zip(items, prices)
+        ]
 
-    @swagger_auto_schema(
+        return Response({
+            "count": len(quotes),
+            "quotes": quotes
+        })
+
+
+class QuarterlyReportView(CachedResponseMixin, generics.GenericAPIView):
+    cache_models = [RoomDailyStat, Room]
+
+    @lazy_swagger_auto_schema(lambda: dict(
         operation_description="Сформировать отчет о работе гостиницы за указанный квартал текущего или прошлого года.",
         manual_parameters=[
             openapi.Parameter(
@@ -1288,7 +2157,8 @@ class QuarterlyReportView(generics.GenericAPIView):
                 },
             ),
         },
-    )
+    ))
+    @cache_response
     def get(self, request, *args, **kwargs):
         serializer = QuarterlyReportSerializer(data=request.query_params)
         if not serializer.is_valid():
@@ -1299,65 +2169,14 @@ class QuarterlyReportView(generics.GenericAPIView):
 
         start_date, end_date = self.get_quarter_date_range(quarter, year)
 
-        # Число клиентов за период в каждом номере
-        clients_per_room = (
-            Reservation.objects.filter(
-                arrival_date__gte=start_date,
-                departure_date__lte=end_date,
-                status__in=['BOOKED', 'CONFIRMED', 'CHECKED_IN', 'CHECKED_OUT']
-            )
-            .values('room__number')
-            .annotate(client_count=Count('id'))
-            .order_by('room__number')
-        )
-
-        # Количество номеров на каждом этаже
-        rooms_per_floor = (
-            Room.objects.annotate(
-                floor=ExpressionWrapper(
-                    Substr(F('number'), 1, 1),
-                    output_field=IntegerField()
-                )
-            )
-            .values('floor')
-            .annotate(room_count=Count('id'))
-            .order_by('floor')
-        )
-
-        # Общая сумма дохода за каждый номер
-        income_per_room = (
-            Reservation.objects.filter(
-                arrival_date__gte=start_date,
-                departure_date__lte=end_date,
-                payment_status__in=['PREPAID', 'PAID'],
-            )
-            .values('room__number')
-            .annotate(total_income=Sum('price_at_booking'))
-            .order_by('room__number')
-        )
-
-        # Суммарный доход по всей гостинице
-        total_income = (
-                           Reservation.objects.filter(
-                               arrival_date__gte=start_date,
-                               departure_date__lte=end_date,
-                               payment_status__in=['PREPAID', 'PAID']
-                           )
-                           .aggregate(total_income=Sum('price_at_booking'))['total_income']
-                       ) or 0
-
-        report = {
-            "clients_per_room": list(clients_per_room),
-            "rooms_per_floor": list(rooms_per_floor),
-            "income_per_room": list(income_per_room),
-            "total_income": total_income,
-            "start_date": start_date,
-            "end_date": end_date
-        }
+        report = build_report(start_date.date(), end_date.date())
+        report["start_date"] = start_date
+        report["end_date"] = end_date
 
         return Response(report, status=200)
 
-    def get_quarter_date_range(self, quarter, year):
+    @staticmethod
+    def get_quarter_date_range(quarter, year):
         start_month = (quarter - 1) * 3 + 1
         end_month = start_month + 2
 
@@ -1366,3 +2185,380 @@ class QuarterlyReportView(generics.GenericAPIView):
         end_date = datetime(year, end_month, last_day)
 
         return start_date, end_date
+
+
+class RangeReportView(CachedResponseMixin, generics.GenericAPIView):
+    serializer_class = RangeReportSerializer
+    cache_models = [RoomDailyStat, Room]
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Сформировать отчет о работе гостиницы за произвольный период.",
+        manual_parameters=[
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Дата начала периода (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Дата окончания периода включительно (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Успешно сформированный отчет за период.",
+                examples={
+                    "application/json": {
+                        "clients_per_room": [
+                            {"room__number": 101, "client_count": 2}
+                        ],
+                        "rooms_per_floor": [
+                            {"floor": 1, "room_count": 10}
+                        ],
+                        "income_per_room": [
+                            {"room__number": 101, "total_income": 8000}
+                        ],
+                        "total_income": 8000,
+                        "start_date": "2024-04-10",
+                        "end_date": "2024-04-20"
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, дата окончания раньше даты начала.",
+                examples={
+                    "application/json": {
+                        "non_field_errors": ["Дата окончания не может быть раньше даты начала."]
+                    }
+                },
+            ),
+        },
+    ))
+    @cache_response
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        report = build_report(validated_data['start_date'], validated_data['end_date'])
+
+        return Response(report, status=200)
+
+
+class OccupancyReportView(CachedResponseMixin, generics.GenericAPIView):
+    serializer_class = OccupancyReportSerializer
+    cache_models = [RoomDailyStat, Room, RoomType]
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Загрузка номерного фонда за произвольный период по дням, неделям или месяцам "
+                              "в разрезе типов номеров: доля занятых ночей, доход, средняя цена проданной ночи (ADR) "
+                              "и доход на доступную ночь (RevPAR). Проживания, пересекающие границы периода, "
+                              "учитываются по ночам внутри периода.",
+        manual_parameters=[
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Дата начала периода (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Дата окончания периода включительно (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+                required=True,
+            ),
+            openapi.Parameter(
+                'granularity',
+                openapi.IN_QUERY,
+                description="Шаг группировки: day, week (с понедельника) или month. По умолчанию day.",
+                type=openapi.TYPE_STRING,
+                enum=['day', 'week', 'month'],
+            ),
+        ],
+        responses={
+            200: openapi.Response(
+                description="Показатели загрузки за период.",
+                examples={
+                    "application/json": {
+                        "start_date": "2024-04-01",
+                        "end_date": "2024-04-14",
+                        "granularity": "week",
+                        "periods": [
+                            {
+                                "period": "2024-04-01",
+                                "room_type_id": 1,
+                                "room_type": "Стандарт",
+                                "available_nights": 70,
+                                "occupied_nights": 49,
+                                "occupancy_rate": 0.7,
+                                "revenue": 147000,
+                                "adr": 3000.0,
+                                "revpar": 2100.0
+                            }
+                        ],
+                        "room_types": [
+                            {
+                                "room_type_id": 1,
+                                "room_type": "Стандарт",
+                                "available_nights": 140,
+                                "occupied_nights": 91,
+                                "occupancy_rate": 0.65,
+                                "revenue": 273000,
+                                "adr": 3000.0,
+                                "revpar": 1950.0
+                            }
+                        ]
+                    }
+                },
+            ),
+            422: openapi.Response(
+                description="Ошибки валидации данных. Например, дата окончания раньше даты начала.",
+                examples={
+                    "application/json": {
+                        "non_field_errors": ["Дата окончания не может быть раньше даты начала."]
+                    }
+                },
+            ),
+        },
+    ))
+    @cache_response
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        report = build_occupancy_report(
+            validated_data['start_date'], validated_data['end_date'], validated_data['granularity']
+        )
+
+        return Response(report, status=200)
+
+
+def file_format_parameter():
+    return openapi.Parameter(
+        'file_format',
+        openapi.IN_PATH,
+        description=f"Формат файла: {', '.join(EXPORT_FORMATS)}. Для XLSX нужен пакет openpyxl.",
+        type=openapi.TYPE_STRING,
+        enum=EXPORT_FORMATS,
+        required=True,
+    )
+
+
+def export_responses():
+    return {
+        200: openapi.Response(description="Файл выгрузки (text/csv или application/vnd.openxmlformats-officedocument."
+                                          "spreadsheetml.sheet). CSV передается потоком по мере чтения строк из базы."),
+        422: openapi.Response(
+            description="Ошибки валидации данных. Например, неподдерживаемый формат файла.",
+            examples={
+                "application/json": {
+                    "file_format": "Неподдерживаемый формат pdf. Доступные форматы: ['csv', 'xlsx']"
+                }
+            },
+        ),
+    }
+
+
+class ReservationExportView(generics.GenericAPIView):
+    serializer_class = ReservationExportSerializer
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Выгрузить бронирования в CSV или XLSX. Можно ограничить выгрузку периодом заселения "
+                              "и статусом бронирования.",
+        manual_parameters=[
+            file_format_parameter(),
+            openapi.Parameter(
+                'start_date',
+                openapi.IN_QUERY,
+                description="Выгрузить бронирования с датой заселения не раньше указанной (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+            ),
+            openapi.Parameter(
+                'end_date',
+                openapi.IN_QUERY,
+                description="Выгрузить бронирования с датой заселения не позже указанной (формат YYYY-MM-DD).",
+                type=openapi.TYPE_STRING,
+                format=openapi.FORMAT_DATE,
+            ),
+            openapi.Parameter(
+                'status',
+                openapi.IN_QUERY,
+                description="Статус бронирования.",
+                type=openapi.TYPE_STRING,
+                enum=[choice for choice, _ in Reservation.STATUS_CHOICES],
+            ),
+        ],
+        responses=export_responses(),
+    ))
+    def get(self, request, file_format, *args, **kwargs):
+        error = export_error(file_format)
+        if error:
+            return Response(error, status=422)
+
+        serializer = self.get_serializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        validated_data = serializer.validated_data
+        queryset = Reservation.objects.all()
+        if 'start_date' in validated_data:
+            queryset = queryset.filter(arrival_date__gte=validated_data['start_date'])
+        if 'end_date' in validated_data:
+            queryset = queryset.filter(arrival_date__lte=validated_data['end_date'])
+        if 'status' in validated_data:
+            queryset = queryset.filter(status=validated_data['status'])
+
+        return export_response(table_rows(queryset, RESERVATION_COLUMNS), file_format, 'reservations')
+
+
+class ClientExportView(generics.GenericAPIView):
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Выгрузить клиентов в CSV или XLSX. Поддерживаются те же фильтры, что и у списка "
+                              "клиентов: поиск, номер комнаты, даты проживания и город.",
+        manual_parameters=[
+            file_format_parameter(),
+            openapi.Parameter('search', openapi.IN_QUERY,
+                              description="Строка поиска по началу номера паспорта, фамилии, имени или города.",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('room', openapi.IN_QUERY, description="Номер комнаты.", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('start_date', openapi.IN_QUERY, description="Дата начала проживания (формат YYYY-MM-DD).",
+                              type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description="Дата окончания проживания (формат YYYY-MM-DD).",
+                              type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('city', openapi.IN_QUERY, description="Город, из которого прибыл клиент.",
+                              type=openapi.TYPE_STRING),
+        ],
+        responses=export_responses(),
+    ))
+    def get(self, request, file_format, *args, **kwargs):
+        error = export_error(file_format)
+        if error:
+            return Response(error, status=422)
+
+        queryset = ClientsListView.filter_clients(request.query_params)
+        return export_response(table_rows(queryset, CLIENT_COLUMNS), file_format, 'clients')
+
+
+class QuarterlyReportExportView(generics.GenericAPIView):
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Выгрузить отчет о работе гостиницы за квартал в CSV или XLSX.",
+        manual_parameters=[
+            file_format_parameter(),
+            openapi.Parameter('quarter', openapi.IN_QUERY, description="Номер квартала (1, 2, 3 или 4).",
+                              type=openapi.TYPE_INTEGER, required=True),
+            openapi.Parameter('year', openapi.IN_QUERY, description="Год для отчета. Должен быть текущим или прошлым.",
+                              type=openapi.TYPE_INTEGER, required=True),
+        ],
+        responses=export_responses(),
+    ))
+    def get(self, request, file_format, *args, **kwargs):
+        error = export_error(file_format)
+        if error:
+            return Response(error, status=422)
+
+        serializer = QuarterlyReportSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=422)
+
+        start_date, end_date = QuarterlyReportView.get_quarter_date_range(
+            serializer.validated_data['quarter'], serializer.validated_data['year']
+        )
+        report = build_report(start_date.date(), end_date.date())
+        report["start_date"] = start_date.date()
+        report["end_date"] = end_date.date()
+
+        filename = f"quarterly_report_{serializer.validated_data['year']}_q{serializer.validated_data['quarter']}"
+        return export_response(quarterly_report_rows(report), file_format, filename)
+
+
+class CacheStatsView(generics.GenericAPIView):
+
+    def get_permissions(self):
+        # Счетчики общие для всех пользователей, сбросить их может только администратор, как и в /metrics
+        if self.request.method == 'DELETE':
+            return [IsAdminUser()]
+        return super().get_permissions()
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Получить статистику кэша ответов: количество попаданий и промахов по каждому эндпоинту.",
+        responses={
+            200: openapi.Response(
+                description="Статистика кэша ответов.",
+                examples={
+                    "application/json": {
+                        "hits": 120,
+                        "misses": 30,
+                        "hit_ratio": 0.8,
+                        "views": {
+                            "RoomsByStatusView": {"hits": 100, "misses": 20, "hit_ratio": 0.8333},
+                            "QuarterlyReportView": {"hits": 20, "misses": 10, "hit_ratio": 0.6667}
+                        }
+                    }
+                },
+            ),
+        },
+    ))
+    def get(self, request, *args, **kwargs):
+        return Response(get_stats(), status=200)
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Сбросить счетчики попаданий и промахов кэша ответов.",
+        responses={
+            204: openapi.Response(description="Счетчики сброшены."),
+            403: openapi.Response(description="Сбросить счетчики может только администратор."),
+        },
+    ))
+    def delete(self, request, *args, **kwargs):
+        reset_stats()
+        return Response(status=204)
+
+
+class MetricsView(generics.GenericAPIView):
+    # Prometheus может опрашивать эндпоинт с basic_auth от имени администратора
+    permission_classes = [IsAdminUser]
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Гистограммы времени ответа, времени SQL-запросов, времени сериализации и количества "
+                              "SQL-запросов по каждому маршруту в текстовом формате Prometheus. "
+                              "Значения накапливаются отдельно в каждом процессе.",
+        responses={
+            200: openapi.Response(
+                description="Метрики в формате Prometheus.",
+                examples={
+                    "text/plain": 'hotel_db_queries_bucket{route="room-list",method="GET",status="200",le="5"} 12\n'
+                                  'hotel_db_queries_sum{route="room-list",method="GET",status="200"} 36\n'
+                                  'hotel_db_queries_count{route="room-list",method="GET",status="200"} 12'
+                },
+            ),
+            403: openapi.Response(description="Метрики доступны только администраторам."),
+        },
+    ))
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @lazy_swagger_auto_schema(lambda: dict(
+        operation_description="Сбросить накопленные метрики запросов.",
+        responses={
+            204: openapi.Response(description="Метрики сброшены."),
+        },
+    ))
+    def delete(self, request, *args, **kwargs):
+        registry.reset()
+        return Response(status=204)
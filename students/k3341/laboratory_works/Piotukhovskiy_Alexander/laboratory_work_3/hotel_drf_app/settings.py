@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,12 +45,24 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.BasicAuthentication'
+        'hotel_app.authentication.CachedTokenAuthentication',
+        'hotel_app.authentication.CachedBasicAuthentication'
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Без пакета orjson рендерер и парсер работают как стандартные JSONRenderer и JSONParser
+    'DEFAULT_RENDERER_CLASSES': [
+        'hotel_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'hotel_app.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'hotel_app.pagination.HotelCursorPagination',
+    'PAGE_SIZE': 100,
 }
 
 DJOSER = {
@@ -60,6 +73,8 @@ DJOSER = {
 }
 
 MIDDLEWARE = [
+    'hotel_app.middleware.RequestMetricsMiddleware',
+    'hotel_app.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -93,13 +108,88 @@ WSGI_APPLICATION = 'hotel_drf_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite допускает только одного писателя: транзакции сразу берут блокировку на запись
+# и ждут ее до timeout секунд, вместо ошибки "database is locked" при конкурентной записи.
+# Тестовая база хранится в файле, потому что база в памяти не поддерживает конкурентные транзакции
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Реплика для чтения списков и отчетов: путь к файлу SQLite в переменной окружения HOTEL_REPLICA_DB.
+# Без нее все запросы выполняются на основной базе
+HOTEL_REPLICA_DATABASE = None
+if os.environ.get('HOTEL_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['HOTEL_REPLICA_DB'],
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+    HOTEL_REPLICA_DATABASE = 'replica'
+
+DATABASE_ROUTERS = ['hotel_app.db_router.ReplicaRouter']
+
+# Сколько секунд после записи клиент читает из основной базы
+HOTEL_REPLICA_PIN_SECONDS = 5
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# При запуске нескольких процессов используйте общий бэкенд, например
+# 'django.core.cache.backends.filebased.FileBasedCache' с LOCATION = BASE_DIR / 'cache'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hotel-app',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Данные аутентификации должны быть общими для всех воркеров, иначе отозванный токен
+    # принимался бы процессами, не обработавшими отзыв
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'auth',
+    },
+}
+
+HOTEL_RESPONSE_CACHE = 'default'
+
+# Идентификатор выкладки: входит в ключ кэша OpenAPI-схемы, поэтому при общем кэше
+# схема генерируется один раз на выкладку
+HOTEL_RELEASE = os.environ.get('HOTEL_RELEASE', '')
+
+# Время жизни кэша аутентификации в секундах. Записи сбрасываются раньше при удалении токена
+# и при любом изменении пользователя. Кэш HOTEL_AUTH_CACHE должен быть общим для всех процессов
+# (файловый, Redis, Memcached): с кэшем в памяти процесса (LocMemCache) данные аутентификации не кэшируются,
+# чтобы отзыв токена или блокировка пользователя сразу действовали во всех воркерах
+HOTEL_AUTH_CACHE = 'auth'
+HOTEL_TOKEN_CACHE_TIMEOUT = 300
+HOTEL_BASIC_AUTH_CACHE_TIMEOUT = 60
+
+SWAGGER_SETTINGS = {
+    'DEFAULT_GENERATOR_CLASS': 'hotel_app.schema.HotelSchemaGenerator',
+}
+
+# Запросы, превысившие любой из порогов, логируются вместе со списком SQL-запросов
+# в логгер 'hotel_app.requests'. None отключает проверку порога.
+HOTEL_SLOW_REQUEST_QUERIES = 50
+HOTEL_SLOW_REQUEST_MS = 1000
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
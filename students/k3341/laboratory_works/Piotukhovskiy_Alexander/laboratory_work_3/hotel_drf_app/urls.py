@@ -17,10 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include, re_path
 from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
-schema_view = get_schema_view(
+from hotel_app.schema import get_cached_schema_view
+from hotel_app.views import MetricsView
+
+schema_view = get_cached_schema_view(
     openapi.Info(
         title="Hotel API",
         default_version='v1',
@@ -36,8 +38,10 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('hotel/', include('hotel_app.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 
     path('auth/', include('djoser.urls')),
     re_path('^auth/', include('djoser.urls.authtoken')),
+    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 ]